@@ -40,6 +40,8 @@ class Api(object):
         self.url = config_server.get("url")
         self.version = config_server.get("version")
         self.identity = IdentityManager.get()
+        # Optional HTTPClient, reusing connections between requests
+        self.http = None
 
     def request(self, params):
         self.check_token()
@@ -69,8 +71,12 @@ class Api(object):
         json = self.build_json(params)
         query = self.build_query(params)
         url = self.build_url(params)
-        response = requests.request(method, url, headers=headers, params=query,
-                                    data=data, json=json, timeout=(3.05, 15))
+        kwargs = dict(headers=headers, params=query, data=data, json=json)
+        if self.http:
+            response = self.http.request(method, url, **kwargs)
+        else:
+            response = requests.request(method, url, timeout=(3.05, 15),
+                                        **kwargs)
         return self.get_response(response)
 
     def get_response(self, response):
@@ -250,8 +256,9 @@ class DeviceApi(Api):
 class STTApi(Api):
     """ Web API wrapper for performing Speech to Text (STT) """
 
-    def __init__(self):
+    def __init__(self, http=None):
         super(STTApi, self).__init__("stt")
+        self.http = http
 
     def stt(self, audio, language, limit):
         """ Web API wrapper for performing Speech to Text (STT)
@@ -12,23 +12,55 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+from __future__ import print_function
+import argparse
+import json
+import os
 import time
 import wave
 from glob import glob
+from os.path import abspath, basename, dirname, join
 
-import os
 import pyee
-from os.path import dirname, join
 from speech_recognition import AudioSource
 
-from mycroft.client.speech.listener import RecognizerLoop
+from mycroft.client.speech.hotword_factory import HotWordFactory
 from mycroft.client.speech.mic import ResponsiveRecognizer
+from mycroft.configuration import Configuration
+
+"""
+Audio Accuracy Test
+Replays a corpus of WAV files through the listener (voice activity
+detection, wake word detection and phrase segmentation) as fast as they
+can be processed, and reports:
+    - the share of wake word recordings that were detected
+    - false alarms in recordings without the wake word
+    - CPU time used per second of audio
+    - segmentation latency, the audio time between the end of speech and
+      the listener ending the recording
+
+The corpus directory holds two folders:
+    with_wake_word/query_after  recordings of the wake word and a query
+    without_wake_word           recordings that must not trigger
+
+Usage: python audio_accuracy_test.py -d <corpus> -o report.json
+The JSON report can be kept to compare listener changes against.
+"""
 
 
 def to_percent(val):
     return "{0:.2f}".format(100.0 * val) + "%"
 
 
+def ratio(num, den):
+    return float(num) / den if den else None
+
+
+def cpu_time():
+    times = os.times()
+    return times[0] + times[1]
+
+
 class FileStream(object):
     MIN_S_TO_DEBUG = 5.0
 
@@ -42,12 +74,17 @@ class FileStream(object):
         self.sample_width = self.file.getsampwidth()
         self.last_update_time = 0.0
 
-        self.total_s = self.size / self.sample_rate / self.sample_width
+        self.total_s = float(self.size) / self.sample_rate
         if self.total_s > self.MIN_S_TO_DEBUG:
             self.debug = True
         else:
             self.debug = False
 
+    @property
+    def position(self):
+        """Seconds of audio read so far."""
+        return float(self.file.tell()) / self.sample_rate
+
     def calc_progress(self):
         return float(self.file.tell()) / self.size
 
@@ -81,33 +118,93 @@ class FileMockMicrophone(AudioSource):
         self.stream.close()
 
 
+class SpeechTracker(object):
+    """Wraps the listener's VAD, remembering when speech was last heard."""
+
+    def __init__(self, vad):
+        self.vad = vad
+        self.stream = None
+        self.last_speech = 0.0
+
+    def process(self, chunk, sample_width):
+        return self.vad.process(chunk, sample_width)
+
+    def is_speech(self, threshold):
+        speech = self.vad.is_speech(threshold)
+        if speech:
+            self.last_speech = self.stream.position
+        return speech
+
+    def reset(self):
+        self.vad.reset()
+
+
 class AudioTester(object):
-    def __init__(self, samp_rate):
-        print  # Pad debug messages
-        self.ww_recognizer = RecognizerLoop().create_mycroft_recognizer(
-            samp_rate, 'en-us')
+    def __init__(self):
+        print()  # Pad debug messages
+        config = Configuration.get()
+        word = config.get('listener', {}).get('wake_word', 'hey mycroft')
+        self.ww_recognizer = HotWordFactory.create_hotword(
+            word, lang=config.get('lang', 'en-us'))
         self.listener = ResponsiveRecognizer(self.ww_recognizer)
-        print
+        # Never play the confirmation sound while replaying
+        self.listener.config = dict(self.listener.config,
+                                    confirm_listening=False)
+        self.tracker = SpeechTracker(self.listener.vad)
+        self.listener.vad = self.tracker
+        print()
 
     def test_audio(self, file_name):
+        """
+        Replay a file through the listener.
+
+        Args:
+            file_name (str): path of the WAV file
+
+        Returns:
+            dict: durations, CPU time and the utterances recorded, each
+                  with the audio time of the wake word, the end of speech
+                  and the end of the recording
+        """
         source = FileMockMicrophone(file_name)
+        self.tracker.stream = source.stream
+        self.tracker.last_speech = 0.0
         ee = pyee.EventEmitter()
+        utterances = []
 
-        class SharedData:
-            times_found = 0
+        def on_record_begin():
+            utterances.append({'wake_word_at': source.stream.position})
 
-        def on_found_wake_word():
-            SharedData.times_found += 1
+        def on_record_end():
+            record_end = source.stream.position
+            speech_end = self.tracker.last_speech
+            utterances[-1].update({
+                'speech_end_at': speech_end,
+                'record_end_at': record_end,
+                'latency': record_end - speech_end
+            })
 
-        ee.on('recognizer_loop:record_begin', on_found_wake_word)
+        ee.on('recognizer_loop:record_begin', on_record_begin)
+        ee.on('recognizer_loop:record_end', on_record_end)
 
+        cpu_start = cpu_time()
+        wall_start = time.time()
         try:
             while True:
                 self.listener.listen(source, ee)
         except EOFError:
             pass
+        finally:
+            source.close()
 
-        return SharedData.times_found
+        return {
+            'file': basename(file_name),
+            'duration': source.stream.total_s,
+            'cpu_seconds': cpu_time() - cpu_start,
+            'wall_seconds': time.time() - wall_start,
+            'detections': len(utterances),
+            'utterances': utterances
+        }
 
 
 class Color:
@@ -122,7 +219,8 @@ def bold_str(val):
 
 
 def get_root_dir():
-    return dirname(dirname(__file__))
+    """Directory of the mycroft package, relative paths start from it."""
+    return dirname(dirname(abspath(__file__)))
 
 
 def get_file_names(folder):
@@ -138,88 +236,159 @@ def get_file_names(folder):
 
 
 def test_audio_files(tester, file_names, on_file_finish):
-    num_found = 0
+    results = []
     for file_name in file_names:
-        short_name = os.path.basename(file_name)
-        times_found = tester.test_audio(file_name)
-
-        num_found += times_found
-        on_file_finish(short_name, times_found)
+        result = tester.test_audio(file_name)
+        results.append(result)
+        on_file_finish(result['file'], result['detections'])
 
-    return num_found
-
-
-def file_frame_rate(file_name):
-    wf = wave.open(file_name, 'rb')
-    frame_rate = wf.getframerate()
-    wf.close()
-    return frame_rate
+    return results
 
 
 def print_ww_found_status(word, short_name):
     print("Wake word " + bold_str(word) + " - " + short_name)
 
 
-def test_false_negative(directory):
+def test_false_negative(tester, directory):
     file_names = get_file_names(directory)
 
-    # Grab audio format info from first file
-    tester = AudioTester(file_frame_rate(file_names[0]))
-
     def on_file_finish(short_name, times_found):
         not_found_str = Color.RED + "Not found"
         found_str = Color.GREEN + "Detected "
         status_str = not_found_str if times_found == 0 else found_str
         print_ww_found_status(status_str, short_name)
 
-    num_found = test_audio_files(tester, file_names, on_file_finish)
+    results = test_audio_files(tester, file_names, on_file_finish)
+    num_found = len([r for r in results if r['detections'] > 0])
     total = len(file_names)
 
-    print
+    print()
     print("Found " + bold_str(num_found) + " out of " + bold_str(total))
     print(bold_str(to_percent(float(num_found) / total)) + " accuracy.")
-    print
+    print()
+    return results
 
 
-def test_false_positive(directory):
+def test_false_positive(tester, directory):
     file_names = get_file_names(directory)
 
-    # Grab audio format info from first file
-    tester = AudioTester(file_frame_rate(file_names[0]))
-
     def on_file_finish(short_name, times_found):
         not_found_str = Color.GREEN + "Not found"
         found_str = Color.RED + "Detected "
         status_str = not_found_str if times_found == 0 else found_str
         print_ww_found_status(status_str, short_name)
 
-    num_found = test_audio_files(tester, file_names, on_file_finish)
+    results = test_audio_files(tester, file_names, on_file_finish)
+    num_found = sum(r['detections'] for r in results)
     total = len(file_names)
 
-    print
+    print()
     print("Found " + bold_str(num_found) + " false positives")
     print("in " + bold_str(str(total)) + " files")
-    print
-
-
-def run_test():
-    directory = join('audio-accuracy-test', 'data')
-
+    print()
+    return results
+
+
+def create_report(tester, positives, negatives):
+    """
+    Summarize the results of a run.
+
+    Args:
+        tester (AudioTester): tester used for the run
+        positives (list): results for files with the wake word
+        negatives (list): results for files without the wake word
+
+    Returns:
+        dict: JSON serializable report
+    """
+    results = positives + negatives
+    audio_s = sum(r['duration'] for r in results)
+    cpu_s = sum(r['cpu_seconds'] for r in results)
+    wall_s = sum(r['wall_seconds'] for r in results)
+    negative_s = sum(r['duration'] for r in negatives)
+    false_alarms = sum(r['detections'] for r in negatives)
+    latencies = [u['latency'] for r in results
+                 for u in r['utterances'] if 'latency' in u]
+
+    return {
+        'created': time.time(),
+        'wake_word': tester.ww_recognizer.key_phrase,
+        'wake_word_module': tester.ww_recognizer.__class__.__name__,
+        'vad_module': tester.tracker.vad.__class__.__name__,
+        'hit_rate': ratio(len([r for r in positives if r['detections']]),
+                          len(positives)),
+        'false_alarms': false_alarms,
+        'false_alarms_per_hour': ratio(3600 * false_alarms, negative_s),
+        'audio_seconds': audio_s,
+        'cpu_seconds': cpu_s,
+        'wall_seconds': wall_s,
+        'cpu_per_audio_second': ratio(cpu_s, audio_s),
+        'realtime_factor': ratio(audio_s, wall_s),
+        'segmentation_latency': {
+            'count': len(latencies),
+            'mean': ratio(sum(latencies), len(latencies)),
+            'max': max(latencies) if latencies else None
+        },
+        'with_wake_word': positives,
+        'without_wake_word': negatives
+    }
+
+
+def print_report(report):
+    def fmt(val, pattern='{0:.3f}'):
+        return 'n/a' if val is None else pattern.format(val)
+
+    latency = report['segmentation_latency']
+    print("Hit rate:             " + fmt(report['hit_rate'], '{0:.2%}'))
+    print("False alarms / hour:  " + fmt(report['false_alarms_per_hour']))
+    print("CPU s / audio s:      " + fmt(report['cpu_per_audio_second']))
+    print("Faster than realtime: " + fmt(report['realtime_factor'],
+                                         '{0:.1f}x'))
+    print("Segmentation latency: " + fmt(latency['mean']) + " s mean, " +
+          fmt(latency['max']) + " s max")
+
+
+def run_test(directory, output=None):
     false_neg_dir = join(directory, 'with_wake_word', 'query_after')
     false_pos_dir = join(directory, 'without_wake_word')
 
+    tester = AudioTester()
+    positives = []
+    negatives = []
     try:
-        test_false_negative(false_neg_dir)
+        positives = test_false_negative(tester, false_neg_dir)
     except IOError:
         print(bold_str("Warning: No wav files found in " + false_neg_dir))
 
     try:
-        test_false_positive(false_pos_dir)
+        negatives = test_false_positive(tester, false_pos_dir)
     except IOError:
         print(bold_str("Warning: No wav files found in " + false_pos_dir))
 
+    report = create_report(tester, positives, negatives)
+    print_report(report)
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print("Report written to " + output)
+
     print("Complete!")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-d', '--directory', dest='directory',
+        default=join('audio-accuracy-test', 'data'),
+        help="Corpus directory, relative paths are resolved from the "
+             "mycroft package (Default: audio-accuracy-test/data)")
+    parser.add_argument(
+        '-o', '--output', dest='output',
+        help="Write a JSON report to this file")
+    args = parser.parse_args()
+    run_test(args.directory, args.output)
 
 
 if __name__ == "__main__":
-    run_test()
+    main()
@@ -0,0 +1,159 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+"""Data structures used by the speech client to hold raw audio."""
+
+
+class CyclicAudioBuffer(object):
+    """Fixed size circular buffer for raw audio.
+
+    The memory is allocated once, when the buffer is created.  Each chunk
+    is written twice, at its position and at its position plus the buffer
+    size.  This keeps the most recent audio of any length (up to the buffer
+    size) available as one contiguous block that can be handed out as a
+    memoryview without copying.
+
+    Arguments:
+        size (int): capacity of the buffer in bytes
+        initial_data (bytes): data to place in the buffer at creation
+    """
+
+    def __init__(self, size, initial_data=b''):
+        self.size = int(size)
+        self._buffer = bytearray(2 * self.size)
+        self._view = memoryview(self._buffer)
+        self._pos = 0
+        self._length = 0
+        self.append(initial_data)
+
+    def __len__(self):
+        return self._length
+
+    def clear(self):
+        """Drop all audio currently held by the buffer."""
+        self._pos = 0
+        self._length = 0
+
+    def append(self, data):
+        """Add data to the end of the buffer.
+
+        Once the buffer is full the oldest audio is overwritten.
+
+        Arguments:
+            data (bytes): raw audio to add
+        """
+        size = self.size
+        data_len = len(data)
+        if data_len == 0 or size == 0:
+            return
+        if data_len > size:
+            # Only the tail of the data can fit
+            data = memoryview(data)[data_len - size:]
+            data_len = size
+
+        pos = self._pos
+        end = pos + data_len
+        self._buffer[pos:end] = data
+        if end <= size:
+            self._buffer[pos + size:end + size] = data
+        else:
+            split = size - pos
+            self._buffer[pos + size:] = data[:split]
+            self._buffer[:end - size] = data[split:]
+
+        self._pos = end % size
+        self._length = min(self._length + data_len, size)
+
+    def get_last(self, size):
+        """Get the most recent audio in the buffer.
+
+        Arguments:
+            size (int): number of bytes wanted, capped at the amount of
+                        audio in the buffer
+
+        Returns:
+            memoryview: contiguous view of the last bytes.  The view is
+                        only valid until the next call to append().
+        """
+        size = max(0, min(int(size), self._length))
+        end = self._pos + self.size
+        return self._view[end - size:end]
+
+    def get(self):
+        """Get all audio in the buffer, oldest first.
+
+        Returns:
+            memoryview: contiguous view of the buffer contents
+        """
+        return self.get_last(self._length)
+
+
+class PhraseBuffer(object):
+    """Append-only buffer for recording a phrase.
+
+    Memory for the expected recording length is allocated up front and
+    every chunk is copied exactly once, into place.  Should a recording
+    outgrow the estimate the storage is doubled, keeping appends amortized
+    constant time.
+
+    Arguments:
+        size (int): expected size of the recording in bytes
+        initial_data (bytes): data to start the recording with
+    """
+
+    def __init__(self, size, initial_data=b''):
+        self._buffer = bytearray(max(int(size), 1))
+        self._length = 0
+        self.append(initial_data)
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def capacity(self):
+        return len(self._buffer)
+
+    def clear(self):
+        """Start a new recording, reusing the allocated memory."""
+        self._length = 0
+
+    def append(self, data):
+        """Add a chunk of audio to the end of the recording.
+
+        Arguments:
+            data (bytes): raw audio to add
+        """
+        end = self._length + len(data)
+        if end > len(self._buffer):
+            grown = bytearray(max(end, 2 * len(self._buffer)))
+            grown[:self._length] = memoryview(self._buffer)[:self._length]
+            self._buffer = grown
+        self._buffer[self._length:end] = data
+        self._length = end
+
+    def get_view(self):
+        """Get the recorded audio without copying it.
+
+        Returns:
+            memoryview: view of the recording, valid until the next append
+        """
+        return memoryview(self._buffer)[:self._length]
+
+    def get_frame_data(self):
+        """Get the recorded audio as a single immutable buffer.
+
+        Returns:
+            bytes: the complete recording
+        """
+        return self.get_view().tobytes()
@@ -0,0 +1,265 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import print_function
+import argparse
+import audioop
+import json
+import time
+import wave
+from copy import deepcopy
+from glob import glob
+from multiprocessing import Pool
+from os.path import join
+
+from mycroft.client.speech.hotword_factory import HotWordFactory
+from mycroft.configuration import Configuration
+
+"""
+Hotword Evaluation
+Scores a wake word engine against a corpus of recordings, for example the
+clips collected with "save_wake_words_dir".  Each file is scored in one
+piece using HotWordEngine.score() on a pool of worker processes, each with
+its own engine.  The report holds the score of every file, an ROC curve
+over all thresholds and the throughput.
+
+Usage: python -m mycroft.client.speech.hotword_eval -p yes/ -n no/ -j 4
+"""
+
+_engine = None
+_sample_rate = None
+
+
+def read_wav(file_name, sample_rate):
+    """
+        Read a WAV file as 16 bit mono audio at the given rate.
+
+        Args:
+            file_name (str): path of the WAV file
+            sample_rate (int): rate the audio is converted to
+
+        Returns:
+            tuple: raw audio and its duration in seconds
+    """
+    wav = wave.open(file_name, 'rb')
+    try:
+        width = wav.getsampwidth()
+        channels = wav.getnchannels()
+        rate = wav.getframerate()
+        frames = wav.readframes(wav.getnframes())
+    finally:
+        wav.close()
+    if channels == 2:
+        frames = audioop.tomono(frames, width, 0.5, 0.5)
+    if width != 2:
+        frames = audioop.lin2lin(frames, width, 2)
+    if rate != sample_rate:
+        frames, _ = audioop.ratecv(frames, 2, 1, rate, sample_rate, None)
+    return frames, len(frames) / 2.0 / sample_rate
+
+
+def score_file(engine, file_name, sample_rate):
+    """
+        Score a single recording.
+
+        Returns:
+            dict: file name, score (None if not spotted), duration of the
+                  audio and time spent scoring it
+    """
+    frame_data, duration = read_wav(file_name, sample_rate)
+    started = time.time()
+    score = engine.score(frame_data)
+    return {
+        'file': file_name,
+        'score': score,
+        'duration': duration,
+        'time': time.time() - started
+    }
+
+
+def _init_worker(hotword, config, lang, sample_rate):
+    global _engine, _sample_rate
+    _engine = HotWordFactory.create_hotword(hotword, config, lang)
+    _sample_rate = sample_rate
+
+
+def _score_worker(file_name):
+    return score_file(_engine, file_name, _sample_rate)
+
+
+def score_files(file_names, hotword='hey mycroft', config=None,
+                lang='en-us', processes=None, sample_rate=16000):
+    """
+        Score recordings with a pool of processes, one engine per process.
+
+        Args:
+            file_names (list): WAV files to score
+            hotword (str): name of the hotword in the hotwords config
+            config (dict): hotwords config, the user config if None
+            lang (str): language of the hotword
+            processes (int): worker processes, one per CPU if None.  With
+                             a single process no pool is created.
+            sample_rate (int): rate the engine expects the audio in
+
+        Returns:
+            list: results of score_file(), in the order of file_names
+    """
+    args = (hotword, config, lang, sample_rate)
+    if processes == 1:
+        _init_worker(*args)
+        return [_score_worker(f) for f in file_names]
+    pool = Pool(processes, _init_worker, args)
+    try:
+        return pool.map(_score_worker, file_names, chunksize=1)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def roc_curve(positive_scores, negative_scores):
+    """
+        Compute an ROC curve, with one point per distinct score.
+
+        A recording is accepted at a threshold when its score is at least
+        the threshold.  Recordings without a score (None) are never
+        accepted.
+
+        Args:
+            positive_scores (list): scores of recordings with the wake word
+            negative_scores (list): scores of recordings without it
+
+        Returns:
+            list: dicts with threshold, true_positive_rate and
+                  false_positive_rate, from the highest threshold down
+    """
+    positive = [s for s in positive_scores if s is not None]
+    negative = [s for s in negative_scores if s is not None]
+    num_positive = max(len(positive_scores), 1)
+    num_negative = max(len(negative_scores), 1)
+    curve = []
+    for threshold in sorted(set(positive + negative), reverse=True):
+        curve.append({
+            'threshold': threshold,
+            'true_positive_rate':
+                sum(s >= threshold for s in positive) / float(num_positive),
+            'false_positive_rate':
+                sum(s >= threshold for s in negative) / float(num_negative)
+        })
+    return curve
+
+
+def best_threshold(curve):
+    """Point of the curve maximizing true minus false positive rate."""
+    if not curve:
+        return None
+    return max(curve, key=lambda p: (p['true_positive_rate'] -
+                                     p['false_positive_rate']))
+
+
+def evaluate(positive_files, negative_files, hotword='hey mycroft',
+             config=None, lang='en-us', processes=None, sample_rate=16000):
+    """
+        Score positive and negative recordings and build a report.
+
+        Returns:
+            dict: per file results, ROC curve, best threshold and
+                  throughput
+    """
+    started = time.time()
+    results = score_files(positive_files + negative_files, hotword, config,
+                          lang, processes, sample_rate)
+    elapsed = max(time.time() - started, 1e-9)
+    positive = results[:len(positive_files)]
+    negative = results[len(positive_files):]
+    curve = roc_curve([r['score'] for r in positive],
+                      [r['score'] for r in negative])
+    audio_sec = sum(r['duration'] for r in results)
+    return {
+        'hotword': hotword,
+        'positive': positive,
+        'negative': negative,
+        'roc': curve,
+        'best': best_threshold(curve),
+        'throughput': {
+            'files': len(results),
+            'seconds': elapsed,
+            'files_per_sec': len(results) / elapsed,
+            'audio_sec_per_sec': audio_sec / elapsed
+        }
+    }
+
+
+def print_report(report):
+    throughput = report['throughput']
+    print('Scored {} files in {:.2f}s ({:.1f} files/s, {:.1f}x realtime)'
+          .format(throughput['files'], throughput['seconds'],
+                  throughput['files_per_sec'],
+                  throughput['audio_sec_per_sec']))
+    print('{:>12} {:>8} {:>8}'.format('threshold', 'TPR', 'FPR'))
+    for point in report['roc']:
+        print('{:>12.4g} {:>8.3f} {:>8.3f}'.format(
+            point['threshold'], point['true_positive_rate'],
+            point['false_positive_rate']))
+    best = report['best']
+    if best:
+        print('Best threshold: {:.4g} (TPR {:.3f}, FPR {:.3f})'.format(
+            best['threshold'], best['true_positive_rate'],
+            best['false_positive_rate']))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-w', '--wake-word', dest='hotword', default=None,
+        help="Hotword to evaluate (Default: the configured wake word)")
+    parser.add_argument(
+        '-p', '--positive', dest='positive', default=None,
+        help="Directory of WAV files containing the wake word")
+    parser.add_argument(
+        '-n', '--negative', dest='negative', default=None,
+        help="Directory of WAV files without the wake word")
+    parser.add_argument(
+        '-t', '--threshold', dest='threshold', type=float, default=None,
+        help="Override the configured detection threshold")
+    parser.add_argument(
+        '-j', '--processes', dest='processes', type=int, default=None,
+        help="Worker processes (Default: one per CPU)")
+    parser.add_argument(
+        '-o', '--output', dest='output', default=None,
+        help="Write the full report as JSON to this file")
+    args = parser.parse_args()
+    if not args.positive and not args.negative:
+        parser.error('Give at least one of --positive and --negative')
+
+    config = Configuration.get()
+    listener = config.get('listener', {})
+    hotword = args.hotword or listener.get('wake_word', 'hey mycroft')
+    hotwords = deepcopy(config.get('hotwords', {}))
+    if args.threshold is not None:
+        hotwords.setdefault(hotword, {})['threshold'] = args.threshold
+
+    def wavs(directory):
+        return sorted(glob(join(directory, '*.wav'))) if directory else []
+
+    report = evaluate(wavs(args.positive), wavs(args.negative), hotword,
+                      hotwords, config.get('lang', 'en-us'), args.processes,
+                      listener.get('sample_rate', 16000))
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
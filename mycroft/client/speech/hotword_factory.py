@@ -12,6 +12,7 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import platform
 import tempfile
 import time
 
@@ -19,11 +20,13 @@ import os
 from os.path import dirname, exists, join, abspath, expanduser, isdir, isfile
 
 from os import mkdir
-from time import time as get_time
 
+from mycroft.client.speech.data_structures import CyclicAudioBuffer
+from mycroft.client.speech.hotword_process import HotwordProcess
+from mycroft.client.speech.model_manager import ModelManager
 from mycroft.configuration import Configuration
-from subprocess import Popen, PIPE, call
-from threading import Thread
+from subprocess import call
+from threading import Condition
 
 from mycroft.util import resolve_resource_file
 from mycroft.util.log import LOG
@@ -43,13 +46,58 @@ class HotWordEngine(object):
             config = config.get(self.key_phrase, {})
         self.config = config
         self.listener_config = Configuration.get().get("listener", {})
+        # Seconds into the audio last passed to found_wake_word() at which
+        # the wake word ended, None if the engine can't tell
+        self.wake_word_end = None
+        # True if the engine detects the wake word in the audio passed to
+        # update(), making found_wake_word() cheap enough for every chunk
+        self.streaming = False
+        # Phrase detected by the last successful found_wake_word() and the
+        # engine's confidence in it, for engines spotting several phrases
+        self.found_phrase = self.key_phrase
+        self.confidence = None
+
+    @property
+    def found_message(self):
+        """
+            Bus message configured for found_phrase, None if the phrase
+            should start a recording like the wake word.
+        """
+        for phrase, config in self.config.get("keyphrases", {}).items():
+            if str(phrase).lower() == self.found_phrase:
+                return config.get("message")
+        return None
 
     def found_wake_word(self, frame_data):
         return False
 
+    def score(self, frame_data):
+        """
+            Score a complete recording, used for offline evaluation.
+
+            Engines able to measure how well the audio matches override
+            this.  The default only tells whether the wake word was found.
+
+            Args:
+                frame_data (bytes): raw audio of the recording
+
+            Returns:
+                float: higher means more likely to hold the wake word,
+                       None if the wake word wasn't spotted at all
+        """
+        return 1.0 if self.found_wake_word(frame_data) else None
+
     def update(self, chunk):
         pass
 
+    def reset(self):
+        """Forget wake words found in the audio passed to update() so far."""
+        pass
+
+    def stop(self):
+        """Release the resources of the engine, e.g. when it's replaced."""
+        pass
+
 
 class PocketsphinxHotWord(HotWordEngine):
     def __init__(self, key_phrase="hey mycroft", config=None, lang="en-us"):
@@ -64,20 +112,59 @@ class PocketsphinxHotWord(HotWordEngine):
                               "Hotword class pocketsphinx")
         # Hotword module params
         self.phonemes = self.config.get("phonemes", "HH EY . M AY K R AO F T")
-        self.num_phonemes = len(self.phonemes.split())
         self.threshold = self.config.get("threshold", 1e-90)
         self.sample_rate = self.listener_config.get("sample_rate", 1600)
-        dict_name = self.create_dict(self.key_phrase, self.phonemes)
+        # Other phrases spotted in the same decoding pass
+        self.keyphrases = {self.key_phrase: {"phonemes": self.phonemes,
+                                             "threshold": self.threshold}}
+        for phrase, phrase_config in self.config.get("keyphrases",
+                                                     {}).items():
+            self.keyphrases[str(phrase).lower()] = phrase_config
+        self.num_phonemes = max(len(c["phonemes"].split())
+                                for c in self.keyphrases.values())
+        dict_name = self.create_dict(self.keyphrases)
         config = self.create_config(dict_name, Decoder.default_config())
+        self.frame_rate = float(config.get_int('-frate'))
         self.decoder = Decoder(config)
 
-    def create_dict(self, key_phrase, phonemes):
+        self.streaming = self.config.get("streaming", False)
+        if self.streaming:
+            # update() keeps an utterance open on its own decoder, so
+            # transcribe() and score() can still decode whole recordings
+            self.stream_decoder = Decoder(config)
+            self.bytes_per_sec = self.sample_rate * 2  # 16 bit audio
+            # The open utterance is restarted after this many bytes,
+            # keeping enough audio to hold a wake word being spoken
+            self.max_utt_bytes = int(self.config.get(
+                "max_utterance_sec", 10) * self.bytes_per_sec)
+            overlap_sec = self.num_phonemes * self.listener_config.get(
+                "phoneme_duration", 120) / 1000.0
+            self.overlap = CyclicAudioBuffer(
+                int(overlap_sec * self.sample_rate) * 2)
+            self.stream_bytes = 0  # Bytes passed to update()
+            self.wake_word_end_byte = None
+            self.found = False
+            self.start_utt()
+
+    def create_dict(self, keyphrases):
         (fd, file_name) = tempfile.mkstemp()
-        words = key_phrase.split()
-        phoneme_groups = phonemes.split('.')
+        written = set()
         with os.fdopen(fd, 'w') as f:
-            for word, phoneme in zip(words, phoneme_groups):
-                f.write(word + ' ' + phoneme + '\n')
+            for key_phrase, phrase_config in keyphrases.items():
+                words = key_phrase.split()
+                phoneme_groups = phrase_config["phonemes"].split('.')
+                for word, phoneme in zip(words, phoneme_groups):
+                    if word not in written:
+                        written.add(word)
+                        f.write(word + ' ' + phoneme + '\n')
+        return file_name
+
+    def create_kws(self, keyphrases):
+        (fd, file_name) = tempfile.mkstemp()
+        with os.fdopen(fd, 'w') as f:
+            for key_phrase, phrase_config in keyphrases.items():
+                threshold = float(phrase_config.get("threshold", 1e-90))
+                f.write('{} /{!r}/\n'.format(key_phrase, threshold))
         return file_name
 
     def create_config(self, dict_name, config):
@@ -86,8 +173,11 @@ class PocketsphinxHotWord(HotWordEngine):
             LOG.error('PocketSphinx model not found at ' + str(model_file))
         config.set_string('-hmm', model_file)
         config.set_string('-dict', dict_name)
-        config.set_string('-keyphrase', self.key_phrase)
-        config.set_float('-kws_threshold', float(self.threshold))
+        if len(self.keyphrases) > 1:
+            config.set_string('-kws', self.create_kws(self.keyphrases))
+        else:
+            config.set_string('-keyphrase', self.key_phrase)
+            config.set_float('-kws_threshold', float(self.threshold))
         config.set_float('-samprate', self.sample_rate)
         config.set_int('-nfft', 2048)
         config.set_string('-logfn', '/dev/null')
@@ -102,12 +192,133 @@ class PocketsphinxHotWord(HotWordEngine):
             metrics.timer("mycroft.stt.local.time_s", time.time() - start)
         return self.decoder.hyp()
 
+    def score(self, frame_data):
+        """
+            Score a recording as log10 of the best detection score of the
+            key phrase, comparable to log10 of the threshold.  Only
+            detections above the configured threshold are seen, so use a
+            low threshold when evaluating.
+        """
+        self.transcribe(frame_data)
+        probs = [seg.prob for seg in self.decoder.seg()
+                 if seg.word == self.key_phrase]
+        if not probs:
+            return None
+        return self.decoder.get_logmath().log_to_log10(max(probs))
+
+    def start_utt(self, data=b''):
+        """
+            Start a new utterance for streaming detection.
+
+            Args:
+                data (bytes): audio already fed through update() that the
+                              utterance should start with
+        """
+        self.stream_decoder.start_utt()
+        self.utt_start_byte = self.stream_bytes - len(data)
+        if data:
+            self.stream_decoder.process_raw(data, False, False)
+
+    def restart_utt(self, data=b''):
+        self.stream_decoder.end_utt()
+        self.start_utt(data)
+
+    def last_detection(self, decoder):
+        """
+            Get the last key phrase spotted in the current hypothesis.
+
+            Args:
+                decoder (Decoder): decoder holding the hypothesis
+
+            Returns:
+                tuple: (phrase, end, confidence) where end is in seconds
+                       into the utterance and confidence is the detection
+                       score, comparable to the phrase threshold.  None if
+                       no phrase was spotted.
+        """
+        last = None
+        for seg in decoder.seg():
+            if seg.word in self.keyphrases and (
+                    last is None or seg.end_frame >= last.end_frame):
+                last = seg
+        if last is None:
+            return None
+        end = (last.end_frame + 1) / self.frame_rate
+        confidence = decoder.get_logmath().exp(last.prob)
+        return last.word, end, confidence
+
+    def _detect(self, decoder, hyp):
+        """
+            Update found_phrase and confidence from a hypothesis.
+
+            Args:
+                decoder (Decoder): decoder holding the hypothesis
+                hyp (Hypothesis): hypothesis holding a phrase
+
+            Returns:
+                float: end of the phrase in seconds into the utterance, None
+                       if unknown
+        """
+        detection = self.last_detection(decoder)
+        if detection:
+            self.found_phrase, end, self.confidence = detection
+            return end
+        # No segmentation available, the hypothesis holds the phrase
+        self.found_phrase = hyp.hypstr.lower().strip()
+        self.confidence = None
+        return None
+
+    def update(self, chunk):
+        if not self.streaming:
+            return
+        self.stream_decoder.process_raw(chunk, False, False)
+        self.stream_bytes += len(chunk)
+        hyp = self.stream_decoder.hyp()
+        if hyp and hyp.hypstr:
+            self.found = True
+            end = self._detect(self.stream_decoder, hyp)
+            self.wake_word_end_byte = self.stream_bytes if end is None else \
+                self.utt_start_byte + int(end * self.sample_rate) * 2
+            # Don't keep any audio, it would detect the same wake word again
+            self.overlap.clear()
+            self.restart_utt()
+        else:
+            self.overlap.append(chunk)
+            if self.stream_bytes - self.utt_start_byte > self.max_utt_bytes:
+                self.reset()
+                self.restart_utt(self.overlap.get().tobytes())
+
+    def reset(self):
+        if self.streaming:
+            self.found = False
+            self.wake_word_end_byte = None
+
     def found_wake_word(self, frame_data):
+        if self.streaming:
+            found = self.found
+            self.found = False
+            self.wake_word_end = None
+            if found:
+                # Position of the wake word end in frame_data, which ends
+                # with the audio last passed to update()
+                after = self.stream_bytes - self.wake_word_end_byte
+                end = max(len(frame_data) - after, 0)
+                self.wake_word_end = float(end) / self.bytes_per_sec
+            return found
+
         hyp = self.transcribe(frame_data)
-        return hyp and self.key_phrase in hyp.hypstr.lower()
+        self.wake_word_end = None
+        if hyp and hyp.hypstr:
+            self.wake_word_end = self._detect(self.decoder, hyp)
+            return True
+        return False
 
 
 class PreciseHotword(HotWordEngine):
+    # Samples precise-stream reads per prediction
+    CHUNK_SAMPLES = 1024
+    SCORE_TIMEOUT = 10.0
+
     def __init__(self, key_phrase="hey mycroft", config=None, lang="en-us"):
         super(PreciseHotword, self).__init__(key_phrase, config, lang)
         self.update_freq = 24  # in hours
@@ -124,19 +335,32 @@ class PreciseHotword(HotWordEngine):
             mkdir(model_folder)
         model_path = join(model_folder, model_name)
 
-        exe_file = self.find_download_exe()
-        LOG.info('Found precise executable: ' + exe_file)
-        self.update_model(model_name, model_path)
-
-        args = [exe_file, model_path, '1024']
-        self.proc = Popen(args, stdin=PIPE, stdout=PIPE)
         self.has_found = False
         self.cooldown = 20
-        t = Thread(target=self.check_stdout)
-        t.daemon = True
-        t.start()
-
-    def find_download_exe(self):
+        self.models = ModelManager(self.on_models_updated, self.update_freq)
+        exe_file = self.find_exe()
+        if not exe_file:
+            exe_file = expanduser('~/.mycroft/precise/' + self.exe_name)
+            url = self.dist_url + platform.machine() + '/' + self.exe_name
+            self.models.add(exe_file, url, refresh=False, executable=True)
+        LOG.info('Using precise executable: ' + exe_file)
+        url = self.models_url + model_name.replace(' ', '%20')
+        self.models.add(model_path, url)
+        self.models.add(model_path + '.params', url + '.params')
+
+        args = [exe_file, model_path, str(self.CHUNK_SAMPLES)]
+        self.scores = None  # Predictions collected by score()
+        self.scores_ready = Condition()
+        self.runner = HotwordProcess(args, self.on_prediction)
+        # Start from the cached files, updates are downloaded in the
+        # background and loaded once they are complete
+        if self.models.is_cached():
+            self.runner.start()
+        else:
+            LOG.info('Waiting for precise files to be downloaded')
+        self.models.start()
+
+    def find_exe(self):
         exe_file = resolve_resource_file(self.exe_name)
         if exe_file:
             return exe_file
@@ -149,57 +373,69 @@ class PreciseHotword(HotWordEngine):
         exe_file = expanduser('~/.mycroft/precise/' + self.exe_name)
         if isfile(exe_file):
             return exe_file
-
-        import platform
-        import stat
-
-        def snd_msg(cmd):
-            """Send message to faceplate"""
-            Popen('echo "' + cmd + '" > /dev/ttyAMA0', shell=True)
-
-        arch = platform.machine()
-
-        url = self.dist_url + arch + '/' + self.exe_name
-
-        snd_msg('mouth.text=Updating Listener...')
-        self.download(url, exe_file)
-        snd_msg('mouth.reset')
-
-        os.chmod(exe_file, os.stat(exe_file).st_mode | stat.S_IEXEC)
-        Popen('echo "mouth.reset" > /dev/ttyAMA0', shell=True)
-        return exe_file
-
-    @staticmethod
-    def download(url, filename):
-        import shutil
-        from urllib2 import urlopen
-        LOG.info('Downloading: ' + url)
-        req = urlopen(url)
-        with open(filename, 'wb') as fp:
-            shutil.copyfileobj(req, fp)
-
-    def update_model(self, name, file_name):
-        if isfile(file_name):
-            stat = os.stat(file_name)
-            if get_time() - stat.st_mtime < self.update_freq * 60 * 60:
+        return None
+
+    def on_models_updated(self):
+        if self.runner.running:
+            self.runner.restart()
+        elif self.models.is_cached():
+            self.runner.start()
+
+    def on_prediction(self, line):
+        score = float(line)
+        self.runner.stats.level('score', score)
+        with self.scores_ready:
+            if self.scores is not None:
+                self.scores.append(score)
+                self.scores_ready.notify()
                 return
-        name = name.replace(' ', '%20')
-        url = self.models_url + name
-        self.download(url, file_name)
-        self.download(url + '.params', file_name + '.params')
-
-    def check_stdout(self):
-        while True:
-            line = self.proc.stdout.readline()
-            if self.cooldown > 0:
-                self.cooldown -= 1
-                self.has_found = False
-                continue
-            self.has_found = float(line) > 0.5
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            self.has_found = False
+            return
+        self.has_found = score > 0.5
+        if self.has_found:
+            self.runner.stats.timer('detection_score', score)
 
     def update(self, chunk):
-        self.proc.stdin.write(chunk)
-        self.proc.stdin.flush()
+        self.runner.write(chunk)
+
+    def get_stats(self):
+        return self.runner.get_stats()
+
+    def stop(self):
+        self.models.stop()
+        self.runner.stop()
+
+    def score(self, frame_data):
+        """
+            Score a recording as the highest prediction of the network.
+            The process keeps its state between recordings, so nothing
+            else should be fed to the engine while scoring.  None if the
+            process isn't running or doesn't take the audio within
+            SCORE_TIMEOUT, e.g. while the model is being downloaded.
+        """
+        if not self.runner.running:
+            return None
+        chunk_size = self.CHUNK_SAMPLES * 2  # 16 bit audio
+        frame_data += b'\0' * (-len(frame_data) % chunk_size)
+        num_chunks = len(frame_data) // chunk_size
+        with self.scores_ready:
+            self.scores = []
+        end = time.time() + self.SCORE_TIMEOUT
+        for i in range(num_chunks):
+            chunk = frame_data[i * chunk_size:(i + 1) * chunk_size]
+            if not self.runner.write(chunk, block=True,
+                                     timeout=max(end - time.time(), 0)):
+                LOG.warning('Timed out feeding audio to ' + self.exe_name)
+                with self.scores_ready:
+                    self.scores = None
+                return None
+        with self.scores_ready:
+            while len(self.scores) < num_chunks and time.time() < end:
+                self.scores_ready.wait(end - time.time())
+            scores, self.scores = self.scores, None
+        return max(scores) if scores else None
 
     def found_wake_word(self, frame_data):
         if self.has_found and self.cooldown == 0:
@@ -0,0 +1,216 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+from collections import deque
+from Queue import Queue, Empty, Full
+from subprocess import Popen, PIPE
+from threading import Event, Lock, Thread
+
+from mycroft.client.speech.stats import PipelineStats
+from mycroft.util.log import LOG
+
+
+class HotwordProcess(object):
+    """
+    Supervised subprocess running an external streaming hotword engine.
+
+    Raw audio chunks are passed to the process on stdin and each line it
+    prints is handed to a callback.  Writes never block the caller: chunks
+    are queued for a writer thread and the oldest chunk is dropped when
+    the process can't keep up.  A process that exits or stops answering
+    is killed and restarted, waiting longer after each failure.
+
+    Latency is measured assuming the process prints one line per chunk,
+    as precise-stream does.
+
+    Arguments:
+        args (list): command line of the process
+        on_output (callable): called with every line printed
+        max_chunks (int): chunks queued before the oldest is dropped
+        stall_timeout (float): seconds without output, while audio is
+                               waiting for an answer, before the process
+                               is considered hung
+        min_backoff (float): seconds to wait before the first restart
+        max_backoff (float): longest wait between restarts
+    """
+    HEALTH_CHECK_SEC = 0.5
+
+    def __init__(self, args, on_output, max_chunks=50, stall_timeout=5.0,
+                 min_backoff=1.0, max_backoff=60.0):
+        self.args = args
+        self.on_output = on_output
+        self.stall_timeout = stall_timeout
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.queue = Queue(max_chunks)
+        self.stats = PipelineStats()
+        self.proc = None
+        self._sent = deque()  # Times chunks were written, oldest first
+        self._sent_lock = Lock()
+        self._stopped = Event()
+        self._reload = False
+        self._thread = None
+
+    @property
+    def name(self):
+        return self.args[0]
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = Thread(target=self._supervise)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._kill(self.proc)
+        if self._thread:
+            self._thread.join()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def restart(self):
+        """Restart the process right away, e.g. to load a new model."""
+        self._reload = True
+        self._kill(self.proc)
+
+    def write(self, chunk, block=False, timeout=None):
+        """
+            Queue a chunk of audio for the process.
+
+            Args:
+                chunk (bytes): raw audio
+                block (bool): wait for room in the queue instead of
+                              dropping the oldest chunk
+                timeout (float): seconds to wait for room when blocking,
+                                 None to wait as long as it takes
+
+            Returns:
+                bool: False if a blocking write timed out
+        """
+        if block:
+            try:
+                self.queue.put(chunk, timeout=timeout)
+                return True
+            except Full:
+                return False
+        while True:
+            try:
+                self.queue.put_nowait(chunk)
+                return True
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                    self.stats.increment('dropped_chunks')
+                except Empty:
+                    pass
+
+    def get_stats(self):
+        stats = self.stats.get()
+        stats['levels']['queued_chunks'] = self.queue.qsize()
+        return stats
+
+    def is_healthy(self, proc):
+        if proc.poll() is not None:
+            if not self._reload:
+                LOG.warning(self.name + ' exited with ' +
+                            str(proc.returncode))
+            return False
+        with self._sent_lock:
+            oldest = self._sent[0] if self._sent else None
+        if oldest and time.time() - oldest > self.stall_timeout:
+            LOG.warning(self.name + ' stopped answering')
+            self.stats.increment('stalls')
+            return False
+        return True
+
+    def _supervise(self):
+        backoff = self.min_backoff
+        while not self._stopped.is_set():
+            started = time.time()
+            try:
+                proc = Popen(self.args, stdin=PIPE, stdout=PIPE)
+            except OSError:
+                LOG.exception('Could not start ' + self.name)
+            else:
+                self._run(proc)
+            if self._stopped.is_set():
+                break
+            if self._reload:
+                self._reload = False
+                continue
+
+            # A process that ran for a while gets restarted quickly again
+            if time.time() - started > self.max_backoff:
+                backoff = self.min_backoff
+            self.stats.increment('restarts')
+            LOG.warning('Restarting {} in {} seconds'.format(self.name,
+                                                             backoff))
+            self._stopped.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def _run(self, proc):
+        self.proc = proc
+        with self._sent_lock:
+            self._sent.clear()
+        threads = [Thread(target=self._write_loop, args=(proc,)),
+                   Thread(target=self._read_loop, args=(proc,))]
+        for t in threads:
+            t.daemon = True
+            t.start()
+        while not self._stopped.is_set() and self.is_healthy(proc):
+            self._stopped.wait(self.HEALTH_CHECK_SEC)
+        self._kill(proc)
+        for t in threads:
+            t.join()
+        proc.stdin.close()
+        proc.stdout.close()
+
+    def _write_loop(self, proc):
+        while proc.poll() is None and not self._stopped.is_set():
+            try:
+                chunk = self.queue.get(timeout=self.HEALTH_CHECK_SEC)
+            except Empty:
+                continue
+            with self._sent_lock:
+                self._sent.append(time.time())
+            try:
+                proc.stdin.write(chunk)
+                proc.stdin.flush()
+            except (IOError, OSError, ValueError):
+                break  # Process died, the supervisor restarts it
+
+    def _read_loop(self, proc):
+        for line in iter(proc.stdout.readline, b''):
+            with self._sent_lock:
+                sent = self._sent.popleft() if self._sent else None
+            if sent:
+                self.stats.timer('latency_s', time.time() - sent)
+            self.stats.increment('lines')
+            try:
+                self.on_output(line)
+            except Exception:
+                LOG.exception('Error handling output of ' + self.name)
+
+    @staticmethod
+    def _kill(proc):
+        if proc and proc.poll() is None:
+            try:
+                proc.kill()
+                proc.wait()
+            except OSError:
+                pass  # Already gone
@@ -13,8 +13,9 @@
 # limitations under the License.
 #
 import time
-from Queue import Queue, Empty
-from threading import Thread
+from copy import deepcopy
+from Queue import Queue, Empty, Full
+from threading import Thread, Lock, RLock
 
 import speech_recognition as sr
 from pyee import EventEmitter
@@ -24,12 +25,49 @@ from requests.exceptions import ConnectionError
 import mycroft.dialog
 from mycroft.client.speech.hotword_factory import HotWordFactory
 from mycroft.client.speech.mic import MutableMicrophone, ResponsiveRecognizer
+from mycroft.client.speech.stats import PipelineStats
 from mycroft.configuration import Configuration
 from mycroft.metrics import MetricsAggregator
 from mycroft.session import SessionManager
-from mycroft.stt import STTFactory
+from mycroft.stt import STTFactory, StreamingSTT
 from mycroft.util.log import LOG
 
+# Stream messages sent from producer to consumer ahead of the AudioData
+STREAM_START = 'stream_start'
+STREAM_DATA = 'stream_data'
+
+
+class AudioStreamHandler(object):
+    """
+    AudioStreamHandler
+    passes the phrase being recorded to the consumer chunk by chunk, so a
+    StreamingSTT engine can transcribe while the user is still speaking.
+    The complete AudioData is still queued once recording ends.
+    """
+
+    def __init__(self, queue, stats=None):
+        self.queue = queue
+        self.stats = stats or PipelineStats()
+
+    def stream_start(self, sample_rate, sample_width):
+        put_audio(self.queue, (STREAM_START, (sample_rate, sample_width)),
+                  self.stats)
+
+    def stream_chunk(self, chunk):
+        put_audio(self.queue, (STREAM_DATA, chunk), self.stats)
+
+
+def put_audio(queue, item, stats):
+    """
+        Queue an item for the consumer without ever blocking the caller,
+        which has to keep reading the microphone.
+    """
+    try:
+        queue.put_nowait(item)
+    except Full:
+        stats.increment('dropped_audio')
+        LOG.warning("Listener queue full, dropping audio")
+
 
 class AudioProducer(Thread):
     """
@@ -38,7 +76,8 @@ class AudioProducer(Thread):
     mic for potential speech chunks and pushes them onto the queue.
     """
 
-    def __init__(self, state, queue, mic, recognizer, emitter):
+    def __init__(self, state, queue, mic, recognizer, emitter,
+                 stream_handler=None, stats=None):
         super(AudioProducer, self).__init__()
         self.daemon = True
         self.state = state
@@ -46,14 +85,18 @@ class AudioProducer(Thread):
         self.mic = mic
         self.recognizer = recognizer
         self.emitter = emitter
+        self.stream_handler = stream_handler
+        self.stats = stats or PipelineStats()
 
     def run(self):
         with self.mic as source:
             self.recognizer.adjust_for_ambient_noise(source)
             while self.state.running:
                 try:
-                    audio = self.recognizer.listen(source, self.emitter)
-                    self.queue.put(audio)
+                    audio = self.recognizer.listen(source, self.emitter,
+                                                   self.stream_handler)
+                    if audio is not None:
+                        put_audio(self.queue, audio, self.stats)
                 except IOError, ex:
                     # NOTE: Audio stack on raspi is slightly different, throws
                     # IOError every other listen, almost like it can't handle
@@ -70,17 +113,225 @@ class AudioProducer(Thread):
         self.recognizer.stop()
 
 
+class UtteranceSequencer(object):
+    """
+    UtteranceSequencer
+    emits transcriptions in the order the utterances were recorded, even
+    though several STT workers may finish them out of order.  An utterance
+    whose transcription takes longer than max_wait seconds is given up on
+    so it can't hold back the ones recorded after it.
+    """
+
+    def __init__(self, emitter, stats, max_wait=15.0):
+        self.emitter = emitter
+        self.stats = stats
+        self.max_wait = max_wait
+        self._lock = Lock()
+        self._next = 0
+        self._last = -1
+        self._dispatched = {}
+        self._results = {}
+
+    def register(self):
+        """
+            Reserve the next place in the sequence.
+
+            Returns:
+                int: sequence number of the new utterance
+        """
+        with self._lock:
+            self._last += 1
+            self._dispatched[self._last] = time.time()
+            return self._last
+
+    def pending(self):
+        with self._lock:
+            return len(self._dispatched)
+
+    def complete(self, seq, payload):
+        """
+            Store the result for an utterance and emit everything that is
+            now in order.
+
+            Args:
+                seq (int): sequence number from register()
+                payload (dict): recognizer_loop:utterance data, None if
+                                there was no transcription
+        """
+        with self._lock:
+            if seq < self._next:
+                self.stats.increment('late_utterances')
+                return
+            self._results[seq] = (payload, time.time())
+            self._release()
+
+    def expire(self):
+        """
+            Give up on the oldest utterances if they took too long.
+        """
+        with self._lock:
+            now = time.time()
+            while (self._next in self._dispatched and
+                   self._next not in self._results and
+                   now - self._dispatched[self._next] > self.max_wait):
+                LOG.warning("STT took too long, skipping utterance")
+                del self._dispatched[self._next]
+                self._next += 1
+                self.stats.increment('skipped_utterances')
+            self._release()
+
+    def _release(self):
+        while self._next in self._results:
+            payload, completed = self._results.pop(self._next)
+            dispatched = self._dispatched.pop(self._next)
+            self._next += 1
+            self.stats.timer('ordering_s', time.time() - completed)
+            self.stats.timer('pipeline_s', time.time() - dispatched)
+            if payload:
+                self.emitter.emit("recognizer_loop:utterance", payload)
+
+
+class STTWorker(Thread):
+    """
+    STTWorker
+    owns one STT engine and handles the utterances handed to it in order.
+    The messages for a single utterance (stream start, stream data and the
+    final transcription) always go to the same worker.
+    """
+    # Messages in a worker's inbox, in addition to the stream messages
+    TRANSCRIBE = 'transcribe'
+    STREAM_ABORT = 'stream_abort'
+
+    def __init__(self, state, stt, emitter, sequencer, stats):
+        super(STTWorker, self).__init__()
+        self.daemon = True
+        self.state = state
+        self.stt = stt
+        self.emitter = emitter
+        self.sequencer = sequencer
+        self.stats = stats
+        self.inbox = Queue()
+        self.streaming = False
+        self._pending = 0
+        self._lock = Lock()
+
+    @property
+    def pending(self):
+        """Number of utterances assigned to this worker and not done."""
+        return self._pending
+
+    def assign(self, message_type, data=None):
+        if message_type in (STREAM_START, self.TRANSCRIBE):
+            with self._lock:
+                self._pending += 1
+        self.inbox.put((message_type, data, time.time()))
+
+    def _done(self):
+        with self._lock:
+            self._pending -= 1
+
+    def run(self):
+        while self.state.running:
+            try:
+                message_type, data, assigned = self.inbox.get(timeout=0.5)
+            except Empty:
+                continue
+            self.handle(message_type, data, assigned)
+        # Don't leave the engine waiting for the rest of the audio
+        self.stop_stream()
+
+    def handle(self, message_type, data, assigned):
+        if message_type == STREAM_START:
+            try:
+                self.stt.stream_start(*data)
+                self.streaming = True
+            except Exception as e:
+                LOG.error("Could not start STT stream: {0}".format(e))
+        elif message_type == STREAM_DATA and self.streaming:
+            try:
+                self.stt.stream_data(data)
+            except Exception as e:
+                LOG.error("STT stream failed: {0}".format(e))
+                self.stop_stream()
+        elif message_type == self.STREAM_ABORT:
+            self.stop_stream()
+            self._done()
+        elif message_type == self.TRANSCRIBE:
+            seq, audio, streamed = data
+            if streamed:
+                # The stream already holds this worker's reservation
+                self._done()
+            self.stats.timer('worker_wait_s', time.time() - assigned)
+            try:
+                self.sequencer.complete(seq, self.transcribe(audio))
+            finally:
+                self._done()
+
+    def stop_stream(self):
+        """Finish the current STT stream, discarding the result."""
+        if self.streaming:
+            self.streaming = False
+            try:
+                self.stt.stream_stop()
+            except Exception as e:
+                LOG.debug("Error while stopping STT stream: {0}".format(e))
+
+    def transcribe(self, audio):
+        text = None
+        start = time.time()
+        try:
+            if self.streaming:
+                # The engine has received the audio as it was recorded
+                self.streaming = False
+                text = self.stt.stream_stop()
+            else:
+                # Invoke the STT engine on the audio clip
+                text = self.stt.execute(audio)
+                encode_time = getattr(self.stt, 'encode_time', None)
+                if encode_time is not None:
+                    self.stats.timer('encode_s', encode_time)
+                    self.stt.encode_time = None
+            text = text.lower().strip()
+            LOG.debug("STT: " + text)
+        except sr.RequestError as e:
+            LOG.error("Could not request Speech Recognition {0}".format(e))
+        except ConnectionError as e:
+            LOG.error("Connection Error: {0}".format(e))
+            self.emitter.emit("recognizer_loop:no_internet")
+        except HTTPError as e:
+            if e.response.status_code == 401:
+                text = "pair my device"  # phrase to start the pairing process
+                LOG.warning("Access Denied at mycroft.ai")
+        except Exception as e:
+            LOG.error(e)
+            LOG.error("Speech Recognition could not understand audio")
+        self.stats.timer('stt_s', time.time() - start)
+        if text:
+            # STT succeeded, send the transcribed speech on for processing
+            return {
+                'utterances': [text],
+                'lang': self.stt.lang,
+                'session': SessionManager.get().session_id
+            }
+        else:
+            self.stats.increment('failed_utterances')
+            return None
+
+
 class AudioConsumer(Thread):
     """
     AudioConsumer
-    Consumes AudioData chunks off the queue
+    Consumes AudioData chunks off the queue and hands them to a pool of
+    STT workers, so a slow STT request doesn't hold up the next utterance.
     """
 
     # In seconds, the minimum audio size to be sent to remote STT
     MIN_AUDIO_SIZE = 0.5
 
     def __init__(self, state, queue, emitter, stt,
-                 wakeup_recognizer, wakeword_recognizer):
+                 wakeup_recognizer, wakeword_recognizer,
+                 num_workers=1, max_pending=4, max_order_wait=15.0,
+                 stats=None):
         super(AudioConsumer, self).__init__()
         self.daemon = True
         self.queue = queue
@@ -90,12 +341,27 @@ class AudioConsumer(Thread):
         self.wakeup_recognizer = wakeup_recognizer
         self.wakeword_recognizer = wakeword_recognizer
         self.metrics = MetricsAggregator()
+        self.stats = stats or PipelineStats()
+        self.max_pending = max_pending
+        self.sequencer = UtteranceSequencer(emitter, self.stats,
+                                            max_order_wait)
+        # Every worker needs an engine of its own, engines keep per
+        # utterance state while streaming
+        engines = [stt] + [stt.__class__()
+                           for _ in range(max(num_workers, 1) - 1)]
+        self.workers = [STTWorker(state, engine, emitter, self.sequencer,
+                                  self.stats) for engine in engines]
+        self.stream_worker = None
 
     def run(self):
+        for worker in self.workers:
+            worker.start()
         while self.state.running:
             self.read()
 
     def read(self):
+        self.sequencer.expire()
+        self.stats.level('queue_depth', self.queue.qsize())
         try:
             audio = self.queue.get(timeout=0.5)
         except Empty:
@@ -104,11 +370,31 @@ class AudioConsumer(Thread):
         if audio is None:
             return
 
-        if self.state.sleeping:
+        if isinstance(audio, tuple):
+            self.handle_stream(*audio)
+        elif self.state.sleeping:
             self.wake_up(audio)
         else:
             self.process(audio)
 
+    def _select_worker(self):
+        return min(self.workers, key=lambda w: w.pending)
+
+    def handle_stream(self, message_type, data):
+        if message_type == STREAM_START:
+            # A new recording, drop any stream that was never finished
+            self.abort_stream()
+            if not self.state.sleeping:
+                self.stream_worker = self._select_worker()
+                self.stream_worker.assign(STREAM_START, data)
+        elif message_type == STREAM_DATA and self.stream_worker:
+            self.stream_worker.assign(STREAM_DATA, data)
+
+    def abort_stream(self):
+        if self.stream_worker:
+            self.stream_worker.assign(STTWorker.STREAM_ABORT)
+            self.stream_worker = None
+
     # TODO: Localization
     def wake_up(self, audio):
         if self.wakeup_recognizer.found_wake_word(audio.frame_data):
@@ -125,44 +411,35 @@ class AudioConsumer(Thread):
     # TODO: Localization
     def process(self, audio):
         SessionManager.touch()
+        # One of several phrases may have started the recording
+        engine = self.wakeword_recognizer
         payload = {
-            'utterance': self.wakeword_recognizer.key_phrase,
+            'utterance': engine.found_phrase or engine.key_phrase,
+            'confidence': engine.confidence,
             'session': SessionManager.get().session_id,
         }
         self.emitter.emit("recognizer_loop:wakeword", payload)
 
         if self._audio_length(audio) < self.MIN_AUDIO_SIZE:
             LOG.warning("Audio too short to be processed")
+            self.abort_stream()
+        elif self.sequencer.pending() >= self.max_pending:
+            LOG.warning("Too many utterances waiting for STT, dropping one")
+            self.stats.increment('dropped_utterances')
+            self.abort_stream()
         else:
             self.transcribe(audio)
 
     def transcribe(self, audio):
-        text = None
-        try:
-            # Invoke the STT engine on the audio clip
-            text = self.stt.execute(audio).lower().strip()
-            LOG.debug("STT: " + text)
-        except sr.RequestError as e:
-            LOG.error("Could not request Speech Recognition {0}".format(e))
-        except ConnectionError as e:
-            LOG.error("Connection Error: {0}".format(e))
-            self.emitter.emit("recognizer_loop:no_internet")
-        except HTTPError as e:
-            if e.response.status_code == 401:
-                text = "pair my device"  # phrase to start the pairing process
-                LOG.warning("Access Denied at mycroft.ai")
-        except Exception as e:
-            LOG.error(e)
-            LOG.error("Speech Recognition could not understand audio")
-        if text:
-            # STT succeeded, send the transcribed speech on for processing
-            payload = {
-                'utterances': [text],
-                'lang': self.stt.lang,
-                'session': SessionManager.get().session_id
-            }
-            self.emitter.emit("recognizer_loop:utterance", payload)
-            self.metrics.attr('utterances', [text])
+        """
+            Hand the audio to an STT worker.  The utterance is emitted once
+            it and all utterances recorded before it are transcribed.
+        """
+        seq = self.sequencer.register()
+        worker = self.stream_worker or self._select_worker()
+        worker.assign(STTWorker.TRANSCRIBE,
+                      (seq, audio, self.stream_worker is not None))
+        self.stream_worker = None
 
     def __speak(self, utterance):
         payload = {
@@ -183,10 +460,19 @@ class RecognizerLoop(EventEmitter):
         EventEmitter loop running speech recognition. Local wake word
         recognizer and remote general speech recognition.
     """
+    # Listener settings requiring the microphone to be reopened
+    DEVICE_SETTINGS = ('device_index', 'sample_rate', 'channels',
+                       'capture_mode', 'capture_buffer_sec', 'pipeline')
+    # Listener settings used to create the wake word engine
+    WAKE_WORD_SETTINGS = ('wake_word', 'phonemes', 'threshold')
+    # Settings outside the listener section used by the recognizer
+    RECOGNIZER_SETTINGS = ('opt_in', 'confirm_listening', 'sounds')
 
     def __init__(self):
         super(RecognizerLoop, self).__init__()
         self.mute_calls = 0
+        self.stats = PipelineStats()
+        self._config_lock = RLock()
         self._load_config()
 
     def _load_config(self):
@@ -195,14 +481,16 @@ class RecognizerLoop(EventEmitter):
         """
         config = Configuration.get()
         self.config_core = config
-        self._config_hash = hash(str(config))
+        self._applied_config = deepcopy(config)
         self.lang = config.get('lang')
         self.config = config.get('listener')
         rate = self.config.get('sample_rate')
         device_index = self.config.get('device_index')
 
-        self.microphone = MutableMicrophone(device_index, rate,
-                                            mute=self.mute_calls > 0)
+        self.microphone = MutableMicrophone(
+            device_index, rate, mute=self.mute_calls > 0,
+            capture_mode=self.config.get('capture_mode', 'callback'),
+            capture_buffer_sec=self.config.get('capture_buffer_sec', 3.0))
         # FIXME - channels are not been used
         self.microphone.CHANNELS = self.config.get('channels')
         self.wakeword_recognizer = self.create_wake_word_recognizer()
@@ -219,7 +507,8 @@ class RecognizerLoop(EventEmitter):
         # TODO remove this, only for server settings compatibility
         phonemes = self.config.get("phonemes")
         thresh = self.config.get("threshold")
-        config = self.config_core.get("hotwords", {word: {}})
+        # Copied to keep the cached config unchanged, see reconfigure()
+        config = deepcopy(self.config_core.get("hotwords", {word: {}}))
 
         if word not in config:
             config[word] = {'module': 'pocketsphinx'}
@@ -241,14 +530,23 @@ class RecognizerLoop(EventEmitter):
             Start consumer and producer threads
         """
         self.state.running = True
-        queue = Queue()
+        pipeline = self.config.get('pipeline', {})
+        queue = Queue(pipeline.get('queue_size', 200))
+        stt = STTFactory.create()
+        stream_handler = None
+        if isinstance(stt, StreamingSTT):
+            stream_handler = AudioStreamHandler(queue, self.stats)
         self.producer = AudioProducer(self.state, queue, self.microphone,
-                                      self.responsive_recognizer, self)
+                                      self.responsive_recognizer, self,
+                                      stream_handler, self.stats)
         self.producer.start()
-        self.consumer = AudioConsumer(self.state, queue, self,
-                                      STTFactory.create(),
-                                      self.wakeup_recognizer,
-                                      self.wakeword_recognizer)
+        self.consumer = AudioConsumer(
+            self.state, queue, self, stt, self.wakeup_recognizer,
+            self.wakeword_recognizer,
+            num_workers=pipeline.get('stt_workers', 2),
+            max_pending=pipeline.get('max_pending', 4),
+            max_order_wait=pipeline.get('max_order_wait', 15.0),
+            stats=self.stats)
         self.consumer.start()
 
     def stop(self):
@@ -291,6 +589,18 @@ class RecognizerLoop(EventEmitter):
         else:
             return True  # consider 'no mic' muted
 
+    def get_stats(self):
+        """
+            Get counters and timings describing the listener pipeline
+        """
+        stats = self.stats.get()
+        # Engines running an external process report on it separately
+        get_engine_stats = getattr(self.wakeword_recognizer, 'get_stats',
+                                   None)
+        if get_engine_stats:
+            stats['hotword'] = get_engine_stats()
+        return stats
+
     def sleep(self):
         self.state.sleeping = True
 
@@ -299,24 +609,77 @@ class RecognizerLoop(EventEmitter):
 
     def run(self):
         self.start_async()
-        while self.state.running:
-            try:
+        Configuration.add_listener(self.reconfigure)
+        try:
+            while self.is_running():
                 time.sleep(1)
-                if self._config_hash != hash(
-                        str(Configuration().get())):
-                    LOG.debug('Config has changed, reloading...')
-                    self.reload()
-            except KeyboardInterrupt as e:
-                LOG.error(e)
-                self.stop()
-                raise  # Re-raise KeyboardInterrupt
+        except KeyboardInterrupt as e:
+            LOG.error(e)
+            self.stop()
+            raise  # Re-raise KeyboardInterrupt
+        finally:
+            Configuration.remove_listener(self.reconfigure)
+
+    def is_running(self):
+        with self._config_lock:
+            return self.state.running
+
+    def reconfigure(self, config):
+        """
+            Apply a configuration change, touching only the parts of the
+            listener affected by it. The microphone is only reopened if
+            the device settings, STT or language changed.
+
+            Args:
+                config (dict): the new configuration
+        """
+        with self._config_lock:
+            old = self._applied_config
+            old_listener = old.get('listener', {})
+            listener = config.get('listener', {})
+            changed = set(key for key in set(old_listener) | set(listener)
+                          if old_listener.get(key) != listener.get(key))
+            hotwords_changed = old.get('hotwords') != config.get('hotwords')
+            changed.update(key for key in self.RECOGNIZER_SETTINGS
+                           if old.get(key) != config.get(key))
+
+            if (changed.intersection(self.DEVICE_SETTINGS) or
+                    old.get('stt') != config.get('stt') or
+                    old.get('lang') != config.get('lang')):
+                LOG.debug('Audio device or STT config changed, reloading...')
+                self.reload()
+                return
+
+            self.config_core = config
+            self.config = listener
+            self._applied_config = deepcopy(config)
+            if hotwords_changed or changed.intersection(
+                    self.WAKE_WORD_SETTINGS):
+                LOG.debug('Wake word config changed, recreating engine')
+                replaced = self.wakeword_recognizer
+                self.wakeword_recognizer = self.create_wake_word_recognizer()
+                self.responsive_recognizer.set_wake_word_recognizer(
+                    self.wakeword_recognizer)
+                self.consumer.wakeword_recognizer = self.wakeword_recognizer
+                replaced.stop()
+            if hotwords_changed or 'stand_up_word' in changed:
+                replaced = self.wakeup_recognizer
+                self.wakeup_recognizer = self.create_wakeup_recognizer()
+                self.consumer.wakeup_recognizer = self.wakeup_recognizer
+                replaced.stop()
+            if changed:
+                LOG.debug('Listener config changed: ' + ', '.join(changed))
+                self.responsive_recognizer.update_config(listener, config)
 
     def reload(self):
         """
             Reload configuration and restart consumer and producer
         """
-        self.stop()
-        # load config
-        self._load_config()
-        # restart
-        self.start_async()
+        with self._config_lock:
+            self.stop()
+            self.wakeword_recognizer.stop()
+            self.wakeup_recognizer.stop()
+            # load config
+            self._load_config()
+            # restart
+            self.start_async()
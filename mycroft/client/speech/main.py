@@ -51,6 +51,12 @@ def handle_wakeword(event):
     ws.emit(Message('recognizer_loop:wakeword', event))
 
 
+def handle_keyphrase(event):
+    LOG.info("Keyphrase Detected: " + event['utterance'])
+    ws.emit(Message('recognizer_loop:keyphrase', event))
+    ws.emit(Message(event['message'], event))
+
+
 def handle_utterance(event):
     LOG.info("Utterance: " + str(event['utterances']))
     ws.emit(Message('recognizer_loop:utterance', event))
@@ -87,6 +93,10 @@ def handle_mic_unmute(event):
     loop.unmute()
 
 
+def handle_get_stats(event):
+    ws.emit(event.reply('recognizer_loop:stats', loop.get_stats()))
+
+
 def handle_paired(event):
     IdentityManager.update(event.data)
 
@@ -136,6 +146,7 @@ def main():
     loop.on('speak', handle_speak)
     loop.on('recognizer_loop:record_begin', handle_record_begin)
     loop.on('recognizer_loop:wakeword', handle_wakeword)
+    loop.on('recognizer_loop:keyphrase', handle_keyphrase)
     loop.on('recognizer_loop:record_end', handle_record_end)
     loop.on('recognizer_loop:no_internet', handle_no_internet)
     ws.on('open', handle_open)
@@ -144,6 +155,7 @@ def main():
     ws.on('recognizer_loop:wake_up', handle_wake_up)
     ws.on('mycroft.mic.mute', handle_mic_mute)
     ws.on('mycroft.mic.unmute', handle_mic_unmute)
+    ws.on('recognizer_loop:get_stats', handle_get_stats)
     ws.on("mycroft.paired", handle_paired)
     ws.on('recognizer_loop:audio_output_start', handle_audio_start)
     ws.on('recognizer_loop:audio_output_end', handle_audio_end)
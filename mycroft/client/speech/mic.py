@@ -15,17 +15,17 @@
 import audioop
 import collections
 import datetime
+from copy import deepcopy
 from hashlib import md5
-import shutil
+from Queue import Queue, Empty, Full
 from tempfile import gettempdir
-from threading import Thread, Lock
+from threading import Thread
 from time import sleep, time as get_time
 
 import os
 import pyaudio
 import speech_recognition
-from os import mkdir
-from os.path import isdir, join, expanduser, isfile
+from os.path import join
 from speech_recognition import (
     Microphone,
     AudioSource,
@@ -34,7 +34,14 @@ from speech_recognition import (
 import requests
 
 from mycroft.api import DeviceApi
+from mycroft.client.speech.data_structures import (
+    CyclicAudioBuffer,
+    PhraseBuffer
+)
+from mycroft.client.speech.vad import VADFactory
+from mycroft.client.speech.wake_word_spool import WakeWordSpool
 from mycroft.configuration import Configuration
+from mycroft.metrics import MetricsAggregator
 from mycroft.session import SessionManager
 from mycroft.util import (
     check_for_signal,
@@ -42,17 +49,62 @@ from mycroft.util import (
     resolve_resource_file,
     play_wav
 )
+from mycroft.util.level_meter import LevelMeterWriter
 from mycroft.util.log import LOG
 
 
+class CaptureQueue(object):
+    """Bounded queue of audio chunks filled by the PyAudio stream callback.
+
+    PyAudio calls callback() from its own thread as soon as the device has
+    a buffer ready.  When the reader falls behind the oldest chunk is
+    dropped, live audio is worth more than stale audio.
+
+    Arguments:
+        max_chunks (int): number of chunks to hold before dropping audio
+    """
+
+    def __init__(self, max_chunks):
+        self.queue = Queue(max(int(max_chunks), 1))
+        self.dropped_chunks = 0
+        self.input_overflows = 0
+
+    def callback(self, in_data, frame_count, time_info, status):
+        if status & pyaudio.paInputOverflow:
+            self.input_overflows += 1
+        while True:
+            try:
+                self.queue.put_nowait(in_data)
+                break
+            except Full:
+                try:
+                    self.queue.get_nowait()
+                    self.dropped_chunks += 1
+                except Empty:
+                    pass
+        return None, pyaudio.paContinue
+
+    def get(self, timeout):
+        return self.queue.get(timeout=timeout)
+
+
 class MutableStream(object):
-    def __init__(self, wrapped_stream, format, muted=False):
+    # Seconds to wait for the device before giving up on a read
+    READ_TIMEOUT = 2.0
+
+    def __init__(self, wrapped_stream, format, muted=False,
+                 capture_queue=None):
         assert wrapped_stream is not None
         self.wrapped_stream = wrapped_stream
         self.muted = muted
+        self.capture_queue = capture_queue
+        self._leftover = b''
+        self._reported_drops = 0
+        self._reported_overflows = 0
+        self.metrics = MetricsAggregator()
 
         self.SAMPLE_WIDTH = pyaudio.get_sample_size(format)
-        self.muted_buffer = b''.join([b'\x00' * self.SAMPLE_WIDTH])
+        self.muted_buffer = b''
 
     def mute(self):
         self.muted = True
@@ -60,7 +112,14 @@ class MutableStream(object):
     def unmute(self):
         self.muted = False
 
-    def read(self, size):
+    def _silence(self, size):
+        """Silent buffer of size frames, cached between reads."""
+        num_bytes = size * self.SAMPLE_WIDTH
+        if len(self.muted_buffer) != num_bytes:
+            self.muted_buffer = b'\x00' * num_bytes
+        return self.muted_buffer
+
+    def _read_polling(self, size):
         frames = collections.deque()
         remaining = size
         while remaining > 0:
@@ -71,13 +130,49 @@ class MutableStream(object):
             result = self.wrapped_stream.read(to_read)
             frames.append(result)
             remaining -= to_read
+        return b"".join(frames)
+
+    def _read_queued(self, size):
+        num_bytes = size * self.SAMPLE_WIDTH
+        frames = [self._leftover]
+        available = len(self._leftover)
+        while available < num_bytes:
+            try:
+                chunk = self.capture_queue.get(self.READ_TIMEOUT)
+            except Empty:
+                raise IOError("No audio received from the microphone")
+            frames.append(chunk)
+            available += len(chunk)
+        audio = b"".join(frames)
+        self._leftover = audio[num_bytes:]
+        return audio[:num_bytes]
+
+    def _report_overflows(self):
+        dropped = self.capture_queue.dropped_chunks
+        overflows = self.capture_queue.input_overflows
+        if dropped != self._reported_drops:
+            LOG.warning("Dropped %d audio chunks, reader too slow" %
+                        (dropped - self._reported_drops))
+            self.metrics.increment("mycroft.mic.dropped_chunks",
+                                   dropped - self._reported_drops)
+            self._reported_drops = dropped
+        if overflows != self._reported_overflows:
+            self.metrics.increment("mycroft.mic.input_overflows",
+                                   overflows - self._reported_overflows)
+            self._reported_overflows = overflows
+
+    def read(self, size):
+        if self.capture_queue:
+            audio = self._read_queued(size)
+            self._report_overflows()
+        else:
+            audio = self._read_polling(size)
 
         if self.muted:
-            return self.muted_buffer
+            return self._silence(size)
         input_latency = self.wrapped_stream.get_input_latency()
         if input_latency > 0.2:
             LOG.warning("High input latency: %f" % input_latency)
-        audio = b"".join(list(frames))
         return audio
 
     def close(self):
@@ -93,11 +188,13 @@ class MutableStream(object):
 
 class MutableMicrophone(Microphone):
     def __init__(self, device_index=None, sample_rate=16000, chunk_size=1024,
-                 mute=False):
+                 mute=False, capture_mode='callback', capture_buffer_sec=3.0):
         Microphone.__init__(
             self, device_index=device_index, sample_rate=sample_rate,
             chunk_size=chunk_size)
         self.muted = False
+        self.capture_mode = capture_mode
+        self.capture_buffer_sec = capture_buffer_sec
         if mute:
             self.mute()
 
@@ -105,12 +202,20 @@ class MutableMicrophone(Microphone):
         assert self.stream is None, \
             "This audio source is already inside a context manager"
         self.audio = pyaudio.PyAudio()
+        capture_queue = None
+        callback = None
+        if self.capture_mode == 'callback':
+            sec_per_buffer = float(self.CHUNK) / self.SAMPLE_RATE
+            capture_queue = CaptureQueue(
+                self.capture_buffer_sec / sec_per_buffer)
+            callback = capture_queue.callback
         self.stream = MutableStream(self.audio.open(
             input_device_index=self.device_index, channels=1,
             format=self.format, rate=self.SAMPLE_RATE,
             frames_per_buffer=self.CHUNK,
             input=True,  # stream is an input stream
-        ), self.format, self.muted)
+            stream_callback=callback
+        ), self.format, self.muted, capture_queue)
         return self
 
     def __exit__(self, exc_type, exc_value, traceback):
@@ -161,37 +266,80 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
         self.config = Configuration.get()
         listener_config = self.config.get('listener')
-        self.upload_config = listener_config.get('wake_word_upload')
-        self.wake_word_name = wake_word_recognizer.key_phrase
 
         speech_recognition.Recognizer.__init__(self)
-        self.wake_word_recognizer = wake_word_recognizer
         self.audio = pyaudio.PyAudio()
+        self.save_wake_words_dir = join(gettempdir(), 'mycroft_wake_words')
+        self.wake_word_spool = WakeWordSpool(self.save_wake_words_dir)
+        self.mic_level = LevelMeterWriter(
+            os.path.join(get_ipc_directory(), "mic_level"))
+        self._stop_signaled = False
+        self.vad = None
+        self.vad_config = None
+
+        self.wake_word_recognizer = wake_word_recognizer
+        self.wake_word_name = wake_word_recognizer.key_phrase
+        self.update_config(listener_config)
+
+        try:
+            self.account_id = DeviceApi().get()['user']['uuid']
+        except (requests.HTTPError, requests.ConnectionError, AttributeError):
+            self.account_id = '0'
+
+    def update_config(self, listener_config, config=None):
+        """
+            Apply listener settings, can be called while listening.
+
+            Args:
+                listener_config (dict): the "listener" configuration section
+                config (dict): the whole configuration, for the settings
+                               outside the listener section such as
+                               "opt_in" and "confirm_listening"
+        """
+        if config is not None:
+            self.config = config
+        self.upload_config = listener_config.get('wake_word_upload')
         self.multiplier = listener_config.get('multiplier')
         self.energy_ratio = listener_config.get('energy_ratio')
         # check the config for the flag to save wake words.
-
         self.save_utterances = listener_config.get('record_utterances', False)
+        upload = self.upload_config['enable'] or self.config['opt_in']
         self.save_wake_words = listener_config.get('record_wake_words') \
-            or self.upload_config['enable'] or self.config['opt_in']
-        self.upload_lock = Lock()
-        self.save_wake_words_dir = join(gettempdir(), 'mycroft_wake_words')
-        self.filenames_to_upload = []
-        self.mic_level_file = os.path.join(get_ipc_directory(), "mic_level")
-        self._stop_signaled = False
+            or upload
+        self.wake_word_spool.configure(
+            self.upload_config, upload,
+            listener_config.get('record_wake_words_max_mb', 50))
+
+        # Voice activity detection, also used to skip wake word checks
+        # when nothing but silence was heard
+        vad_config = listener_config.get('vad', {})
+        if vad_config != self.vad_config:
+            self.vad = VADFactory.create(vad_config)
+            self.vad_config = deepcopy(vad_config)
+        self.gate_wake_word = vad_config.get('gate_wake_word', True)
+
+        self.phoneme_duration = listener_config.get('phoneme_duration', 120)
+        self._update_wake_word_time()
+
+    def set_wake_word_recognizer(self, wake_word_recognizer):
+        """
+            Replace the wake word engine, can be called while listening.
+
+            Args:
+                wake_word_recognizer: new hotword engine
+        """
+        self.wake_word_recognizer = wake_word_recognizer
+        self.wake_word_name = wake_word_recognizer.key_phrase
+        self._update_wake_word_time()
 
+    def _update_wake_word_time(self):
         # The maximum audio in seconds to keep for transcribing a phrase
         # The wake word must fit in this time
-        num_phonemes = wake_word_recognizer.num_phonemes
-        len_phoneme = listener_config.get('phoneme_duration', 120) / 1000.0
+        num_phonemes = self.wake_word_recognizer.num_phonemes
+        len_phoneme = self.phoneme_duration / 1000.0
         self.TEST_WW_SEC = num_phonemes * len_phoneme
         self.SAVED_WW_SEC = 10 if self.save_wake_words else self.TEST_WW_SEC
 
-        try:
-            self.account_id = DeviceApi().get()['user']['uuid']
-        except (requests.HTTPError, requests.ConnectionError, AttributeError):
-            self.account_id = '0'
-
     @staticmethod
     def record_sound_chunk(source):
         return source.stream.read(source.CHUNK)
@@ -200,7 +348,8 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
     def calc_energy(sound_chunk, sample_width):
         return audioop.rms(sound_chunk, sample_width)
 
-    def _record_phrase(self, source, sec_per_buffer):
+    def _record_phrase(self, source, sec_per_buffer, stream=None,
+                       preroll=b''):
         """Record an entire spoken phrase.
 
         Essentially, this code waits for a period of silence and then returns
@@ -210,10 +359,14 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         Args:
             source (AudioSource):  Source producing the audio chunks
             sec_per_buffer (float):  Fractional number of seconds in each chunk
+            stream (AudioStreamHandler): Optional handler receiving each
+                                         chunk as soon as it is recorded
+            preroll (bytes): audio already heard, that the recording
+                             starts with
 
         Returns:
-            bytearray: complete audio buffer recorded, including any
-                       silence at the end of the user's utterance
+            bytes: complete audio buffer recorded, including any
+                   silence at the end of the user's utterance
         """
 
         num_loud_chunks = 0
@@ -245,18 +398,26 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         max_chunks_of_silence = int(self.RECORDING_TIMEOUT_WITH_SILENCE /
                                     sec_per_buffer)
 
-        # bytearray to store audio in
-        byte_data = '\0' * source.SAMPLE_WIDTH
+        # Preallocated buffer big enough to hold the longest recording
+        max_size = (max_chunks * source.CHUNK + 1) * source.SAMPLE_WIDTH
+        byte_data = PhraseBuffer(max_size + len(preroll),
+                                 '\0' * source.SAMPLE_WIDTH)
+        if preroll:
+            byte_data.append(preroll)
+            if stream:
+                stream.stream_chunk(preroll)
 
         phrase_complete = False
         while num_chunks < max_chunks and not phrase_complete:
             chunk = self.record_sound_chunk(source)
-            byte_data += chunk
+            byte_data.append(chunk)
             num_chunks += 1
+            if stream:
+                stream.stream_chunk(chunk)
 
-            energy = self.calc_energy(chunk, source.SAMPLE_WIDTH)
+            energy = self.vad.process(chunk, source.SAMPLE_WIDTH)
             test_threshold = self.energy_threshold * self.multiplier
-            is_loud = energy > test_threshold
+            is_loud = self.vad.is_speech(test_threshold)
             if is_loud:
                 noise = increase_noise(noise)
                 num_loud_chunks += 1
@@ -264,11 +425,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                 noise = decrease_noise(noise)
                 self._adjust_threshold(energy, sec_per_buffer)
 
-            if num_chunks % 10 == 0:
-                with open(self.mic_level_file, 'w') as f:
-                    f.write("Energy:  cur=" + str(energy) + " thresh=" +
-                            str(self.energy_threshold))
-                f.close()
+            self.mic_level.update(energy, self.energy_threshold)
 
             was_loud_enough = num_loud_chunks > min_loud_chunks
 
@@ -287,7 +444,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             if check_for_signal('buttonPress'):
                 phrase_complete = True
 
-        return byte_data
+        return byte_data.get_frame_data()
 
     @staticmethod
     def sec_to_bytes(sec, source):
@@ -318,60 +475,53 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             Signal stop and exit waiting state.
         """
         self._stop_signaled = True
+        self.wake_word_spool.stop()
 
-    def _upload_file(self, filename):
-        server = self.upload_config['server']
-        keyfile = resolve_resource_file('wakeword_rsa')
-        userfile = expanduser('~/.mycroft/wakeword_rsa')
-
-        if not isfile(userfile):
-            shutil.copy2(keyfile, userfile)
-            os.chmod(userfile, 0o600)
-            keyfile = userfile
-
-        address = self.upload_config['user'] + '@' + \
-            server + ':' + self.upload_config['folder']
-
-        self.upload_lock.acquire()
-        try:
-            self.filenames_to_upload.append(filename)
-            for i, fn in enumerate(self.filenames_to_upload):
-                LOG.debug('Uploading ' + fn + '...')
-                os.chmod(fn, 0o666)
-                cmd = 'scp -o StrictHostKeyChecking=no -P ' + \
-                      str(self.upload_config['port']) + ' -i ' + \
-                      keyfile + ' ' + fn + ' ' + address
-                if os.system(cmd) == 0:
-                    del self.filenames_to_upload[i]
-                    os.remove(fn)
-                else:
-                    LOG.debug('Could not upload ' + fn + ' to ' + server)
-        finally:
-            self.upload_lock.release()
-
-    def _wait_until_wake_word(self, source, sec_per_buffer):
+    def _wait_until_wake_word(self, source, sec_per_buffer, emitter=None):
         """Listen continuously on source until a wake word is spoken
 
+        Key phrases configured with a bus message are reported through
+        the emitter and don't end the wait.
+
         Args:
             source (AudioSource):  Source producing the audio chunks
             sec_per_buffer (float):  Fractional number of seconds in each chunk
+            emitter (EventEmitter): Emitter for key phrase notifications
+
+        Returns:
+            bytes: audio heard after the wake word, the start of the phrase
         """
         num_silent_bytes = int(self.SILENCE_SEC * source.SAMPLE_RATE *
                                source.SAMPLE_WIDTH)
 
         silence = '\0' * num_silent_bytes
 
-        # bytearray to store audio in
-        byte_data = silence
-
         buffers_per_check = self.SEC_BETWEEN_WW_CHECKS / sec_per_buffer
+        # Streaming engines decode the audio as it is passed to update(),
+        # asking them after every chunk costs nothing and saves latency
+        streaming = getattr(self.wake_word_recognizer, 'streaming', False)
+        if streaming:
+            buffers_per_check = 0.0
+            silence = b''
         buffers_since_check = 0.0
 
         # Max bytes for byte_data before audio is removed from the front
         max_size = self.sec_to_bytes(self.SAVED_WW_SEC, source)
         test_size = self.sec_to_bytes(self.TEST_WW_SEC, source)
 
+        # Rolling buffer to store audio in
+        byte_data = CyclicAudioBuffer(max_size, silence)
+
         said_wake_word = False
+        preroll = b''
+
+        # Chunks since the VAD last heard speech.  The wake word must have
+        # been spoken within the test window for a check to be worthwhile.
+        chunks_per_test = int(self.TEST_WW_SEC / sec_per_buffer) + 1
+        chunks_since_speech = chunks_per_test + 1
+        self.vad.reset()
+        # Detections before the wait started are out of date
+        self.wake_word_recognizer.reset()
 
         # Rolling buffer to track the audio energy (loudness) heard on
         # the source recently.  An average audio energy is maintained
@@ -381,15 +531,18 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         avg_energy = 0.0
         energy_avg_samples = int(5 / sec_per_buffer)  # avg over last 5 secs
 
-        counter = 0
-
         while not said_wake_word and not self._stop_signaled:
             if self._skip_wake_word():
                 break
             chunk = self.record_sound_chunk(source)
 
-            energy = self.calc_energy(chunk, source.SAMPLE_WIDTH)
-            if energy < self.energy_threshold * self.multiplier:
+            energy = self.vad.process(chunk, source.SAMPLE_WIDTH)
+            test_threshold = self.energy_threshold * self.multiplier
+            if self.vad.is_speech(test_threshold):
+                chunks_since_speech = 0
+            else:
+                chunks_since_speech += 1
+            if energy < test_threshold:
                 self._adjust_threshold(energy, sec_per_buffer)
 
             if len(energies) < energy_avg_samples:
@@ -409,41 +562,38 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                         # bump the threshold to just above this value
                         self.energy_threshold = energy * 1.2
 
-            # Periodically output energy level stats.  This can be used to
-            # visualize the microphone input, e.g. a needle on a meter.
-            if counter % 3:
-                with open(self.mic_level_file, 'w') as f:
-                    f.write("Energy:  cur=" + str(energy) + " thresh=" +
-                            str(self.energy_threshold))
-                f.close()
-            counter += 1
-
-            # At first, the buffer is empty and must fill up.  After that
-            # just drop the first chunk bytes to keep it the same size.
-            needs_to_grow = len(byte_data) < max_size
-            if needs_to_grow:
-                byte_data += chunk
-            else:  # Remove beginning of audio and add new chunk to end
-                byte_data = byte_data[len(chunk):] + chunk
+            # Publish energy level stats.  This can be used to visualize
+            # the microphone input, e.g. a needle on a meter.
+            self.mic_level.update(energy, self.energy_threshold)
+
+            # The buffer drops the oldest audio by itself once it is full
+            byte_data.append(chunk)
 
             buffers_since_check += 1.0
             self.wake_word_recognizer.update(chunk)
             if buffers_since_check > buffers_per_check:
                 buffers_since_check -= buffers_per_check
-                chopped = byte_data[-test_size:] \
-                    if test_size < len(byte_data) else byte_data
+                heard_speech = chunks_since_speech <= chunks_per_test
+                if self.gate_wake_word and not heard_speech:
+                    # Don't report a detection streamed during the silence
+                    # once speech is heard again
+                    self.wake_word_recognizer.reset()
+                    continue
+                chopped = byte_data.get_last(test_size).tobytes()
                 audio_data = chopped + silence
                 said_wake_word = \
                     self.wake_word_recognizer.found_wake_word(audio_data)
-                # if a wake word is success full then record audio in temp
-                # file.
+                if said_wake_word and self._handle_keyphrase(emitter):
+                    # Forget the phrase so it isn't found again
+                    said_wake_word = False
+                    byte_data.clear()
+                    continue
+                if said_wake_word:
+                    preroll = self._audio_after_wake_word(
+                        audio_data, len(silence), source)
+                # if a wake word is success full then save the audio, the
+                # spool writes and uploads it in the background
                 if self.save_wake_words and said_wake_word:
-                    audio = self._create_audio_data(byte_data, source)
-
-                    if not isdir(self.save_wake_words_dir):
-                        mkdir(self.save_wake_words_dir)
-                    dr = self.save_wake_words_dir
-
                     ww_module = self.wake_word_recognizer.__class__.__name__
 
                     ww = self.wake_word_name.replace(' ', '-')
@@ -452,14 +602,54 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
                     sid = SessionManager.get().session_id
                     aid = self.account_id
 
-                    fn = join(dr, '.'.join([ww, md, stamp, sid, aid]) + '.wav')
-                    with open(fn, 'wb') as f:
-                        f.write(audio.get_wav_data())
+                    fn = '.'.join([ww, md, stamp, sid, aid]) + '.wav'
+                    self.wake_word_spool.add(fn, byte_data.get().tobytes(),
+                                             source.SAMPLE_RATE,
+                                             source.SAMPLE_WIDTH)
+
+        return preroll
 
-                    if self.upload_config['enable'] or self.config['opt_in']:
-                        t = Thread(target=self._upload_file, args=(fn,))
-                        t.daemon = True
-                        t.start()
+    def _handle_keyphrase(self, emitter):
+        """
+        Report a key phrase that has a bus message configured.
+
+        Args:
+            emitter (EventEmitter): emitter to report the phrase with
+
+        Returns:
+            bool: True if the phrase was a key phrase with a message, False
+                  if it should start a recording
+        """
+        engine = self.wake_word_recognizer
+        message = getattr(engine, 'found_message', None)
+        if not message:
+            return False
+        LOG.debug("Heard key phrase " + engine.found_phrase)
+        if emitter:
+            emitter.emit("recognizer_loop:keyphrase", {
+                'utterance': engine.found_phrase,
+                'confidence': engine.confidence,
+                'message': message
+            })
+        return True
+
+    def _audio_after_wake_word(self, tested, padding, source):
+        """
+        Get the audio following the wake word in the audio tested for it.
+
+        Args:
+            tested (bytes): audio passed to the wake word engine
+            padding (int): bytes of silence added to the end of the audio
+            source (AudioSource): source the audio was read from
+
+        Returns:
+            bytes: audio heard after the wake word, empty if the engine
+                   doesn't report where the wake word ended
+        """
+        end = getattr(self.wake_word_recognizer, 'wake_word_end', None)
+        if end is None:
+            return b''
+        return tested[self.sec_to_bytes(end, source):len(tested) - padding]
 
     @staticmethod
     def _create_audio_data(raw_data, source):
@@ -469,7 +659,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         """
         return AudioData(raw_data, source.SAMPLE_RATE, source.SAMPLE_WIDTH)
 
-    def listen(self, source, emitter):
+    def listen(self, source, emitter, stream=None):
         """Listens for chunks of audio that Mycroft should perform STT on.
 
         This will listen continuously for a wake-up-word, then return the
@@ -480,6 +670,8 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
             source (AudioSource):  Source producing the audio chunks
             emitter (EventEmitter): Emitter for notifications of when recording
                                     begins and ends.
+            stream (AudioStreamHandler): Optional handler the phrase is
+                                         streamed to while it is recorded
 
         Returns:
             AudioData: audio with the user's utterance, minus the wake-up-word
@@ -497,7 +689,7 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         self.adjust_for_ambient_noise(source, 1.0)
 
         LOG.debug("Waiting for wake word...")
-        self._wait_until_wake_word(source, sec_per_buffer)
+        preroll = self._wait_until_wake_word(source, sec_per_buffer, emitter)
         if self._stop_signaled:
             return
 
@@ -505,14 +697,17 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
         emitter.emit("recognizer_loop:record_begin")
 
         # If enabled, play a wave file with a short sound to audibly
-        # indicate recording has begun.
+        # indicate recording has begun.  Started from a thread so no
+        # audio is missed while the player is launched.
         if self.config.get('confirm_listening'):
-            file = resolve_resource_file(
-                self.config.get('sounds').get('start_listening'))
-            if file:
-                play_wav(file)
-
-        frame_data = self._record_phrase(source, sec_per_buffer)
+            t = Thread(target=self._play_start_listening)
+            t.daemon = True
+            t.start()
+
+        if stream:
+            stream.stream_start(source.SAMPLE_RATE, source.SAMPLE_WIDTH)
+        frame_data = self._record_phrase(source, sec_per_buffer, stream,
+                                         preroll)
         audio_data = self._create_audio_data(frame_data, source)
         emitter.emit("recognizer_loop:record_end")
         if self.save_utterances:
@@ -525,6 +720,12 @@ class ResponsiveRecognizer(speech_recognition.Recognizer):
 
         return audio_data
 
+    def _play_start_listening(self):
+        file = resolve_resource_file(
+            self.config.get('sounds').get('start_listening'))
+        if file:
+            play_wav(file)
+
     def _adjust_threshold(self, energy, seconds_per_buffer):
         if self.dynamic_energy_threshold and energy > 0:
             # account for different chunk sizes and rates
@@ -0,0 +1,204 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import hashlib
+import os
+import stat
+import time
+from email.utils import formatdate
+from os.path import getmtime, isfile
+from threading import Event, Thread
+
+import requests
+
+from mycroft.util.log import LOG
+
+
+class ChecksumError(Exception):
+    pass
+
+
+def file_checksum(path):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ModelFile(object):
+    """
+    A file kept in sync with a remote copy.
+
+    Arguments:
+        path (str): local path of the file
+        url (str): where the file is downloaded from, its SHA-256 checksum
+                   is expected at the same url with .sha256 appended
+        refresh (bool): check for new versions, otherwise the file is only
+                        downloaded when missing
+        executable (bool): make the file executable
+    """
+
+    def __init__(self, path, url, refresh=True, executable=False):
+        self.path = path
+        self.url = url
+        self.refresh = refresh
+        self.executable = executable
+
+
+class ModelManager(object):
+    """
+    Downloads hotword models and keeps them up to date in the background.
+
+    Cached files are used as they are, the first check for updates happens
+    on the manager's thread.  New versions are downloaded next to the old
+    files, verified against their published checksums and moved into
+    place together, then on_update is called so a running engine can load
+    them.  Without a connection the manager keeps the cached files and
+    tries again later.
+
+    Arguments:
+        on_update (callable): called when files changed on disk
+        update_freq (float): hours between checks for new versions
+        retry_sec (float): seconds between attempts after a failure
+        timeout (float): seconds to wait for the server
+    """
+
+    def __init__(self, on_update=None, update_freq=24, retry_sec=300,
+                 timeout=10):
+        self.files = []
+        self.on_update = on_update
+        self.update_freq = update_freq
+        self.retry_sec = retry_sec
+        self.timeout = timeout
+        self._stopped = Event()
+        self._thread = None
+
+    def add(self, path, url, refresh=True, executable=False):
+        self.files.append(ModelFile(path, url, refresh, executable))
+
+    def is_cached(self):
+        """True if all files are available locally."""
+        return all(isfile(f.path) for f in self.files)
+
+    def is_stale(self, model_file):
+        if not isfile(model_file.path):
+            return True
+        age = time.time() - getmtime(model_file.path)
+        return model_file.refresh and age > self.update_freq * 60 * 60
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            wait = self.update_freq * 60 * 60
+            try:
+                self.update()
+            except (requests.RequestException, IOError, OSError,
+                    ChecksumError) as e:
+                LOG.warning('Could not update hotword models: ' + repr(e))
+                wait = self.retry_sec
+            self._stopped.wait(wait)
+
+    def update(self):
+        """
+            Download new versions of stale files.
+
+            Returns:
+                bool: True if any file was replaced
+        """
+        stale = [f for f in self.files if self.is_stale(f)]
+        if not stale:
+            return False
+
+        downloads = []
+        try:
+            for model_file in stale:
+                temp_file = self._download(model_file)
+                if temp_file:
+                    downloads.append((temp_file, model_file.path))
+            # Renaming is atomic, the files are replaced together once all
+            # of them have been verified
+            for temp_file, path in downloads:
+                os.rename(temp_file, path)
+        finally:
+            for temp_file, _ in downloads:
+                if isfile(temp_file):
+                    os.remove(temp_file)
+
+        if downloads:
+            LOG.info('Updated ' + ', '.join(p for _, p in downloads))
+            if self.on_update:
+                self.on_update()
+        return len(downloads) > 0
+
+    def _get_checksum(self, url):
+        response = requests.get(url + '.sha256', timeout=self.timeout)
+        if response.status_code == 404:
+            LOG.warning('No checksum published for ' + url)
+            return None
+        response.raise_for_status()
+        return response.text.split()[0].lower()
+
+    def _download(self, model_file):
+        """
+            Download a file next to its final location.
+
+            Returns:
+                str: path of the verified download, None if the local file
+                     is up to date
+        """
+        path = model_file.path
+        headers = {}
+        if isfile(path):
+            headers['If-Modified-Since'] = formatdate(getmtime(path),
+                                                      usegmt=True)
+        LOG.info('Downloading: ' + model_file.url)
+        response = requests.get(model_file.url, headers=headers,
+                                stream=True, timeout=self.timeout)
+        if response.status_code == 304:
+            os.utime(path, None)
+            return None
+        response.raise_for_status()
+        expected = self._get_checksum(model_file.url)
+
+        temp_file = path + '.download'
+        sha = hashlib.sha256()
+        with open(temp_file, 'wb') as f:
+            for block in response.iter_content(65536):
+                f.write(block)
+                sha.update(block)
+        digest = sha.hexdigest()
+
+        if expected and digest != expected:
+            os.remove(temp_file)
+            raise ChecksumError('Checksum mismatch for ' + model_file.url)
+        if isfile(path) and file_checksum(path) == digest:
+            # Unchanged, check again after another update_freq hours
+            os.remove(temp_file)
+            os.utime(path, None)
+            return None
+        if model_file.executable:
+            mode = os.stat(temp_file).st_mode
+            os.chmod(temp_file, mode | stat.S_IEXEC)
+        return temp_file
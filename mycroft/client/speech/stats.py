@@ -0,0 +1,61 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from threading import Lock
+
+
+class PipelineStats(object):
+    """
+    PipelineStats
+    thread safe counters, levels and timers describing the flow of audio
+    through the listener.  Timers keep a count, total and maximum so their
+    memory use doesn't grow with the number of utterances.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = {}
+        self._levels = {}
+        self._timers = {}
+
+    def increment(self, name, value=1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def level(self, name, value):
+        with self._lock:
+            self._levels[name] = value
+
+    def timer(self, name, value):
+        with self._lock:
+            timer = self._timers.setdefault(
+                name, {'count': 0, 'total': 0.0, 'max': 0.0})
+            timer['count'] += 1
+            timer['total'] += value
+            timer['max'] = max(timer['max'], value)
+
+    def get(self):
+        """
+            Get a snapshot of all statistics as a JSON serializable dict
+        """
+        with self._lock:
+            timers = {}
+            for name, timer in self._timers.items():
+                timers[name] = dict(timer)
+                timers[name]['avg'] = timer['total'] / timer['count']
+            return {
+                'counters': dict(self._counters),
+                'levels': dict(self._levels),
+                'timers': timers
+            }
@@ -0,0 +1,150 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import audioop
+
+from mycroft.util.log import LOG
+
+
+class EnergyVAD(object):
+    """Voice activity detection on chunk loudness alone.
+
+    A chunk is considered speech when its RMS energy is above the threshold
+    maintained by the recognizer.  This matches the behaviour the listener
+    always had and needs nothing beyond the standard library.
+
+    The recognizer calls process() once per chunk, uses the returned energy
+    to adapt its threshold and then asks is_speech() about the same chunk.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or {}
+        self.energy = 0
+
+    def process(self, chunk, sample_width):
+        """Analyze a chunk of audio.
+
+        Args:
+            chunk (bytes): raw audio
+            sample_width (int): bytes per sample
+
+        Returns:
+            int: RMS energy of the chunk
+        """
+        self.energy = audioop.rms(chunk, sample_width)
+        return self.energy
+
+    def is_speech(self, threshold):
+        """Classify the chunk last passed to process().
+
+        Args:
+            threshold (float): energy a chunk must exceed to be speech
+
+        Returns:
+            bool: True if the chunk holds speech
+        """
+        return self.energy > threshold
+
+    def reset(self):
+        """Forget state carried between chunks."""
+        pass
+
+
+class NumpyVAD(EnergyVAD):
+    """Voice activity detection on energy, zero-crossing rate and flux.
+
+    Loud chunks are only accepted as speech when they either have a low
+    zero-crossing rate (voiced sounds) or a spectral flux well above its
+    running average (the spectrum changed, as at syllable onsets).  Loud
+    but stationary noise such as fans or running water shows neither and
+    is rejected: its flux isn't low, random spectra differ from chunk to
+    chunk, but it stays around the same level.
+    """
+    DTYPES = {1: 'int8', 2: '<i2', 4: '<i4'}
+
+    def __init__(self, config=None):
+        super(NumpyVAD, self).__init__(config)
+        import numpy
+        self.np = numpy
+        self.max_zcr = self.config.get('max_zcr', 0.25)
+        self.min_flux = self.config.get('min_flux', 0.1)
+        # Flux must exceed its running average this many times for an onset
+        self.flux_ratio = self.config.get('flux_ratio', 2.0)
+        self.zcr = 0.0
+        self.flux = 0.0
+        self.mean_flux = None
+        self.onset = False
+        self._spectrum = None
+
+    def process(self, chunk, sample_width):
+        np = self.np
+        samples = np.frombuffer(chunk, dtype=self.DTYPES[sample_width])
+        if len(samples) < 2:
+            self.energy = 0
+            return self.energy
+        samples = samples.astype(np.float32)
+        self.energy = int(np.sqrt(np.mean(np.square(samples))))
+
+        signs = np.signbit(samples)
+        self.zcr = np.count_nonzero(signs[1:] != signs[:-1]) / float(
+            len(samples) - 1)
+
+        spectrum = np.abs(np.fft.rfft(samples))
+        total = spectrum.sum()
+        if total > 0:
+            spectrum /= total
+        prev = self._spectrum
+        self._spectrum = spectrum
+        if prev is None or len(prev) != len(spectrum):
+            self.flux = 0.0
+            self.onset = False
+            return self.energy
+
+        self.flux = float(np.maximum(spectrum - prev, 0).sum())
+        if self.mean_flux is None:
+            self.mean_flux = self.flux
+        self.onset = (self.flux > self.min_flux and
+                      self.flux > self.flux_ratio * self.mean_flux)
+        self.mean_flux = 0.9 * self.mean_flux + 0.1 * self.flux
+        return self.energy
+
+    def is_speech(self, threshold):
+        if self.energy <= threshold:
+            return False
+        return self.zcr < self.max_zcr or self.onset
+
+    def reset(self):
+        # The average flux describes the background and is kept
+        self._spectrum = None
+        self.onset = False
+
+
+class VADFactory(object):
+    CLASSES = {
+        "energy": EnergyVAD,
+        "numpy": NumpyVAD
+    }
+
+    @staticmethod
+    def create(config=None):
+        config = config or {}
+        module = config.get("module", "energy")
+        clazz = VADFactory.CLASSES.get(module, EnergyVAD)
+        try:
+            return clazz(config)
+        except (KeyboardInterrupt, SystemExit):
+            raise
+        except:
+            LOG.exception('Could not create VAD. Falling back to energy.')
+            return EnergyVAD(config)
@@ -0,0 +1,207 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import shutil
+import time
+from collections import OrderedDict
+from os.path import expanduser, getmtime, getsize, isdir, isfile, join
+from Queue import Queue, Empty, Full
+from subprocess import call
+from threading import Thread
+
+from speech_recognition import AudioData
+
+from mycroft.util import resolve_resource_file
+from mycroft.util.log import LOG
+
+
+class WakeWordSpool(object):
+    """
+    Saves wake word recordings and uploads them in the background.
+
+    The listener hands over raw audio with add(), which never blocks or
+    touches the disk.  A single worker thread writes the recordings to a
+    spool directory, removing the oldest ones when the spool grows beyond
+    its size limit, and uploads them in batches when uploading is enabled.
+    Recordings are deleted once uploaded, a failed upload is retried with
+    a growing delay.  Recordings left from an earlier run are picked up
+    again at start.
+
+    Arguments:
+        directory (str): spool directory for the recordings
+        max_queue (int): recordings waiting to be written before new ones
+                         are dropped
+    """
+
+    def __init__(self, directory, max_queue=10):
+        self.directory = directory
+        self.queue = Queue(max_queue)
+        self.upload_config = None
+        self.max_bytes = 0
+        self.dropped = 0
+        self.files = None  # path -> (size, time spooled), oldest first
+        self.retry_delay = 0
+        self.retry_at = 0
+        self._thread = None
+
+    def configure(self, upload_config, upload, max_mb):
+        """
+            Apply settings, can be called while the worker is running.
+
+            Args:
+                upload_config (dict): the "wake_word_upload" settings
+                upload (bool): True to upload the recordings
+                max_mb (float): size of the spool before the oldest
+                                recordings are removed, 0 for no limit
+        """
+        self.upload_config = upload_config if upload else None
+        self.max_bytes = int((max_mb or 0) * 1024 * 1024)
+
+    def add(self, file_name, frame_data, sample_rate, sample_width):
+        """
+            Queue a recording to be saved, never blocks.
+
+            Args:
+                file_name (str): name of the file in the spool directory
+                frame_data (bytes): raw audio
+                sample_rate (int): samples per second
+                sample_width (int): bytes per sample
+        """
+        if not self._thread:
+            self._thread = Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        try:
+            self.queue.put_nowait((file_name, frame_data, sample_rate,
+                                   sample_width))
+        except Full:
+            self.dropped += 1
+            LOG.warning('Wake word spool is busy, recording dropped')
+
+    def stop(self):
+        """Finish writing queued recordings and end the worker."""
+        if self._thread:
+            self.queue.put(None)
+            self._thread = None
+
+    def _run(self):
+        self._scan()
+        while True:
+            try:
+                item = self.queue.get(timeout=self._time_to_upload())
+            except Empty:
+                item = False
+            if item is None:
+                break
+            try:
+                if item:
+                    self._save(*item)
+                if self._upload_due():
+                    self._upload_batch()
+            except Exception:
+                LOG.exception('Wake word spool failed')
+
+    def _scan(self):
+        """Spool recordings saved by an earlier run."""
+        if not isdir(self.directory):
+            os.makedirs(self.directory)
+        paths = [join(self.directory, f) for f in os.listdir(self.directory)
+                 if f.endswith('.wav')]
+        self.files = OrderedDict(
+            (path, (getsize(path), getmtime(path)))
+            for path in sorted(paths, key=getmtime))
+
+    def _save(self, file_name, frame_data, sample_rate, sample_width):
+        path = join(self.directory, file_name)
+        wav = AudioData(frame_data, sample_rate, sample_width).get_wav_data()
+        with open(path, 'wb') as f:
+            f.write(wav)
+        self.files[path] = (len(wav), time.time())
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        total = sum(size for size, _ in self.files.values())
+        while self.max_bytes and total > self.max_bytes and self.files:
+            path, (size, _) = self.files.popitem(last=False)
+            total -= size
+            self._remove(path)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _time_to_upload(self):
+        """Seconds until an upload is due, None if none is pending."""
+        if not self.upload_config or not self.files:
+            return None
+        oldest = next(iter(self.files.values()))[1]
+        if len(self.files) >= self.upload_config.get('batch_size', 10):
+            due = self.retry_at
+        else:
+            interval = self.upload_config.get('batch_interval', 300)
+            due = max(self.retry_at, oldest + interval)
+        return max(due - time.time(), 0)
+
+    def _upload_due(self):
+        wait = self._time_to_upload()
+        return wait is not None and wait <= 0
+
+    def _upload_batch(self):
+        batch = list(self.files)[:self.upload_config.get('batch_size', 10)]
+        try:
+            uploaded = self._upload(batch)
+        except Exception:
+            # e.g. scp missing or incomplete settings, retry later
+            LOG.exception('Wake word upload failed')
+            uploaded = False
+        if uploaded:
+            for path in batch:
+                self.files.pop(path, None)
+                self._remove(path)
+            self.retry_delay = 0
+            self.retry_at = 0
+        else:
+            self.retry_delay = min(
+                max(self.retry_delay * 2,
+                    self.upload_config.get('min_retry', 30)),
+                self.upload_config.get('max_retry', 3600))
+            self.retry_at = time.time() + self.retry_delay
+            LOG.debug('Wake word upload failed, retrying in {}s'.format(
+                self.retry_delay))
+
+    def _upload(self, paths):
+        """
+            Copy recordings to the upload server in one transfer.
+
+            Returns:
+                bool: True if all recordings were uploaded
+        """
+        config = self.upload_config
+        keyfile = expanduser('~/.mycroft/wakeword_rsa')
+        if not isfile(keyfile):
+            shutil.copy2(resolve_resource_file('wakeword_rsa'), keyfile)
+            os.chmod(keyfile, 0o600)
+
+        address = config['user'] + '@' + config['server'] + ':' + \
+            config['folder']
+        LOG.debug('Uploading {} wake words...'.format(len(paths)))
+        for path in paths:
+            os.chmod(path, 0o666)
+        cmd = ['scp', '-o', 'StrictHostKeyChecking=no',
+               '-P', str(config['port']), '-i', keyfile] + paths + [address]
+        return call(cmd) == 0
@@ -35,6 +35,7 @@ from threading import Thread, Lock                          # nopep8
 from mycroft.messagebus.client.ws import WebsocketClient    # nopep8
 from mycroft.messagebus.message import Message              # nopep8
 from mycroft.util import get_ipc_directory                  # nopep8
+from mycroft.util.level_meter import LevelMeterReader       # nopep8
 from mycroft.util.log import LOG                            # nopep8
 
 ws = None
@@ -201,45 +202,31 @@ def start_log_monitor(filename):
 class MicMonitorThread(Thread):
     def __init__(self, filename):
         Thread.__init__(self)
-        self.filename = filename
-        self.st_results = os.stat(filename)
+        self.meter = LevelMeterReader(filename)
+        self.sequence = None
 
     def run(self):
+        global meter_cur
+        global meter_thresh
+
         while True:
             try:
-                st_results = os.stat(self.filename)
-
-                if (not st_results.st_ctime == self.st_results.st_ctime or
-                        not st_results.st_mtime == self.st_results.st_mtime):
-                    self.read_file_from(0)
-                    self.st_results = st_results
+                # Reads shared memory, no system calls unless the speech
+                # client hasn't published anything yet
+                level = self.meter.read()
+                if level and level.sequence != self.sequence:
+                    self.sequence = level.sequence
+                    meter_cur = level.energy
+                    meter_thresh = level.threshold
                     draw_screen()
             finally:
                 time.sleep(0.1)
 
-    def read_file_from(self, bytefrom):
-        global meter_cur
-        global meter_thresh
-
-        with open(self.filename, 'rb') as fh:
-            fh.seek(bytefrom)
-            while True:
-                line = fh.readline()
-                if line == "":
-                    break
-
-                # Just adjust meter settings
-                # Ex:Energy:  cur=4 thresh=1.5
-                parts = line.split("=")
-                meter_thresh = float(parts[len(parts) - 1])
-                meter_cur = float(parts[len(parts) - 2].split(" ")[0])
-
 
 def start_mic_monitor(filename):
-    if os.path.isfile(filename):
-        thread = MicMonitorThread(filename)
-        thread.setDaemon(True)  # this thread won't prevent prog from exiting
-        thread.start()
+    thread = MicMonitorThread(filename)
+    thread.setDaemon(True)  # this thread won't prevent prog from exiting
+    thread.start()
 
 
 def add_log_message(message):
@@ -172,6 +172,7 @@ REMOTE_CONFIG = "mycroft.ai"
 class Configuration(object):
     __config = {}  # Cached config
     __patch = {}  # Patch config that skills can update to override config
+    __listeners = []  # Callbacks notified when the config is reloaded
 
     @staticmethod
     def get(configs=None, cache=True):
@@ -234,13 +235,45 @@ class Configuration(object):
         ws.on("configuration.updated", Configuration.updated)
         ws.on("configuration.patch", Configuration.patch)
 
+    @staticmethod
+    def add_listener(callback):
+        """
+            Register a callback to run after the cached config has been
+            reloaded. The callback receives the new config dict.
+
+            Args:
+                callback (callable): function to call on changes
+        """
+        if callback not in Configuration.__listeners:
+            Configuration.__listeners.append(callback)
+
+    @staticmethod
+    def remove_listener(callback):
+        """
+            Unregister a callback added with add_listener().
+
+            Args:
+                callback (callable): function to remove
+        """
+        if callback in Configuration.__listeners:
+            Configuration.__listeners.remove(callback)
+
+    @staticmethod
+    def _notify(config):
+        for callback in list(Configuration.__listeners):
+            try:
+                callback(config)
+            except Exception:
+                LOG.exception('Error in configuration listener')
+
     @staticmethod
     def updated(message):
         """
             handler for configuration.updated, triggers an update
             of cached config.
         """
-        Configuration.load_config_stack(cache=True)
+        config = Configuration.load_config_stack(cache=True)
+        Configuration._notify(config)
 
     @staticmethod
     def patch(message):
@@ -253,4 +286,5 @@ class Configuration(object):
         """
         config = message.data.get("config", {})
         merge_dict(Configuration.__patch, config)
-        Configuration.load_config_stack(cache=True)
+        config = Configuration.load_config_stack(cache=True)
+        Configuration._notify(config)
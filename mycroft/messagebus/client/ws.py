@@ -15,17 +15,41 @@
 import json
 import time
 from multiprocessing.pool import ThreadPool
+from threading import Lock
+from uuid import uuid4
 
+from concurrent.futures import Future, TimeoutError
 from pyee import EventEmitter
-from websocket import WebSocketApp
+from websocket import ABNF, WebSocketApp
 
 from mycroft.configuration import Configuration
-from mycroft.messagebus.message import Message
+from mycroft.messagebus.encoding import MessageEncodingFactory
+from mycroft.messagebus.message import (
+    CORRELATION_ID,
+    ENCODING,
+    Message,
+    SUBSCRIBE,
+    WILDCARD
+)
 from mycroft.util import validate_param
 from mycroft.util.log import LOG
 
 
 class WebsocketClient(object):
+    """
+    Connection to the messagebus.
+
+    Only the message types handlers are registered for are requested from
+    the bus.  A handler for 'message', which sees all raw messages, makes
+    the client receive everything.
+
+    Messages are sent as JSON unless another encoding from the
+    "encodings" setting has been agreed on with the bus.  Handlers for
+    'message' always see JSON.
+    """
+    # Events of the client itself, never sent over the bus
+    LOCAL_EVENTS = ('open', 'close', 'error', 'message')
+
     def __init__(self, host=None, port=None, route=None, ssl=None):
 
         config = Configuration.get().get("websocket")
@@ -42,6 +66,12 @@ class WebsocketClient(object):
         self.client = self.create_client()
         self.pool = ThreadPool(10)
         self.retry = 5
+        self.subscriptions = set()
+        self.wildcard = False
+        self.encodings = config.get("encodings", ["json"])
+        self.encoding = MessageEncodingFactory.get("json")
+        self.waiters = {}  # correlation id -> (reply type, Future)
+        self.waiters_lock = Lock()
 
     @staticmethod
     def build_url(host, port, route, ssl):
@@ -55,6 +85,16 @@ class WebsocketClient(object):
 
     def on_open(self, ws):
         LOG.info("Connected")
+        # Every connection starts out with JSON
+        self.encoding = MessageEncodingFactory.get("json")
+        names = [e.name for e in
+                 MessageEncodingFactory.available(self.encodings)]
+        if names and names != ["json"]:
+            self.emit(Message(ENCODING, {'encodings': names}))
+        if self.wildcard:
+            self.send_subscriptions([WILDCARD])
+        else:
+            self.send_subscriptions(sorted(self.subscriptions))
         self.emitter.emit("open")
         # Restore reconnect timer to 5 seconds on sucessful connect
         self.retry = 5
@@ -75,8 +115,24 @@ class WebsocketClient(object):
         self.run_forever()
 
     def on_message(self, ws, message):
+        encoding = MessageEncodingFactory.detect(message)
+        if encoding is None:
+            LOG.error('Message in unknown encoding: ' + repr(message[:20]))
+            return
+        try:
+            parsed_message = encoding.decode(message)
+        except (ValueError, AttributeError) as e:
+            LOG.error('Invalid message: {}'.format(e))
+            return
+        if encoding.binary and self.emitter.listeners('message'):
+            message = parsed_message.serialize()
         self.emitter.emit('message', message)
-        parsed_message = Message.deserialize(message)
+        if parsed_message.type == ENCODING + '.response':
+            self.encoding = MessageEncodingFactory.get(
+                parsed_message.data.get('encoding')) or \
+                MessageEncodingFactory.get("json")
+        if self.waiters:
+            self.resolve_waiter(parsed_message)
         self.pool.apply_async(
             self.emitter.emit, (parsed_message.type, parsed_message))
 
@@ -85,15 +141,88 @@ class WebsocketClient(object):
                 not self.client.sock.connected):
             return
         if hasattr(message, 'serialize'):
-            self.client.send(message.serialize())
+            encoding = self.encoding
+            if encoding.binary:
+                self.client.send(encoding.encode(message),
+                                 ABNF.OPCODE_BINARY)
+            else:
+                self.client.send(encoding.encode(message))
         else:
             self.client.send(json.dumps(message.__dict__))
 
+    def request(self, message, timeout=3.0, reply_type=None):
+        """
+            Send a message and wait for the reply.
+
+            The reply is matched to the request by a correlation id added
+            to the context, so responders must answer with message.reply().
+
+            Args:
+                message (Message): the request
+                timeout (float): seconds to wait for the reply
+                reply_type (str): type of the reply, by default the type of
+                                  the request followed by '.response'
+
+            Returns:
+                Message: the reply, None if it didn't arrive in time
+        """
+        reply_type = reply_type or message.type + '.response'
+        self.subscribe(reply_type)
+        correlation_id = str(uuid4())
+        message.context = dict(message.context or {})
+        message.context[CORRELATION_ID] = correlation_id
+        future = Future()
+        with self.waiters_lock:
+            self.waiters[correlation_id] = (reply_type, future)
+        try:
+            self.emit(message)
+            return future.result(timeout)
+        except TimeoutError:
+            return None
+        finally:
+            with self.waiters_lock:
+                self.waiters.pop(correlation_id, None)
+
+    def resolve_waiter(self, message):
+        """Hand a reply to the request waiting for it, if any."""
+        context = message.context
+        if not isinstance(context, dict) or CORRELATION_ID not in context:
+            return
+        with self.waiters_lock:
+            waiter = self.waiters.get(context[CORRELATION_ID])
+            if not waiter or waiter[0] != message.type:
+                return
+            del self.waiters[context[CORRELATION_ID]]
+        waiter[1].set_result(message)
+
     def on(self, event_name, func):
         self.emitter.on(event_name, func)
+        self.subscribe(event_name)
 
     def once(self, event_name, func):
         self.emitter.once(event_name, func)
+        self.subscribe(event_name)
+
+    def subscribe(self, event_name):
+        """
+            Request messages of a type from the bus.
+
+            Args:
+                event_name (str): message type, 'message' for all messages
+        """
+        if event_name == 'message':
+            if not self.wildcard:
+                self.wildcard = True
+                self.send_subscriptions([WILDCARD])
+        elif event_name not in self.LOCAL_EVENTS and \
+                event_name not in self.subscriptions:
+            self.subscriptions.add(event_name)
+            if not self.wildcard:
+                self.send_subscriptions([event_name])
+
+    def send_subscriptions(self, types):
+        """Tell the bus which message types to send, once connected."""
+        self.emit(Message(SUBSCRIBE, {'types': types}))
 
     def remove(self, event_name, func):
         self.emitter.remove_listener(event_name, func)
@@ -0,0 +1,186 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import struct
+
+from mycroft.messagebus.message import Message, peek_type
+from mycroft.util.log import LOG
+
+
+class MessageEncoding(object):
+    """
+    Wire format of messages on the bus.
+
+    A connection starts out with JSON and can ask the messagebus service
+    for another encoding, see ENCODING in mycroft.messagebus.message.
+    Frames are recognized by their first byte, so every encoding can be
+    received at any time.
+    """
+    name = None
+    binary = False  # Sent in binary websocket frames
+    first_byte = None  # First byte of every encoded message
+
+    def encode(self, message):
+        """
+            Encode a message.
+
+            Args:
+                message (Message): message to encode
+
+            Returns:
+                str: the encoded message
+        """
+        raise NotImplementedError
+
+    def decode(self, value):
+        """
+            Decode a message, raises ValueError if it is invalid.
+
+            Args:
+                value (str): encoded message
+
+            Returns:
+                Message: the message
+        """
+        raise NotImplementedError
+
+    def peek_type(self, value):
+        """Get the message type without decoding, None if it can't be."""
+        return None
+
+
+class JsonEncoding(MessageEncoding):
+    name = 'json'
+    first_byte = ord('{')
+
+    def encode(self, message):
+        return message.serialize()
+
+    def decode(self, value):
+        return Message.deserialize(value)
+
+    def peek_type(self, value):
+        return peek_type(value)
+
+
+class MsgPackEncoding(MessageEncoding):
+    """
+    MessagePack, a message is the array [type, data, context].
+
+    Binary data (a bytearray) is carried as it is in an extension type
+    instead of being base64 encoded.
+    """
+    name = 'msgpack'
+    binary = True
+    first_byte = 0x93  # Array of three
+    BINARY_TYPE = 1  # Extension type code of binary data
+
+    def __init__(self):
+        import msgpack
+        self.msgpack = msgpack
+
+    def _pack_binary(self, obj):
+        if isinstance(obj, bytearray):
+            return self.msgpack.ExtType(self.BINARY_TYPE, bytes(obj))
+        raise TypeError(repr(obj) + ' can not be encoded')
+
+    def _unpack_binary(self, code, data):
+        if code == self.BINARY_TYPE:
+            return bytearray(data)
+        return self.msgpack.ExtType(code, data)
+
+    def encode(self, message):
+        return self.msgpack.packb(
+            [message.type, message.data, message.context],
+            default=self._pack_binary)
+
+    def decode(self, value):
+        try:
+            msg_type, data, context = self.msgpack.unpackb(
+                value, encoding='utf-8', ext_hook=self._unpack_binary)
+        except (self.msgpack.UnpackException, TypeError, ValueError) as e:
+            raise ValueError('Invalid message: ' + repr(e))
+        return Message(msg_type, data, context)
+
+    def peek_type(self, value):
+        # The type is the first item, a string with its length up front
+        if len(value) < 2:
+            return None
+        size_byte = ord(value[1])
+        if 0xa0 <= size_byte <= 0xbf:
+            start, size = 2, size_byte - 0xa0
+        elif size_byte == 0xd9 and len(value) > 2:
+            start, size = 3, ord(value[2])
+        elif size_byte == 0xda and len(value) > 3:
+            start, size = 4, struct.unpack('>H', value[2:4])[0]
+        else:
+            return None
+        if len(value) < start + size:
+            return None
+        try:
+            return value[start:start + size].decode('utf-8')
+        except UnicodeDecodeError:
+            return None
+
+
+class MessageEncodingFactory(object):
+    CLASSES = {
+        'json': JsonEncoding,
+        'msgpack': MsgPackEncoding
+    }
+    # Shared instances, None if the encoding isn't available
+    _encodings = {}
+
+    @staticmethod
+    def get(name):
+        """
+            Get an encoding by name.
+
+            Returns:
+                MessageEncoding: the encoding, None if it is unknown or
+                                 its module isn't installed
+        """
+        encodings = MessageEncodingFactory._encodings
+        if name not in encodings:
+            encodings[name] = None
+            clazz = MessageEncodingFactory.CLASSES.get(name)
+            if clazz:
+                try:
+                    encodings[name] = clazz()
+                except ImportError as e:
+                    LOG.debug('{} encoding not available: {}'.format(
+                        name, e))
+        return encodings[name]
+
+    @staticmethod
+    def available(names):
+        """Get the encodings of names that are available, in order."""
+        encodings = [MessageEncodingFactory.get(n) for n in names]
+        return [e for e in encodings if e]
+
+    @staticmethod
+    def detect(value):
+        """
+            Get the encoding of a received frame.
+
+            Returns:
+                MessageEncoding: the encoding, None if unknown
+        """
+        if not value:
+            return None
+        first_byte = ord(value[0])
+        for name, clazz in MessageEncodingFactory.CLASSES.items():
+            if clazz.first_byte == first_byte:
+                return MessageEncodingFactory.get(name)
+        return None
@@ -13,6 +13,61 @@
 # limitations under the License.
 #
 import json
+from base64 import b64decode, b64encode
+
+# Messages handled by the messagebus service itself, declaring the message
+# types a connection wants to receive.  data: {"types": ["speak", "skill.*"]}
+SUBSCRIBE = 'mycroft.bus.subscribe'
+UNSUBSCRIBE = 'mycroft.bus.unsubscribe'
+# Asks the messagebus service for the state of its send queues, answered
+# with a "mycroft.bus.stats.response" message to the sender
+STATS = 'mycroft.bus.stats'
+# Asks the messagebus service to send in another encoding, answered in the
+# current one with the encoding chosen.  data: {"encodings": ["msgpack"]}
+ENCODING = 'mycroft.bus.encoding'
+# Context key matching a reply to its request, see WebsocketClient.request()
+CORRELATION_ID = 'correlation_id'
+# Pattern subscribing to all messages
+WILDCARD = '*'
+# Start of every serialized Message
+TYPE_PREFIX = '{"type": "'
+# Key of the object holding binary data (a bytearray) in JSON, base64
+# encoded.  Binary encodings carry the bytes as they are.
+BINARY_KEY = '__binary__'
+
+
+def peek_type(value):
+    """Get the type of a serialized message without parsing it.
+
+    Only works for messages serialized by Message.serialize(), which puts
+    the type first.
+
+    Args:
+        value (str): serialized message
+
+    Returns:
+        str: the message type, None if it can't be read without parsing
+    """
+    if value.startswith(TYPE_PREFIX):
+        start = len(TYPE_PREFIX)
+        end = value.find('"', start)
+        if end > 0:
+            msg_type = value[start:end]
+            if '\\' not in msg_type:
+                return msg_type
+    return None
+
+
+def _encode_binary(obj):
+    if isinstance(obj, bytearray):
+        return {BINARY_KEY: b64encode(obj)}
+    raise TypeError(repr(obj) + ' is not JSON serializable')
+
+
+def _decode_binary(obj):
+    if BINARY_KEY in obj and len(obj) == 1:
+        return bytearray(b64decode(obj[BINARY_KEY]))
+    return obj
 
 
 class Message(object):
@@ -22,7 +77,7 @@ class Message(object):
         between processes of mycroft service, voice, skill and cli
     Attributes:
         type: type of data sent within the message.
-        data: data sent within the message
+        data: data sent within the message, binary data as bytearray
         context: info about the message not part of data such as source,
             destination or domain.
     """
@@ -47,11 +102,12 @@ class Message(object):
         Returns:
             str: a json string representation of the message.
         """
-        return json.dumps({
-            'type': self.type,
-            'data': self.data,
-            'context': self.context
-        })
+        # The type goes first so the messagebus service can route the
+        # message without parsing it, see peek_type()
+        return '{"type": %s, "data": %s, "context": %s}' % (
+            json.dumps(self.type),
+            json.dumps(self.data, default=_encode_binary),
+            json.dumps(self.context, default=_encode_binary))
 
     @staticmethod
     def deserialize(value):
@@ -69,7 +125,10 @@ class Message(object):
             int the function.
             value(str): This is the string received from the websocket
         """
-        obj = json.loads(value)
+        if BINARY_KEY in value:
+            obj = json.loads(value, object_hook=_decode_binary)
+        else:
+            obj = json.loads(value)
         return Message(obj.get('type'), obj.get('data'), obj.get('context'))
 
     def reply(self, type, data, context=None):
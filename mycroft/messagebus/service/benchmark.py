@@ -0,0 +1,218 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import print_function
+import argparse
+import logging
+import time
+
+from pyee import EventEmitter
+
+import mycroft.messagebus.service.ws as ws
+from mycroft.messagebus.encoding import MessageEncodingFactory
+from mycroft.messagebus.message import Message
+from mycroft.util.log import LOG
+
+"""
+Messagebus Benchmark
+Measures the messages per second routed by the messagebus service with a
+number of connected clients.  The handlers run in process with connections
+that discard what they're sent, so only the routing itself is timed.  The
+router of the service, which reads the type without parsing the message,
+is compared to parsing every message before forwarding it, both with the
+message logged as the service does now ("parse all") and with the logger
+named from the call stack of every message as it did before ("before").
+
+Part of the clients subscribe to the message types they use, the others
+receive everything, like clients unaware of subscriptions.
+
+With --round-trip the message encodings are compared instead, timing
+encoding and decoding the typical messages and a second of audio.
+
+Usage: python -m mycroft.messagebus.service.benchmark -c 10 25 50
+"""
+
+# Types sent in a typical interaction, the display updates dominate
+MESSAGE_MIX = [
+    Message('recognizer_loop:wakeword', {'utterance': 'hey mycroft'}),
+    Message('recognizer_loop:record_begin'),
+    Message('recognizer_loop:record_end'),
+    Message('recognizer_loop:utterance',
+            {'utterances': ['what time is it'], 'lang': 'en-us'}),
+    Message('mycroft.skill.handler.start', {'handler': 'handle_query_time'}),
+    Message('speak', {'utterance': 'It is ten past four.',
+                      'expect_response': False}),
+    Message('mycroft.skill.handler.complete',
+            {'handler': 'handle_query_time'}),
+    Message('enclosure.mouth.text', {'text': '4:10 PM'}),
+    Message('recognizer_loop:audio_output_start')
+] + [
+    Message('enclosure.mouth.viseme', {'code': i % 7, 'until': 1.5 + i})
+    for i in range(12)
+] + [
+    Message('recognizer_loop:audio_output_end'),
+    Message('enclosure.mouth.reset')
+]
+
+# One second of 16 bit audio at 16 kHz
+AUDIO_MESSAGE = Message('recognizer_loop:audio', {
+    'data': bytearray(b'\x01\x80') * 16000,
+    'sample_rate': 16000,
+    'sample_width': 2
+})
+
+# Subscriptions of the clients, None receives everything
+CLIENT_TYPES = [
+    None,
+    ['speak', 'recognizer_loop:*', 'mycroft.stop'],
+    ['enclosure.*', 'recognizer_loop:*'],
+    ['mycroft.skill.handler.*', 'mycroft.skills.*'],
+    None
+]
+
+
+def parse_every_message(handler, message):
+    """Routing parsing every message."""
+    LOG(ws.__name__ + ':on_message').debug(message)
+    return parse_message(handler, message)
+
+
+def parse_every_message_before(handler, message):
+    """Routing parsing every message, as the service did before."""
+    LOG.debug(message)
+    return parse_message(handler, message)
+
+
+def parse_message(handler, message):
+    try:
+        deserialized_message = Message.deserialize(message)
+    except ValueError:
+        return
+    handler.emitter.emit(deserialized_message.type, deserialized_message)
+    for client in ws.subscriptions.recipients(deserialized_message.type):
+        client.send_queue.put(message, deserialized_message.type,
+                              client.encoding.binary)
+
+
+class Stream(object):
+    """Stream of a client reading as fast as it is sent to."""
+
+    def writing(self):
+        return False
+
+
+def create_clients(count):
+    """Connect count clients to the service, with their subscriptions."""
+    ws.client_connections = []
+    ws.subscriptions = ws.Subscriptions()
+    clients = []
+    for i in range(count):
+        client = ws.WebsocketEventHandler.__new__(ws.WebsocketEventHandler)
+        client.emitter = EventEmitter()
+        client.stream = Stream()
+        client.write_message = lambda message, binary=False: None
+        client.open()
+        types = CLIENT_TYPES[i % len(CLIENT_TYPES)]
+        if types:
+            client.on_message(Message('mycroft.bus.subscribe',
+                                      {'types': types}).serialize())
+        clients.append(client)
+    return clients
+
+
+def benchmark(route, clients, count):
+    """
+        Route messages from the clients in turn.
+
+        Args:
+            route (callable): function routing a message from a client
+            clients (list): connected clients
+            count (int): number of messages to route
+
+        Returns:
+            float: messages routed per second
+    """
+    messages = [m.serialize() for m in MESSAGE_MIX]
+    started = time.time()
+    for i in range(count):
+        route(clients[i % len(clients)], messages[i % len(messages)])
+    return count / (time.time() - started)
+
+
+def round_trip(encoding, messages, count):
+    """
+        Encode and decode messages.
+
+        Args:
+            encoding (MessageEncoding): encoding to time
+            messages (list): messages to encode in turn
+            count (int): number of messages to encode and decode
+
+        Returns:
+            tuple: messages per second and mean size of an encoded message
+    """
+    started = time.time()
+    for i in range(count):
+        encoding.decode(encoding.encode(messages[i % len(messages)]))
+    rate = count / (time.time() - started)
+    size = sum(len(encoding.encode(m)) for m in messages) / len(messages)
+    return rate, size
+
+
+def run_round_trip(count):
+    encodings = MessageEncodingFactory.available(
+        sorted(MessageEncodingFactory.CLASSES))
+    print('{:<10} {:>20} {:>20}'.format('', 'typical', 'audio'))
+    for encoding in encodings:
+        typical = round_trip(encoding, MESSAGE_MIX, count)
+        audio = round_trip(encoding, [AUDIO_MESSAGE], max(count // 100, 1))
+        print('{:<10} {:>9.0f}/s {:>6} B {:>9.0f}/s {:>6} B'.format(
+            encoding.name, typical[0], typical[1], audio[0], audio[1]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-c', '--clients', dest='clients', type=int, nargs='+',
+        default=[10, 25, 50],
+        help="Numbers of connected clients (Default: 10 25 50)")
+    parser.add_argument(
+        '-n', '--messages', dest='messages', type=int, default=20000,
+        help="Messages routed per run (Default: 20000)")
+    parser.add_argument(
+        '--round-trip', dest='round_trip', action='store_true',
+        help="Compare encoding and decoding in each message encoding")
+    args = parser.parse_args()
+    if args.round_trip:
+        run_round_trip(args.messages)
+        return
+
+    # Keep the output clean, the logging calls are still made
+    LOG.level = logging.WARNING
+    routers = [
+        ('before', parse_every_message_before),
+        ('parse all', parse_every_message),
+        ('router', ws.WebsocketEventHandler.on_message)
+    ]
+    print(('{:>8}' + ' {:>12}' * len(routers)).format(
+        'clients', *[name for name, _ in routers]))
+    for count in args.clients:
+        clients = create_clients(count)
+        rates = [benchmark(route, clients, args.messages)
+                 for _, route in routers]
+        print(('{:>8}' + ' {:>10.0f}/s' * len(rates)).format(count, *rates))
+
+
+if __name__ == "__main__":
+    main()
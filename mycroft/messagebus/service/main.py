@@ -46,7 +46,8 @@ def main():
     validate_param(route, "websocket.route")
 
     routes = [
-        (route, WebsocketEventHandler)
+        (route, WebsocketEventHandler,
+         {'send_queue': config.get('send_queue')})
     ]
     application = web.Application(routes, **settings)
     application.listen(port, host)
@@ -15,58 +15,362 @@
 import json
 import sys
 import traceback
+from collections import deque
+from fnmatch import fnmatchcase
 
 import tornado.websocket
 from pyee import EventEmitter
+from tornado.iostream import StreamClosedError
 
-from mycroft.messagebus.message import Message
+from mycroft.messagebus.encoding import MessageEncodingFactory
+from mycroft.messagebus.message import (
+    ENCODING,
+    Message,
+    STATS,
+    SUBSCRIBE,
+    UNSUBSCRIBE,
+    WILDCARD
+)
 from mycroft.util.log import LOG
 
-
 EventBusEmitter = EventEmitter()
 
+# Messages handled by the service itself
+BUS_TYPES = (SUBSCRIBE, UNSUBSCRIBE, STATS, ENCODING)
+
 client_connections = []
 
 
+class Subscriptions(object):
+    """
+    Message types each connection receives.
+
+    A connection receives every message until it subscribes to something,
+    so clients unaware of subscriptions keep working.  Patterns use shell
+    style wildcards, "*" alone restores receiving everything.  The
+    recipients of each message type are cached until a subscription
+    changes.
+    """
+
+    def __init__(self):
+        self.patterns = {}  # connection -> patterns, missing if wildcard
+        self._recipients = {}
+
+    def add(self, connection):
+        self.patterns.pop(connection, None)
+        self._recipients.clear()
+
+    def remove(self, connection):
+        self.patterns.pop(connection, None)
+        self._recipients.clear()
+
+    def subscribe(self, connection, patterns):
+        if WILDCARD in patterns:
+            self.patterns.pop(connection, None)
+        else:
+            self.patterns.setdefault(connection, set()).update(patterns)
+        self._recipients.clear()
+
+    def unsubscribe(self, connection, patterns):
+        subscribed = self.patterns.get(connection)
+        if subscribed is None:
+            return  # Receiving everything, there's nothing to take away
+        subscribed.difference_update(patterns)
+        self._recipients.clear()
+
+    def receives(self, connection, msg_type):
+        patterns = self.patterns.get(connection)
+        if patterns is None:
+            return True
+        return msg_type in patterns or any(
+            fnmatchcase(msg_type, p) for p in patterns)
+
+    def recipients(self, msg_type):
+        """
+            Get the connections receiving a message type.
+
+            Args:
+                msg_type (str): type of the message
+
+            Returns:
+                list: connections, in the order they connected
+        """
+        recipients = self._recipients.get(msg_type)
+        if recipients is None:
+            recipients = [c for c in client_connections
+                          if self.receives(c, msg_type)]
+            self._recipients[msg_type] = recipients
+        return recipients
+
+
+subscriptions = Subscriptions()
+
+# Connections closed for falling behind
+slow_disconnects = 0
+
+
+class SendQueue(object):
+    """
+    Messages waiting to be sent to a connection.
+
+    Messages are handed to tornado only while the socket takes them, the
+    rest wait here until it has sent what it holds.  A client reading
+    slower than messages arrive fills its own queue, instead of growing
+    the write buffers of the service or delaying other clients.  When the
+    queue is full the policy decides what happens:
+
+        drop_oldest: the oldest message is dropped
+        priority: the oldest message of the lowest priority is dropped
+        disconnect: the client is disconnected
+
+    Arguments:
+        connection (WebsocketEventHandler): connection sent to
+        config (dict): the "send_queue" settings of "websocket"
+    """
+    POLICIES = ('drop_oldest', 'priority', 'disconnect')
+
+    def __init__(self, connection, config=None):
+        config = config or {}
+        self.connection = connection
+        self.max_messages = config.get('max_messages', 1000)
+        self.policy = config.get('policy', 'drop_oldest')
+        if self.policy not in self.POLICIES:
+            raise ValueError('Unknown send queue policy: ' + self.policy)
+        self.priorities = config.get('priorities', {})
+        self._priority = {}  # message type -> priority
+        self.messages = deque()  # (type, message, binary), oldest first
+        self.max_depth = 0
+        self.sent = 0
+        self.dropped = 0
+        self.waiting = False
+        self.closed = False
+
+    @property
+    def depth(self):
+        return len(self.messages)
+
+    def priority(self, msg_type):
+        """Priority of a message type, 0 unless configured."""
+        priority = self._priority.get(msg_type)
+        if priority is None:
+            priority = self.priorities.get(msg_type)
+            if priority is None:
+                priority = max([p for pattern, p in self.priorities.items()
+                                if fnmatchcase(msg_type, pattern)] or [0])
+            self._priority[msg_type] = priority
+        return priority
+
+    def put(self, message, msg_type=None, binary=False):
+        """
+            Send a message, queuing it while the client is busy.
+
+            Args:
+                message (str): serialized message
+                msg_type (str): type of the message
+                binary (bool): send in a binary frame
+        """
+        if self.closed:
+            return
+        if not self.messages:
+            # Client keeping up, skip the queue
+            try:
+                if not self.connection.stream.writing():
+                    self.connection.write_message(message, binary)
+                    self.sent += 1
+                    return
+            except (tornado.websocket.WebSocketClosedError,
+                    StreamClosedError):
+                self.close()
+                return
+        self.messages.append((msg_type, message, binary))
+        if len(self.messages) > self.max_messages:
+            self._overflow()
+        self.max_depth = max(self.max_depth, len(self.messages))
+        self.flush()
+
+    def flush(self):
+        """Hand messages to tornado while the socket takes them."""
+        stream = self.connection.stream
+        try:
+            while self.messages and not stream.writing():
+                _, message, binary = self.messages.popleft()
+                self.connection.write_message(message, binary)
+                self.sent += 1
+            if self.messages and not self.waiting:
+                # Called once everything written so far has been sent
+                self.waiting = True
+                stream.write(b'', self._on_sent)
+        except (tornado.websocket.WebSocketClosedError, StreamClosedError):
+            self.close()
+
+    def _on_sent(self):
+        self.waiting = False
+        self.flush()
+
+    def close(self):
+        self.closed = True
+        self.messages.clear()
+
+    def _overflow(self):
+        if self.dropped == 0:
+            LOG.warning('Client is falling behind, policy: ' + self.policy)
+        if self.policy == 'disconnect':
+            global slow_disconnects
+            slow_disconnects += 1
+            self.dropped += len(self.messages)
+            self.close()
+            self.connection.close()
+        elif self.policy == 'priority':
+            lowest = min(self.priority(m[0]) for m in self.messages)
+            for i, (msg_type, _, _) in enumerate(self.messages):
+                if self.priority(msg_type) == lowest:
+                    del self.messages[i]
+                    break
+            self.dropped += 1
+        else:
+            self.messages.popleft()
+            self.dropped += 1
+
+    def stats(self):
+        return {
+            'depth': self.depth,
+            'max_depth': self.max_depth,
+            'sent': self.sent,
+            'dropped': self.dropped
+        }
+
+
+def send_queue_stats():
+    """
+        Get the state of the send queues of all connections.
+
+        Returns:
+            dict: stats of each connection, in the order they connected,
+                  total of dropped messages and slow clients disconnected
+    """
+    connections = [c.send_queue.stats() for c in client_connections]
+    return {
+        'connections': connections,
+        'dropped': sum(c['dropped'] for c in connections),
+        'disconnected': slow_disconnects
+    }
+
+
 class WebsocketEventHandler(tornado.websocket.WebSocketHandler):
+    send_queue_config = {}
+
     def __init__(self, application, request, **kwargs):
         tornado.websocket.WebSocketHandler.__init__(
             self, application, request, **kwargs)
         self.emitter = EventBusEmitter
+        self.encoding = None
+        self.send_queue = None
+
+    def initialize(self, send_queue=None):
+        if send_queue is not None:
+            self.send_queue_config = send_queue
 
     def on(self, event_name, handler):
         self.emitter.on(event_name, handler)
 
     def on_message(self, message):
-        LOG.debug(message)
-        try:
-            deserialized_message = Message.deserialize(message)
-        except:
+        encoding = MessageEncodingFactory.detect(message)
+        if encoding is None:
             return
+        # Named explicitly, finding the caller's name costs more than
+        # routing the message.  The message is only formatted when debug
+        # logging is on.
+        LOG(__name__ + ':on_message').debug(
+            '%r' if encoding.binary else '%s', message)
+        # Route on the type alone, the message is only parsed when it's
+        # handled in process and clients are sent the original string.
+        # Such a message isn't validated, a malformed one is forwarded and
+        # dropped by the clients failing to decode it.
+        msg_type = encoding.peek_type(message)
+        parsed = None
+        if msg_type is None or msg_type in BUS_TYPES or \
+                self.emitter.listeners(msg_type):
+            try:
+                parsed = encoding.decode(message)
+            except (ValueError, AttributeError):
+                return
+            msg_type = parsed.type
 
-        try:
-            self.emitter.emit(deserialized_message.type, deserialized_message)
-        except Exception, e:
-            LOG.exception(e)
-            traceback.print_exc(file=sys.stdout)
-            pass
+        if msg_type in (SUBSCRIBE, UNSUBSCRIBE):
+            self.update_subscriptions(parsed)
+            return
+        if msg_type == STATS:
+            self.emit(parsed.reply(STATS + '.response', send_queue_stats()))
+            return
+        if msg_type == ENCODING:
+            self.update_encoding(parsed)
+            return
+
+        if parsed is not None:
+            try:
+                self.emitter.emit(msg_type, parsed)
+            except Exception, e:
+                LOG.exception(e)
+                traceback.print_exc(file=sys.stdout)
+
+        # Clients using another encoding get the message encoded once
+        # for all of them
+        binary = encoding.binary
+        frames = None
+        for client in subscriptions.recipients(msg_type):
+            if client.encoding is encoding:
+                client.send_queue.put(message, msg_type, binary)
+                continue
+            if frames is None:
+                try:
+                    parsed = parsed or encoding.decode(message)
+                except (ValueError, AttributeError):
+                    return
+                frames = {}
+            frame = frames.get(client.encoding)
+            if frame is None:
+                frame = frames[client.encoding] = client.encoding.encode(
+                    parsed)
+            client.send_queue.put(frame, msg_type, client.encoding.binary)
+
+    def update_subscriptions(self, message):
+        types = message.data.get('types', [])
+        if message.type == SUBSCRIBE:
+            subscriptions.subscribe(self, types)
+        else:
+            subscriptions.unsubscribe(self, types)
 
-        for client in client_connections:
-            client.write_message(message)
+    def update_encoding(self, message):
+        """Answer the encoding chosen in the old one, then switch."""
+        names = message.data.get('encodings', [])
+        encoding = (MessageEncodingFactory.available(names) or
+                    [MessageEncodingFactory.get('json')])[0]
+        self.emit(message.reply(ENCODING + '.response',
+                                {'encoding': encoding.name}))
+        self.encoding = encoding
 
     def open(self):
-        self.write_message(Message("connected").serialize())
+        self.encoding = MessageEncodingFactory.get('json')
+        self.send_queue = SendQueue(self, self.send_queue_config)
+        self.emit(Message("connected"))
         client_connections.append(self)
+        subscriptions.add(self)
 
     def on_close(self):
         client_connections.remove(self)
+        subscriptions.remove(self)
+        self.send_queue.close()
 
     def emit(self, channel_message):
         if (hasattr(channel_message, 'serialize') and
                 callable(getattr(channel_message, 'serialize'))):
-            self.write_message(channel_message.serialize())
+            self.send_queue.put(self.encoding.encode(channel_message),
+                                channel_message.type, self.encoding.binary)
         else:
-            self.write_message(json.dumps(channel_message))
+            msg_type = None
+            if isinstance(channel_message, dict):
+                msg_type = channel_message.get('type')
+            self.send_queue.put(json.dumps(channel_message), msg_type)
 
     def check_origin(self, origin):
         return True
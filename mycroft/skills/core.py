@@ -780,28 +780,16 @@ class MycroftSkill(object):
         event_name = self._unique_name(name)
         data = {'name': event_name}
 
-        # making event_status an object so it's refrence can be changed
-        event_status = [None]
-        finished_callback = [False]
-
-        def callback(message):
-            if message.data is not None:
-                event_time = int(message.data[0][0])
-                current_time = int(time.time())
-                time_left_in_seconds = event_time - current_time
-                event_status[0] = time_left_in_seconds
-            finished_callback[0] = True
-
         emitter_name = 'mycroft.event_status.callback.{}'.format(event_name)
-        self.emitter.once(emitter_name, callback)
-        self.emitter.emit(Message('mycroft.scheduler.get_event', data=data))
-
-        start_wait = time.time()
-        while finished_callback[0] is False and time.time() - start_wait < 3.0:
-            time.sleep(0.1)
-        if time.time() - start_wait > 3.0:
+        reply = self.emitter.request(
+            Message('mycroft.scheduler.get_event', data=data),
+            timeout=3.0, reply_type=emitter_name)
+        if reply is None:
             raise Exception("Event Status Messagebus Timeout")
-        return event_status[0]
+        if not reply.data:
+            return None
+        event_time = int(reply.data[0][0])
+        return event_time - int(time.time())
 
 
 #######################################################################
@@ -141,32 +141,14 @@ class IntentService(object):
         self.emitter.on('add_context', self.handle_add_context)
         self.emitter.on('remove_context', self.handle_remove_context)
         self.emitter.on('clear_context', self.handle_clear_context)
-        # Converse method
-        self.emitter.on('skill.converse.response',
-                        self.handle_converse_response)
         self.active_skills = []  # [skill_id , timestamp]
         self.converse_timeout = 5  # minutes to prune active_skills
 
     def do_converse(self, utterances, skill_id, lang):
-        self.emitter.emit(Message("skill.converse.request", {
-            "skill_id": skill_id, "utterances": utterances, "lang": lang}))
-        self.waiting = True
-        self.result = False
-        start_time = time.time()
-        t = 0
-        while self.waiting and t < 5:
-            t = time.time() - start_time
-            time.sleep(0.1)
-        self.waiting = False
-        return self.result
-
-    def handle_converse_response(self, message):
-        # id = message.data["skill_id"]
-        # no need to crosscheck id because waiting before new request is made
-        # no other skill will make this request is safe assumption
-        result = message.data["result"]
-        self.result = result
-        self.waiting = False
+        reply = self.emitter.request(Message("skill.converse.request", {
+            "skill_id": skill_id, "utterances": utterances, "lang": lang}),
+            timeout=5, reply_type="skill.converse.response")
+        return bool(reply and reply.data.get("result"))
 
     def remove_active_skill(self, skill_id):
         for skill in self.active_skills:
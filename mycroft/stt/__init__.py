@@ -12,27 +12,43 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import audioop
 import re
 import json
+import time
 from abc import ABCMeta, abstractmethod
-from requests import post
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from os.path import join
+from Queue import Empty, Queue
+from threading import Event, Lock, Thread
+
 from speech_recognition import Recognizer
 
 from mycroft.api import STTApi
 from mycroft.configuration import Configuration
+from mycroft.stt.encoder import AudioEncoderFactory
+from mycroft.util.http_client import HTTPClient
 from mycroft.util.log import LOG
 
 
 class STT(object):
     __metaclass__ = ABCMeta
 
+    # Audio formats accepted by engines sending the audio themselves,
+    # preferred first, see encode()
+    AUDIO_FORMATS = ()
+    AUDIO_SAMPLE_RATE = 16000
+
     def __init__(self):
         config_core = Configuration.get()
         self.lang = str(self.init_language(config_core))
         config_stt = config_core.get("stt", {})
-        self.config = config_stt.get(config_stt.get("module"), {})
+        self.config = config_stt.get(self.get_module(config_stt), {})
         self.credential = self.config.get("credential", {})
+        self.http_config = config_stt.get("http", {})
         self.recognizer = Recognizer()
+        self.encoder = None
+        self.encode_time = None
 
     @staticmethod
     def init_language(config_core):
@@ -42,11 +58,142 @@ class STT(object):
             return langs[0].lower() + "-" + langs[1].upper()
         return lang
 
+    def get_module(self, config_stt):
+        """
+            Name of the config section of the engine.  This isn't always
+            the configured module, CompositeSTT uses several engines.
+        """
+        for module, clazz in STTFactory.CLASSES.items():
+            if clazz is type(self):
+                return module
+        return config_stt.get("module")
+
+    def encode(self, audio):
+        """
+            Encode audio in the first of AUDIO_FORMATS an encoder is
+            available for, converted to AUDIO_SAMPLE_RATE.  The time it
+            took is kept in encode_time.
+
+            Args:
+                audio (AudioData): recorded audio
+
+            Returns:
+                bytes: the encoded audio file
+        """
+        if not self.encoder:
+            self.encoder = AudioEncoderFactory.create(
+                self.AUDIO_FORMATS, self.AUDIO_SAMPLE_RATE)
+        start = time.time()
+        data = self.encoder.encode(audio)
+        self.encode_time = time.time() - start
+        return data
+
     @abstractmethod
     def execute(self, audio, language=None):
         pass
 
 
+class StreamingSTT(STT):
+    """
+    STT engine that can receive audio while the user is still speaking.
+
+    The listener calls stream_start() as soon as recording begins, passes
+    every recorded chunk to stream_data() and finally calls stream_stop(),
+    which returns the transcription.  All three are called from the same
+    thread.
+    """
+    __metaclass__ = ABCMeta
+
+    @abstractmethod
+    def stream_start(self, sample_rate, sample_width, language=None):
+        pass
+
+    @abstractmethod
+    def stream_data(self, data):
+        pass
+
+    @abstractmethod
+    def stream_stop(self):
+        pass
+
+    def execute(self, audio, language=None):
+        self.stream_start(audio.sample_rate, audio.sample_width, language)
+        self.stream_data(audio.frame_data)
+        return self.stream_stop()
+
+
+class HTTPStreamingSTT(StreamingSTT):
+    """
+    Streams audio to an HTTP endpoint using chunked transfer encoding.
+
+    The request runs in a background thread for the duration of the
+    utterance, reading chunks from a queue as the listener records them.
+    """
+    __metaclass__ = ABCMeta
+
+    # Seconds to wait for the response once the stream has been stopped
+    RESPONSE_TIMEOUT = 10.0
+
+    def __init__(self):
+        super(HTTPStreamingSTT, self).__init__()
+        self.chunks = None
+        self.stream_thread = None
+        self.response = None
+        self.error = None
+
+    @abstractmethod
+    def stream_request(self, chunks, sample_rate, sample_width, language):
+        """
+        Perform the HTTP request, sending the chunks generator as the body.
+
+        Returns:
+            requests.Response: the server response
+        """
+        pass
+
+    @abstractmethod
+    def get_response(self, response):
+        pass
+
+    def _generate_chunks(self, chunks):
+        while True:
+            data = chunks.get()
+            if data is None:
+                return
+            yield data
+
+    def stream_start(self, sample_rate, sample_width, language=None):
+        language = language or self.lang
+        self.chunks = Queue()
+        self.response = None
+        self.error = None
+
+        def request(chunks):
+            try:
+                self.response = self.stream_request(
+                    self._generate_chunks(chunks), sample_rate,
+                    sample_width, language)
+            except Exception as e:
+                self.error = e
+
+        self.stream_thread = Thread(target=request, args=(self.chunks,))
+        self.stream_thread.daemon = True
+        self.stream_thread.start()
+
+    def stream_data(self, data):
+        self.chunks.put(data)
+
+    def stream_stop(self):
+        self.chunks.put(None)
+        self.stream_thread.join(self.RESPONSE_TIMEOUT)
+        if self.stream_thread.is_alive():
+            raise IOError("Timed out waiting for the STT response")
+        self.stream_thread = None
+        if self.error:
+            raise self.error
+        return self.get_response(self.response)
+
+
 class TokenSTT(STT):
     __metaclass__ = ABCMeta
 
@@ -112,28 +259,40 @@ class IBMSTT(BasicSTT):
 
 
 class MycroftSTT(STT):
+    AUDIO_FORMATS = ('flac',)
+
     def __init__(self):
         super(MycroftSTT, self).__init__()
-        self.api = STTApi()
+        self.api = STTApi(HTTPClient(self.http_config))
 
     def execute(self, audio, language=None):
         self.lang = language or self.lang
-        try:
-            return self.api.stt(audio.get_flac_data(convert_rate=16000),
-                                self.lang, 1)[0]
-        except:
-            return self.api.stt(audio.get_flac_data(), self.lang, 1)[0]
+        return self.api.stt(self.encode(audio), self.lang, 1)[0]
 
 
-class KaldiSTT(STT):
+class KaldiSTT(HTTPStreamingSTT):
+    # Describes raw audio to the kaldi-gstreamer-server
+    RAW_CONTENT_TYPE = ('audio/x-raw, layout=(string)interleaved, '
+                        'rate=(int){}, format=(string)S{}LE, '
+                        'channels=(int)1')
+    AUDIO_FORMATS = ('wav',)
+
     def __init__(self):
         super(KaldiSTT, self).__init__()
+        self.http = HTTPClient(self.http_config)
 
     def execute(self, audio, language=None):
         language = language or self.lang
-        response = post(self.config.get("uri"), data=audio.get_wav_data())
+        response = self.http.post(self.config.get("uri"),
+                                  data=self.encode(audio))
         return self.get_response(response)
 
+    def stream_request(self, chunks, sample_rate, sample_width, language):
+        content_type = self.RAW_CONTENT_TYPE.format(sample_rate,
+                                                    8 * sample_width)
+        return self.http.post(self.config.get("uri"), data=chunks,
+                              headers={'Content-Type': content_type})
+
     def get_response(self, response):
         try:
             hypotheses = response.json()["hypotheses"]
@@ -142,6 +301,328 @@ class KaldiSTT(STT):
             return None
 
 
+class LocalDecoder(Thread):
+    """
+    Thread running a Pocketsphinx decoder, one utterance at a time.
+
+    Utterances are decoded in the order they were started.  The audio of
+    an utterance is queued as it arrives, so an utterance started while
+    another is being decoded only waits, nothing is lost.
+
+    An utterance that receives no audio for CHUNK_TIMEOUT seconds, e.g.
+    because its stream was never stopped, is abandoned so the utterances
+    queued behind it are decoded.
+
+    Arguments:
+        config: pocketsphinx decoder configuration
+    """
+    CHUNK_TIMEOUT = 10.0
+
+    def __init__(self, config):
+        super(LocalDecoder, self).__init__()
+        from pocketsphinx import Decoder
+        self.daemon = True
+        self.decoder = Decoder(config)
+        self.utterances = Queue()
+        self.start()
+
+    def start_utterance(self):
+        """
+            Start an utterance.
+
+            Returns:
+                LocalUtterance: utterance to queue the audio on
+        """
+        utterance = LocalUtterance()
+        self.utterances.put(utterance)
+        return utterance
+
+    def run(self):
+        while True:
+            utterance = self.utterances.get()
+            try:
+                self.decoder.start_utt()
+                chunk = self._next_chunk(utterance)
+                while chunk is not None:
+                    self.decoder.process_raw(chunk, False, False)
+                    chunk = self._next_chunk(utterance)
+                self.decoder.end_utt()
+                hyp = self.decoder.hyp()
+                utterance.text = hyp.hypstr if hyp else ''
+            except Exception as e:
+                utterance.error = e
+                try:
+                    self.decoder.end_utt()
+                except Exception:
+                    pass  # The utterance was never started
+            finally:
+                utterance.done.set()
+
+    def _next_chunk(self, utterance):
+        """Get the next chunk of an utterance, None once it is complete."""
+        try:
+            return utterance.chunks.get(timeout=self.CHUNK_TIMEOUT)
+        except Empty:
+            raise IOError('No audio for {} seconds, utterance '
+                          'abandoned'.format(self.CHUNK_TIMEOUT))
+
+
+class LocalUtterance(object):
+    """Audio and result of an utterance passed to a LocalDecoder."""
+
+    def __init__(self):
+        self.chunks = Queue()
+        self.done = Event()
+        self.text = None
+        self.error = None
+
+
+class PocketSphinxSTT(StreamingSTT):
+    """
+    Offline STT using a Pocketsphinx large vocabulary model.
+
+    The model is loaded when the engine is created, and engines with the
+    same model share a single decoder.  Audio is decoded while it is being
+    recorded, in a thread of its own.
+
+    The "hmm", "lm" and "dict" settings point at the acoustic model,
+    language model and pronunciation dictionary, by default the US English
+    model installed with the pocketsphinx package.
+    """
+    # Seconds to wait for the result once the stream has been stopped
+    RESPONSE_TIMEOUT = 10.0
+    SAMPLE_RATE = 16000
+    SAMPLE_WIDTH = 2
+
+    _decoders = {}
+    _decoders_lock = Lock()
+
+    def __init__(self):
+        super(PocketSphinxSTT, self).__init__()
+        self.decoder = self.get_decoder(self.config)
+        self.utterance = None
+        self.sample_rate = self.SAMPLE_RATE
+        self.sample_width = self.SAMPLE_WIDTH
+        self.rate_state = None
+
+    @classmethod
+    def get_decoder(cls, config):
+        """Get the shared decoder for a model, loading it if needed."""
+        from pocketsphinx import Decoder, get_model_path
+        model_path = get_model_path()
+        model = (config.get('hmm', join(model_path, 'en-us')),
+                 config.get('lm', join(model_path, 'en-us.lm.bin')),
+                 config.get('dict', join(model_path, 'cmudict-en-us.dict')))
+        with cls._decoders_lock:
+            if model not in cls._decoders:
+                LOG.info('Loading Pocketsphinx model ' + model[0])
+                decoder_config = Decoder.default_config()
+                decoder_config.set_string('-hmm', model[0])
+                decoder_config.set_string('-lm', model[1])
+                decoder_config.set_string('-dict', model[2])
+                decoder_config.set_float('-samprate', cls.SAMPLE_RATE)
+                decoder_config.set_string('-logfn', '/dev/null')
+                cls._decoders[model] = LocalDecoder(decoder_config)
+            return cls._decoders[model]
+
+    def convert(self, data):
+        """Convert audio to the sample rate and width of the model."""
+        if self.sample_width != self.SAMPLE_WIDTH:
+            data = audioop.lin2lin(data, self.sample_width,
+                                   self.SAMPLE_WIDTH)
+        if self.sample_rate != self.SAMPLE_RATE:
+            data, self.rate_state = audioop.ratecv(
+                data, self.SAMPLE_WIDTH, 1, self.sample_rate,
+                self.SAMPLE_RATE, self.rate_state)
+        return data
+
+    def stream_start(self, sample_rate, sample_width, language=None):
+        self.sample_rate = sample_rate
+        self.sample_width = sample_width
+        self.rate_state = None
+        self.utterance = self.decoder.start_utterance()
+
+    def stream_data(self, data):
+        self.utterance.chunks.put(self.convert(data))
+
+    def stream_stop(self):
+        utterance, self.utterance = self.utterance, None
+        utterance.chunks.put(None)
+        if not utterance.done.wait(self.RESPONSE_TIMEOUT):
+            raise IOError("Timed out waiting for Pocketsphinx")
+        if utterance.error:
+            raise utterance.error
+        return utterance.text
+
+
+class CircuitBreaker(object):
+    """
+    Stops using an engine that keeps failing.
+
+    After failure_threshold failures in a row the breaker opens and the
+    engine is skipped.  Once reset_timeout seconds have passed the engine
+    is tried again, a success closes the breaker and a failure opens it
+    for another reset_timeout.
+
+    Arguments:
+        failure_threshold (int): failures in a row opening the breaker
+        reset_timeout (float): seconds before an open breaker allows
+                               another attempt
+    """
+
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.lock = Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None and \
+            time.time() - self.opened_at < self.reset_timeout
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.time()
+
+
+class CompositeEngine(object):
+    """An engine used by CompositeSTT, with its latency budget."""
+
+    def __init__(self, module, engine, timeout, breaker):
+        self.module = module
+        self.engine = engine
+        self.timeout = timeout
+        self.breaker = breaker
+        self.future = None  # Latest transcription
+
+    @property
+    def available(self):
+        """False if the engine is failing."""
+        return not self.breaker.is_open
+
+    @property
+    def busy(self):
+        """True if the engine is still working on an earlier utterance."""
+        return self.future is not None and not self.future.done()
+
+    def submit(self, executor, audio, language):
+        """
+            Transcribe audio once the engine is done with the utterance
+            it is working on.
+
+            Returns:
+                Future: the transcription
+        """
+        previous = self.future
+
+        def transcribe():
+            if previous is not None:
+                wait([previous])
+            return self.engine.execute(audio, language)
+
+        self.future = executor.submit(transcribe)
+        return self.future
+
+
+class CompositeSTT(STT):
+    """
+    Combines several engines, configured as an ordered list.
+
+    The mode decides when the next engine is asked:
+
+    - "first_success": when all engines asked so far have failed
+    - "race": the first race_count engines are asked at once
+    - "fallback": when the engines asked so far have failed, or haven't
+      answered within fallback_after seconds
+
+    The first transcription returned wins.  An engine taking longer than
+    its "timeout" counts as failed, and an engine failing repeatedly is
+    skipped for a while (see CircuitBreaker).  An engine still busy with
+    an earlier utterance is asked after the idle ones, its timeout
+    includes the wait for it to finish.
+    """
+
+    def __init__(self):
+        super(CompositeSTT, self).__init__()
+        self.mode = self.config.get("mode", "first_success")
+        self.race_count = self.config.get("race_count", 2)
+        self.fallback_after = self.config.get("fallback_after", 1.0)
+        self.engines = []
+        for engine_config in self.config.get("engines", []):
+            if not isinstance(engine_config, dict):
+                engine_config = {"module": engine_config}
+            module = engine_config["module"]
+            self.engines.append(CompositeEngine(
+                module, STTFactory.CLASSES[module](),
+                engine_config.get("timeout", 10.0),
+                CircuitBreaker(self.config.get("failure_threshold", 3),
+                               self.config.get("reset_timeout", 30.0))))
+        self.executor = ThreadPoolExecutor(max(len(self.engines), 1))
+
+    def execute(self, audio, language=None):
+        language = language or self.lang
+        waiting = [e for e in self.engines if e.available]
+        if not waiting:
+            raise IOError("No STT engine available")
+        # Busy engines are slower candidates, sorted is stable
+        waiting.sort(key=lambda e: e.busy)
+        running = {}  # future -> engine
+
+        def ask_next():
+            engine = waiting.pop(0)
+            future = engine.submit(self.executor, audio, language)
+            running[future] = (engine, time.time() + engine.timeout)
+
+        for _ in range(self.race_count if self.mode == "race" else 1):
+            if waiting:
+                ask_next()
+        next_at = time.time() + self.fallback_after
+        error = None
+        answered = False
+        while running:
+            deadlines = [deadline for _, deadline in running.values()]
+            if self.mode == "fallback" and waiting:
+                deadlines.append(next_at)
+            timeout = max(min(deadlines) - time.time(), 0)
+            done, _ = wait(list(running), timeout, FIRST_COMPLETED)
+            for future in done:
+                engine, _ = running.pop(future)
+                try:
+                    text = future.result()
+                except Exception as e:
+                    LOG.debug("{} STT failed: {}".format(engine.module, e))
+                    engine.breaker.failure()
+                    error = e
+                    continue
+                engine.breaker.success()
+                if text:
+                    return text
+                answered = True  # Nothing understood, see if others do
+            now = time.time()
+            for future, (engine, deadline) in list(running.items()):
+                if deadline <= now:
+                    LOG.debug("{} STT timed out".format(engine.module))
+                    del running[future]
+                    engine.breaker.failure()
+                    error = IOError(engine.module + " STT timed out")
+            if waiting and (not running or self.mode == "fallback" and
+                            now >= next_at):
+                ask_next()
+                next_at = now + self.fallback_after
+        if answered or not error:
+            return None
+        raise error
+
+
 class STTFactory(object):
     CLASSES = {
         "mycroft": MycroftSTT,
@@ -149,7 +630,9 @@ class STTFactory(object):
         "google_cloud": GoogleCloudSTT,
         "wit": WITSTT,
         "ibm": IBMSTT,
-        "kaldi": KaldiSTT
+        "kaldi": KaldiSTT,
+        "pocketsphinx": PocketSphinxSTT,
+        "composite": CompositeSTT
     }
 
     @staticmethod
@@ -0,0 +1,164 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import audioop
+import wave
+from abc import ABCMeta, abstractmethod
+from io import BytesIO
+from subprocess import Popen, PIPE
+
+from mycroft.util.log import LOG
+
+
+class AudioEncoder(object):
+    """
+    Encodes recorded audio in the format an STT engine expects.
+
+    The audio is converted to the sample rate and width of the encoder
+    once, in process, before it is encoded.
+
+    Arguments:
+        sample_rate (int): sample rate of the encoded audio
+    """
+    __metaclass__ = ABCMeta
+
+    format = None
+    content_type = None
+    sample_width = 2  # 16 bit
+
+    def __init__(self, sample_rate=16000):
+        self.sample_rate = sample_rate
+
+    def convert(self, audio):
+        """
+            Convert audio to the rate and width of the encoder.
+
+            Args:
+                audio (AudioData): recorded audio
+
+            Returns:
+                bytes: raw 16 bit mono audio
+        """
+        data = audio.frame_data
+        if audio.sample_width != self.sample_width:
+            data = audioop.lin2lin(data, audio.sample_width,
+                                   self.sample_width)
+        if audio.sample_rate != self.sample_rate:
+            data, _ = audioop.ratecv(data, self.sample_width, 1,
+                                     audio.sample_rate, self.sample_rate,
+                                     None)
+        return data
+
+    @abstractmethod
+    def encode(self, audio):
+        """
+            Encode audio.
+
+            Args:
+                audio (AudioData): recorded audio
+
+            Returns:
+                bytes: the encoded audio file
+        """
+        pass
+
+
+class WavEncoder(AudioEncoder):
+    format = 'wav'
+    content_type = 'audio/wav'
+
+    def encode(self, audio):
+        wav_file = BytesIO()
+        wav = wave.open(wav_file, 'wb')
+        try:
+            wav.setnchannels(1)
+            wav.setsampwidth(self.sample_width)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.convert(audio))
+        finally:
+            wav.close()
+        return wav_file.getvalue()
+
+
+class SoundFileFlacEncoder(AudioEncoder):
+    """FLAC encoding in process using libsndfile."""
+    format = 'flac'
+    content_type = 'audio/x-flac'
+
+    def __init__(self, sample_rate=16000):
+        super(SoundFileFlacEncoder, self).__init__(sample_rate)
+        import soundfile
+        self.soundfile = soundfile
+
+    def encode(self, audio):
+        flac_file = BytesIO()
+        with self.soundfile.SoundFile(flac_file, 'w', self.sample_rate, 1,
+                                      'PCM_16', format='FLAC') as flac:
+            flac.buffer_write(self.convert(audio), dtype='int16')
+        return flac_file.getvalue()
+
+
+class FlacProcessEncoder(AudioEncoder):
+    """
+    FLAC encoding with the flac command line tool.
+
+    Spawns a process per utterance, used when libsndfile isn't installed.
+    """
+    format = 'flac'
+    content_type = 'audio/x-flac'
+
+    def __init__(self, sample_rate=16000):
+        super(FlacProcessEncoder, self).__init__(sample_rate)
+        from speech_recognition import get_flac_converter
+        self.converter = get_flac_converter()
+        self.wav = WavEncoder(sample_rate)
+
+    def encode(self, audio):
+        process = Popen([self.converter, '--stdout', '--totally-silent',
+                         '--best', '-'], stdin=PIPE, stdout=PIPE)
+        flac_data, _ = process.communicate(self.wav.encode(audio))
+        if process.returncode != 0:
+            raise IOError('flac exited with code {}'.format(
+                process.returncode))
+        return flac_data
+
+
+class AudioEncoderFactory(object):
+    # Encoders for each format, preferred first
+    CLASSES = {
+        'wav': [WavEncoder],
+        'flac': [SoundFileFlacEncoder, FlacProcessEncoder]
+    }
+
+    @staticmethod
+    def create(formats, sample_rate=16000):
+        """
+            Create an encoder for the first format that can be encoded.
+
+            Args:
+                formats (list): formats accepted by the engine, preferred
+                                first
+                sample_rate (int): sample rate the engine expects
+
+            Returns:
+                AudioEncoder: the encoder
+        """
+        for audio_format in formats:
+            for clazz in AudioEncoderFactory.CLASSES.get(audio_format, []):
+                try:
+                    return clazz(sample_rate)
+                except (ImportError, OSError) as e:
+                    LOG.debug('{} not available: {}'.format(
+                        clazz.__name__, e))
+        raise ValueError('No encoder available for ' + ', '.join(formats))
@@ -0,0 +1,236 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import print_function
+import argparse
+import json
+import time
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from threading import Lock, Thread
+
+import requests
+
+from mycroft.util.http_client import HTTPClient
+
+"""
+STT Stand-in Server
+A local HTTP server speaking the kaldi-gstreamer-server protocol used by
+KaldiSTT.  It accepts audio either in one piece or streamed with chunked
+transfer encoding and answers with a fixed transcription, which makes it
+possible to test and benchmark the STT path without a real recognizer.
+
+Usage: python -m mycroft.stt.standin -p 8080 -u "what time is it"
+Then configure "stt": {"module": "kaldi", "kaldi": {"uri":
+"http://localhost:8080/client/dynamic/recognize"}}
+
+With -b the server is started in the background and the request latency
+of a new connection per request is compared to the pooled HTTPClient,
+e.g. -b 200 -d 0.05 --slow-every 20 --slow-delay 1 --hedge-after 0.2
+"""
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one piece, a response split over several small
+    # writes is held back by delayed ACKs on a kept-alive connection
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass  # Keep benchmark output clean
+
+    def read_body(self):
+        """Read the request body, returns the number of bytes received."""
+        if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+            received = 0
+            while True:
+                size = int(self.rfile.readline().split(b';')[0].strip(), 16)
+                if size == 0:
+                    # Skip trailers up to the terminating empty line
+                    while self.rfile.readline().strip():
+                        pass
+                    return received
+                received += len(self.rfile.read(size))
+                self.rfile.readline()  # CRLF after each chunk
+        length = int(self.headers.get('Content-Length', 0))
+        return len(self.rfile.read(length))
+
+    def do_POST(self):
+        started = time.time()
+        received = self.read_body()
+        server = self.server
+        with server.lock:
+            server.requests += 1
+            server.bytes_received += received
+            number = server.requests
+        delay = server.delay
+        if server.slow_every and (number - 1) % server.slow_every == 0:
+            delay = server.slow_delay
+        if delay:
+            time.sleep(delay)
+        body = json.dumps({
+            'status': 0,
+            'id': str(number),
+            'hypotheses': [{'utterance': server.utterance}],
+            'received_bytes': received,
+            'processing_time': time.time() - started
+        }).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class StandInSTTServer(ThreadingMixIn, HTTPServer):
+    """
+    Fake STT server answering every request with the same transcription.
+
+    Args:
+        host (str): interface to listen on
+        port (int): port to listen on, 0 picks a free one
+        utterance (str): transcription returned for every request
+        delay (float): seconds to wait before answering, to simulate the
+                       decoding time of a real server
+        slow_every (int): answer the first and then every nth request
+                          after slow_delay instead, 0 to disable
+        slow_delay (float): seconds to wait before answering slow requests
+    """
+    daemon_threads = True
+
+    def __init__(self, host='localhost', port=8080,
+                 utterance='hello world', delay=0.0, slow_every=0,
+                 slow_delay=0.0):
+        HTTPServer.__init__(self, (host, port), StandInHandler)
+        self.utterance = utterance
+        self.delay = delay
+        self.slow_every = slow_every
+        self.slow_delay = slow_delay
+        self.lock = Lock()
+        self.requests = 0
+        self.connections = 0
+        self.bytes_received = 0
+
+    def process_request(self, request, client_address):
+        with self.lock:
+            self.connections += 1
+        ThreadingMixIn.process_request(self, request, client_address)
+
+    @property
+    def uri(self):
+        return 'http://{}:{}/client/dynamic/recognize'.format(
+            *self.server_address[:2])
+
+    def start(self):
+        """Serve requests from a daemon thread."""
+        thread = Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def benchmark(uri, post, count, audio):
+    """
+        Time requests to the server.
+
+        Args:
+            uri (str): address of the server
+            post (callable): function performing the request
+            count (int): number of requests
+            audio (bytes): request body
+
+        Returns:
+            list: sorted latencies in seconds
+    """
+    latencies = []
+    for _ in range(count):
+        started = time.time()
+        post(uri, data=audio).raise_for_status()
+        latencies.append(time.time() - started)
+    return sorted(latencies)
+
+
+def print_latencies(name, latencies):
+    def percentile(p):
+        return 1000 * latencies[min(int(p * len(latencies)),
+                                    len(latencies) - 1)]
+    print('{:<12} p50 {:7.1f}ms  p95 {:7.1f}ms  p99 {:7.1f}ms'.format(
+        name, percentile(0.5), percentile(0.95), percentile(0.99)))
+
+
+def run_benchmark(server, count, hedge_after):
+    server.start()
+    audio = b'\0' * 32000  # One second of silence
+    clients = [
+        ('new conn', requests.post),
+        ('pooled', HTTPClient({'retries': 0}).post)
+    ]
+    if hedge_after is not None:
+        clients.append(('hedged', HTTPClient(
+            {'retries': 0, 'hedge_after': hedge_after}).post))
+    for name, post in clients:
+        connections = server.connections
+        print_latencies(name, benchmark(server.uri, post, count, audio))
+        print('{:<12} {} connections'.format(
+            '', server.connections - connections))
+    server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-H', '--host', dest='host', default='localhost',
+        help="Interface to listen on (Default: localhost)")
+    parser.add_argument(
+        '-p', '--port', dest='port', type=int, default=8080,
+        help="Port to listen on (Default: 8080)")
+    parser.add_argument(
+        '-u', '--utterance', dest='utterance', default='hello world',
+        help="Transcription to return (Default: hello world)")
+    parser.add_argument(
+        '-d', '--delay', dest='delay', type=float, default=0.0,
+        help="Seconds to wait before answering (Default: 0)")
+    parser.add_argument(
+        '--slow-every', dest='slow_every', type=int, default=0,
+        help="Answer every nth request after --slow-delay (Default: off)")
+    parser.add_argument(
+        '--slow-delay', dest='slow_delay', type=float, default=1.0,
+        help="Seconds to wait before answering slow requests (Default: 1)")
+    parser.add_argument(
+        '-b', '--benchmark', dest='benchmark', type=int, default=0,
+        help="Run this many requests per client and print the latencies")
+    parser.add_argument(
+        '--hedge-after', dest='hedge_after', type=float, default=None,
+        help="Also benchmark hedged requests sent again after this delay")
+    args = parser.parse_args()
+
+    server = StandInSTTServer(args.host, args.port, args.utterance,
+                              args.delay, args.slow_every, args.slow_delay)
+    if args.benchmark:
+        run_benchmark(server, args.benchmark, args.hedge_after)
+        return
+    print('Serving fake STT at ' + server.uri)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from concurrent.futures import wait, FIRST_COMPLETED
+from threading import Lock
+from time import sleep
+
+from requests.exceptions import ConnectionError, Timeout
+from requests_futures.sessions import FuturesSession
+
+from mycroft.util.log import LOG
+
+
+class RetryBudget(object):
+    """
+    Token bucket limiting retries to a share of the requests made.
+
+    Every request adds ratio tokens and every retry takes a whole one, so
+    when a server is down the client doesn't multiply the load on it.
+
+    Arguments:
+        ratio (float): retries allowed per request
+        max_tokens (float): retries that can be saved up
+    """
+
+    def __init__(self, ratio=0.2, max_tokens=10):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.lock = Lock()
+
+    def deposit(self):
+        with self.lock:
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        """Take a token for a retry, returns False if none are left."""
+        with self.lock:
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True
+            return False
+
+
+class HTTPClient(object):
+    """
+    HTTP client keeping connections alive between requests.
+
+    Requests are sent from a pool of worker threads sharing one session,
+    so connections (and TLS sessions) are reused.  Failed requests are
+    retried within a retry budget.  Optionally a request that hasn't been
+    answered after hedge_after seconds is sent a second time and the
+    first response is used, cutting the latency of slow outliers.
+
+    Only requests with a body that can be sent again are retried or
+    hedged, a streamed body (a generator) is sent once.  A request that
+    timed out waiting for the response isn't retried, the server got it
+    and another attempt would only add a full read timeout to the wait.
+
+    Arguments:
+        config (dict): settings, see the "http" section of "stt" in
+                       mycroft.conf
+    """
+    # Responses worth retrying, the server may answer the next attempt
+    RETRY_STATUS = (502, 503, 504)
+
+    def __init__(self, config=None):
+        config = config or {}
+        self.timeout = (config.get('connect_timeout', 3.05),
+                        config.get('read_timeout', 15))
+        self.retries = config.get('retries', 2)
+        self.retry_delay = config.get('retry_delay', 0.1)
+        self.hedge_after = config.get('hedge_after')
+        self.budget = RetryBudget(config.get('retry_ratio', 0.2))
+        self.session = FuturesSession(
+            max_workers=config.get('pool_size', 4))
+
+    def close(self):
+        """Wait for outstanding requests and close the connections."""
+        self.session.executor.shutdown(wait=True)
+        self.session.close()
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        """
+            Perform a request, see requests.request for the arguments.
+
+            Returns:
+                requests.Response: the response
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        data = kwargs.get('data')
+        replayable = data is None or isinstance(data, (basestring, dict))
+        self.budget.deposit()
+        attempt = 0
+        while True:
+            error = response = None
+            try:
+                if replayable and self.hedge_after is not None:
+                    response = self._hedged(method, url, kwargs)
+                else:
+                    response = self.session.request(
+                        method, url, **kwargs).result()
+                if response.status_code not in self.RETRY_STATUS:
+                    return response
+            except ConnectionError as e:
+                error = e  # Includes ConnectTimeout
+            attempt += 1
+            if not replayable or attempt > self.retries or \
+                    not self.budget.withdraw():
+                if error:
+                    raise error
+                return response
+            LOG.debug('Retrying request to {}: {}'.format(
+                url, error or response.status_code))
+            sleep(self.retry_delay * 2 ** (attempt - 1))
+
+    def _hedged(self, method, url, kwargs):
+        first = self.session.request(method, url, **kwargs)
+        done, _ = wait([first], timeout=self.hedge_after)
+        if done:
+            return first.result()
+        LOG.debug('Hedging slow request to ' + url)
+        pending = [first, self.session.request(method, url, **kwargs)]
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            pending = list(pending)
+            for future in done:
+                try:
+                    return future.result()
+                except (ConnectionError, Timeout) as e:
+                    error = e
+        raise error
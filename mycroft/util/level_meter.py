@@ -0,0 +1,149 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import mmap
+import os
+import struct
+from collections import namedtuple
+from time import time
+
+"""
+Microphone level meter shared between processes.
+
+The speech client publishes the current audio energy and the threshold it
+compares against into a small memory mapped file in the IPC directory.
+Consumers such as the CLI map the same file and read the values straight
+from memory, so neither side makes a system call per sample.
+
+Layout (little endian):
+    magic      4s  b'MLV1'
+    sequence   Q   even when the record is consistent, odd while writing
+    energy     d   energy of the latest audio chunk
+    threshold  d   energy threshold used by the listener
+    timestamp  d   time.time() of the latest update
+"""
+
+LAYOUT = struct.Struct('<4sQddd')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 4
+PAYLOAD = struct.Struct('<ddd')
+PAYLOAD_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+MAGIC = b'MLV1'
+
+MicLevel = namedtuple('MicLevel',
+                      ['sequence', 'energy', 'threshold', 'timestamp'])
+
+
+def _map_file(filename, writable):
+    if writable:
+        fd = os.open(filename, os.O_RDWR | os.O_CREAT, 0o666)
+    else:
+        fd = os.open(filename, os.O_RDONLY)
+    try:
+        if os.fstat(fd).st_size < LAYOUT.size:
+            if not writable:
+                return None
+            # Only ever grow the file, a reader may have it mapped
+            os.ftruncate(fd, LAYOUT.size)
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        return mmap.mmap(fd, LAYOUT.size, access=access)
+    finally:
+        os.close(fd)
+
+
+class LevelMeterWriter(object):
+    """Publishes microphone levels, used by the speech client.
+
+    Arguments:
+        filename (str): path of the shared file
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._map = _map_file(filename, writable=True)
+        self.sequence = 0
+        try:
+            os.chmod(filename, 0o666)
+        except OSError:
+            pass  # Owned by another user, permissions were set by them
+
+    def update(self, energy, threshold):
+        """Publish a new measurement.
+
+        Args:
+            energy (float): energy of the latest audio chunk
+            threshold (float): threshold the listener compares against
+        """
+        # The odd sequence number tells readers a write is in progress
+        self.sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self.sequence)
+        self._map[:len(MAGIC)] = MAGIC
+        PAYLOAD.pack_into(self._map, PAYLOAD_OFFSET,
+                          float(energy), float(threshold), time())
+        # Publishing the even sequence number must be the last store
+        self.sequence += 1
+        SEQUENCE.pack_into(self._map, SEQUENCE_OFFSET, self.sequence)
+
+    def close(self):
+        if self._map:
+            self._map.close()
+            self._map = None
+
+
+class LevelMeterReader(object):
+    """Reads the microphone levels published by the speech client.
+
+    The file is mapped lazily, so a reader can be created before the
+    speech client has started.
+
+    Arguments:
+        filename (str): path of the shared file
+    """
+    MAX_RETRIES = 10
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._map = None
+
+    def _open(self):
+        if self._map is None:
+            try:
+                self._map = _map_file(self.filename, writable=False)
+            except (IOError, OSError, ValueError):
+                self._map = None
+        return self._map is not None
+
+    def read(self):
+        """Read the latest measurement.
+
+        Returns:
+            MicLevel: the latest consistent record, or None if nothing has
+                      been published yet
+        """
+        if not self._open():
+            return None
+        for _ in range(self.MAX_RETRIES):
+            magic, seq, energy, thresh, stamp = LAYOUT.unpack_from(self._map)
+            if magic != MAGIC or seq == 0:
+                return None
+            if seq % 2 == 1:
+                continue  # Writer is busy
+            if SEQUENCE.unpack_from(self._map, SEQUENCE_OFFSET)[0] == seq:
+                return MicLevel(seq, energy, thresh, stamp)
+        return None
+
+    def close(self):
+        if self._map:
+            self._map.close()
+            self._map = None
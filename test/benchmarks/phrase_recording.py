@@ -0,0 +1,141 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+from __future__ import print_function
+import argparse
+import os
+import timeit
+
+from mycroft.client.speech.data_structures import (
+    CyclicAudioBuffer,
+    PhraseBuffer
+)
+
+"""
+Phrase recording benchmark
+Records synthetic audio the way ResponsiveRecognizer._record_phrase does,
+comparing plain string concatenation against the preallocated buffers, and
+keeps a rolling window the way _wait_until_wake_word does, for a range of
+chunk sizes.
+
+Usage: python -m test.benchmarks.phrase_recording -d 10
+"""
+
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+def make_chunks(seconds, chunk_size):
+    chunk = os.urandom(chunk_size * SAMPLE_WIDTH)
+    return [chunk] * int(seconds * SAMPLE_RATE / chunk_size)
+
+
+def record_concatenate(chunks, max_size):
+    byte_data = '\0' * SAMPLE_WIDTH
+    for chunk in chunks:
+        byte_data += chunk
+    return byte_data
+
+
+def record_cyclic(chunks, max_size):
+    byte_data = CyclicAudioBuffer(max_size, '\0' * SAMPLE_WIDTH)
+    for chunk in chunks:
+        byte_data.append(chunk)
+    return byte_data.get().tobytes()
+
+
+def record_phrase_buffer(chunks, max_size):
+    byte_data = PhraseBuffer(max_size, '\0' * SAMPLE_WIDTH)
+    for chunk in chunks:
+        byte_data.append(chunk)
+    return byte_data.get_frame_data()
+
+
+def window_slice(chunks, max_size):
+    byte_data = '\0' * SAMPLE_WIDTH
+    for chunk in chunks:
+        if len(byte_data) < max_size:
+            byte_data += chunk
+        else:
+            byte_data = byte_data[len(chunk):] + chunk
+    return byte_data[-max_size:]
+
+
+def window_cyclic(chunks, max_size):
+    byte_data = CyclicAudioBuffer(max_size, '\0' * SAMPLE_WIDTH)
+    for chunk in chunks:
+        byte_data.append(chunk)
+    return byte_data.get().tobytes()
+
+
+RECORDERS = [
+    ('concatenate', record_concatenate),
+    ('cyclic', record_cyclic),
+    ('phrase_buffer', record_phrase_buffer)
+]
+
+# Rolling wake word window, as kept by _wait_until_wake_word
+WINDOWS = [
+    ('slice', window_slice),
+    ('cyclic', window_cyclic)
+]
+
+
+def measure(recorders, chunks, max_size, repeat, chunk_size):
+    expected = recorders[0][1](chunks, max_size)
+    for name, recorder in recorders:
+        assert recorder(chunks, max_size) == expected
+        secs = timeit.timeit(lambda: recorder(chunks, max_size),
+                             number=repeat)
+        print('{:>8} {:>15} {:>12.3f}'.format(
+            chunk_size, name, 1000.0 * secs / repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        '-d', '--duration', dest='duration', type=float, default=10.0,
+        help="Seconds of audio per recording (Default: 10)")
+    parser.add_argument(
+        '-n', '--repeat', dest='repeat', type=int, default=20,
+        help="Recordings per measurement (Default: 20)")
+    parser.add_argument(
+        '-c', '--chunk-sizes', dest='chunk_sizes', default='256,512,1024,4096',
+        help="Comma separated chunk sizes in samples")
+    parser.add_argument(
+        '-w', '--window', dest='window', type=float, default=10.0,
+        help="Seconds kept by the rolling window (Default: 10)")
+    args = parser.parse_args()
+
+    chunk_sizes = [int(c) for c in args.chunk_sizes.split(',')]
+
+    print('Phrase recording of {}s'.format(args.duration))
+    print('{:>8} {:>15} {:>12}'.format('chunk', 'recorder', 'ms/phrase'))
+    for chunk_size in chunk_sizes:
+        chunks = make_chunks(args.duration, chunk_size)
+        max_size = (len(chunks) * chunk_size + 1) * SAMPLE_WIDTH
+        measure(RECORDERS, chunks, max_size, args.repeat, chunk_size)
+
+    window_size = int(args.window * SAMPLE_RATE) * SAMPLE_WIDTH
+    print('')
+    print('Rolling {}s window over {}s of audio'.format(
+        args.window, args.duration * 3))
+    print('{:>8} {:>15} {:>12}'.format('chunk', 'window', 'ms/run'))
+    for chunk_size in chunk_sizes:
+        chunks = make_chunks(args.duration * 3, chunk_size)
+        measure(WINDOWS, chunks, window_size, args.repeat, chunk_size)
+
+
+if __name__ == "__main__":
+    main()
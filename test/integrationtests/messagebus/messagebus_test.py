@@ -117,14 +117,13 @@ class TestMessageMethods(unittest.TestCase):
                                 {'target': 4}, {'target': 5})
         self.message3 = Message("status", "OK")
         # serialized results of each of the messages
-        self.serialized = ['{"data": {}, "type": "empty", "context": null}',
-                           '{"data": {}, "type": "enclosure.reset",\
-                            "context": null}',
-                           '{"data": { "target": 4}, \
-                            "type": "enclosure.system.blink", \
-                            "context": {"target": 5}}',
-                           '{"data": "OK", "type": "status", \
-                            "context": null}']
+        self.serialized = ['{"type": "empty", "data": {}, "context": null}',
+                           '{"type": "enclosure.reset", "data": {}, '
+                           '"context": null}',
+                           '{"type": "enclosure.system.blink", '
+                           '"data": {"target": 4}, "context": {"target": 5}}',
+                           '{"type": "status", "data": "OK", '
+                           '"context": null}']
 
     def test_serialize(self):
         """This test the serialize method
@@ -153,10 +152,10 @@ class TestMessageMethods(unittest.TestCase):
         """
         message = self.empty_message.reply("status", "OK")
         self.assertEqual(message.serialize(),
-                         '{"data": "OK", "type": "status", "context": {}}')
+                         '{"type": "status", "data": "OK", "context": {}}')
         message = self.message1.reply("status", "OK")
         self.assertEqual(message.serialize(),
-                         '{"data": "OK", "type": "status", "context": {}}')
+                         '{"type": "status", "data": "OK", "context": {}}')
         message = self.message2.reply("status", "OK")
 
     def test_publish(self):
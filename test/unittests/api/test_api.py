@@ -272,6 +272,22 @@ class TestApi(unittest.TestCase):
         params = mock_request.call_args[1].get('params')
         self.assertEquals(params['lang'], 'en-US')
 
+    @mock.patch('mycroft.api.IdentityManager.get')
+    @mock.patch('mycroft.api.requests.request')
+    def test_stt_http_client(self, mock_request, mock_identity_get):
+        mock_identity = mock.MagicMock()
+        mock_identity.uuid = '1234'
+        mock_identity_get.return_value = mock_identity
+        http = mock.MagicMock()
+        http.request.return_value = create_response(200, {})
+        stt = mycroft.api.STTApi(http)
+        stt.stt('La la la', 'en-US', 1)
+        self.assertFalse(mock_request.called)
+        method, url = http.request.call_args[0]
+        self.assertEquals(method, 'POST')
+        self.assertEquals(url, 'https://api-test.mycroft.ai/v1/stt')
+        self.assertEquals(http.request.call_args[1].get('data'), 'La la la')
+
     @mock.patch('mycroft.api.IdentityManager.load')
     def test_has_been_paired(self, mock_identity_load):
         # reset pairing cache
@@ -0,0 +1,104 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+from mycroft.client.speech.data_structures import (
+    CyclicAudioBuffer,
+    PhraseBuffer
+)
+
+
+class TestCyclicAudioBuffer(unittest.TestCase):
+    def test_initial_data(self):
+        buff = CyclicAudioBuffer(8, b'abc')
+        self.assertEqual(len(buff), 3)
+        self.assertEqual(buff.get().tobytes(), b'abc')
+
+    def test_append_until_full(self):
+        buff = CyclicAudioBuffer(8)
+        buff.append(b'abcd')
+        buff.append(b'efgh')
+        self.assertEqual(len(buff), 8)
+        self.assertEqual(buff.get().tobytes(), b'abcdefgh')
+
+    def test_wrap_around(self):
+        buff = CyclicAudioBuffer(8, b'abcdef')
+        buff.append(b'ghij')
+        self.assertEqual(len(buff), 8)
+        self.assertEqual(buff.get().tobytes(), b'cdefghij')
+        buff.append(b'klm')
+        self.assertEqual(buff.get().tobytes(), b'fghijklm')
+
+    def test_get_last(self):
+        buff = CyclicAudioBuffer(8, b'abcdef')
+        buff.append(b'ghij')
+        self.assertEqual(buff.get_last(3).tobytes(), b'hij')
+        self.assertEqual(buff.get_last(100).tobytes(), b'cdefghij')
+        self.assertEqual(buff.get_last(0).tobytes(), b'')
+
+    def test_append_larger_than_buffer(self):
+        buff = CyclicAudioBuffer(4, b'ab')
+        buff.append(b'0123456789')
+        self.assertEqual(buff.get().tobytes(), b'6789')
+
+    def test_matches_reference_implementation(self):
+        size = 10
+        buff = CyclicAudioBuffer(size)
+        reference = b''
+        for i in range(50):
+            chunk = bytes(bytearray([i % 256] * (i % 7 + 1)))
+            buff.append(chunk)
+            reference = (reference + chunk)[-size:]
+            self.assertEqual(buff.get().tobytes(), reference)
+
+    def test_clear(self):
+        buff = CyclicAudioBuffer(8, b'abcdef')
+        buff.clear()
+        self.assertEqual(len(buff), 0)
+        buff.append(b'xy')
+        self.assertEqual(buff.get().tobytes(), b'xy')
+
+
+class TestPhraseBuffer(unittest.TestCase):
+    def test_append(self):
+        buff = PhraseBuffer(8, b'\0\0')
+        buff.append(b'abc')
+        buff.append(b'def')
+        self.assertEqual(len(buff), 8)
+        self.assertEqual(buff.capacity, 8)
+        self.assertEqual(buff.get_frame_data(), b'\0\0abcdef')
+
+    def test_grows_past_estimate(self):
+        buff = PhraseBuffer(4)
+        reference = b''
+        for i in range(20):
+            chunk = bytes(bytearray([i] * 3))
+            buff.append(chunk)
+            reference += chunk
+        self.assertEqual(buff.get_frame_data(), reference)
+        self.assertTrue(buff.capacity >= len(reference))
+
+    def test_view_survives_growth(self):
+        buff = PhraseBuffer(4, b'abcd')
+        view = buff.get_view()
+        buff.append(b'efgh')
+        self.assertEqual(view.tobytes(), b'abcd')
+        self.assertEqual(buff.get_view().tobytes(), b'abcdefgh')
+
+    def test_clear(self):
+        buff = PhraseBuffer(4, b'abcd')
+        buff.clear()
+        buff.append(b'xy')
+        self.assertEqual(buff.get_frame_data(), b'xy')
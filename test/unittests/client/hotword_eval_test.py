@@ -0,0 +1,116 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import audioop
+import shutil
+import struct
+import tempfile
+import unittest
+import wave
+from os.path import join
+
+import mock
+
+from mycroft.client.speech.hotword_eval import (
+    best_threshold, evaluate, read_wav, roc_curve, score_files
+)
+from mycroft.client.speech.hotword_factory import (
+    HotWordEngine, HotWordFactory
+)
+
+
+class LoudnessHotWord(HotWordEngine):
+    """Scores recordings by their loudness, None when silent."""
+    def score(self, frame_data):
+        return audioop.rms(frame_data, 2) or None
+
+
+def write_wav(file_name, amplitude, rate=16000, channels=1, sec=0.5):
+    samples = int(rate * sec) * channels
+    wav = wave.open(file_name, 'wb')
+    wav.setnchannels(channels)
+    wav.setsampwidth(2)
+    wav.setframerate(rate)
+    wav.writeframes(struct.pack('<{}h'.format(samples),
+                                *([amplitude] * samples)))
+    wav.close()
+
+
+class RocCurveTest(unittest.TestCase):
+    def test_curve(self):
+        curve = roc_curve([0.9, 0.7, None, 0.4], [0.8, 0.2])
+        self.assertEqual([p['threshold'] for p in curve],
+                         [0.9, 0.8, 0.7, 0.4, 0.2])
+        self.assertEqual(curve[0]['true_positive_rate'], 0.25)
+        self.assertEqual(curve[0]['false_positive_rate'], 0.0)
+        # The unscored positive is never accepted
+        self.assertEqual(curve[-1]['true_positive_rate'], 0.75)
+        self.assertEqual(curve[-1]['false_positive_rate'], 1.0)
+
+    def test_best_threshold(self):
+        curve = roc_curve([0.9, 0.7, 0.4], [0.8, 0.2])
+        self.assertEqual(best_threshold(curve)['threshold'], 0.4)
+        self.assertIsNone(best_threshold([]))
+
+    def test_empty(self):
+        self.assertEqual(roc_curve([], []), [])
+
+
+class ScoreFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.patcher = mock.patch.dict(HotWordFactory.CLASSES,
+                                       {'loudness': LoudnessHotWord})
+        self.patcher.start()
+        self.config = {'test': {'module': 'loudness'}}
+        self.files = []
+        for i, amplitude in enumerate([3000, 0, 1000, 2000]):
+            name = join(self.dir, '{}.wav'.format(i))
+            write_wav(name, amplitude)
+            self.files.append(name)
+
+    def tearDown(self):
+        self.patcher.stop()
+        shutil.rmtree(self.dir)
+
+    def test_read_wav_converts(self):
+        name = join(self.dir, 'stereo.wav')
+        write_wav(name, 1000, rate=8000, channels=2, sec=1.0)
+        frames, duration = read_wav(name, 16000)
+        self.assertAlmostEqual(duration, 1.0, places=2)
+        self.assertAlmostEqual(audioop.rms(frames, 2), 1000, delta=10)
+
+    def test_single_process(self):
+        results = score_files(self.files, 'test', self.config,
+                              processes=1)
+        self.assertEqual([r['file'] for r in results], self.files)
+        self.assertEqual([r['score'] for r in results],
+                         [3000, None, 1000, 2000])
+        self.assertAlmostEqual(results[0]['duration'], 0.5)
+
+    def test_pool_keeps_order(self):
+        results = score_files(self.files, 'test', self.config,
+                              processes=2)
+        self.assertEqual([r['score'] for r in results],
+                         [3000, None, 1000, 2000])
+
+    def test_evaluate(self):
+        report = evaluate(self.files[:1], self.files[1:], 'test',
+                          self.config, processes=1)
+        self.assertEqual(len(report['positive']), 1)
+        self.assertEqual(len(report['negative']), 3)
+        self.assertEqual(report['best']['threshold'], 3000)
+        self.assertEqual(report['best']['false_positive_rate'], 0.0)
+        self.assertEqual(report['throughput']['files'], 4)
+        self.assertGreater(report['throughput']['audio_sec_per_sec'], 0)
@@ -13,8 +13,14 @@
 # limitations under the License.
 #
 import unittest
+from threading import Condition
 
-from mycroft.client.speech.hotword_factory import HotWordFactory
+import mock
+
+from mycroft.client.speech.hotword_factory import (
+    HotWordFactory,
+    PreciseHotword
+)
 
 
 class PocketSphinxTest(unittest.TestCase):
@@ -56,3 +62,27 @@ class PocketSphinxTest(unittest.TestCase):
         config = config['hey victoria']
         self.assertEquals(config['phonemes'], p.phonemes)
         self.assertEquals(p.key_phrase, 'hey victoria')
+
+
+class PreciseScoreTest(unittest.TestCase):
+    def create(self, running, accepts_audio):
+        # Skip the constructor, it downloads precise and starts it
+        engine = PreciseHotword.__new__(PreciseHotword)
+        engine.exe_name = 'precise-stream'
+        engine.scores = None
+        engine.scores_ready = Condition()
+        engine.runner = mock.Mock(running=running)
+        engine.runner.write.return_value = accepts_audio
+        return engine
+
+    def test_not_running(self):
+        engine = self.create(running=False, accepts_audio=True)
+        self.assertIsNone(engine.score(b'\0' * 4096))
+        self.assertFalse(engine.runner.write.called)
+
+    def test_audio_not_taken(self):
+        # Running but not draining the queue, e.g. while backing off
+        engine = self.create(running=True, accepts_audio=False)
+        self.assertIsNone(engine.score(b'\0' * 4096))
+        self.assertEqual(engine.runner.write.call_count, 1)
+        self.assertIsNone(engine.scores)
@@ -0,0 +1,104 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import sys
+import time
+import unittest
+
+from mycroft.client.speech.hotword_process import HotwordProcess
+
+# Prints one score per 4 byte chunk, exits after the given number of chunks
+ECHO_SCRIPT = '''
+import sys
+for i in range(int(sys.argv[1])):
+    sys.stdin.read(4)
+    sys.stdout.write('0.9\\n')
+    sys.stdout.flush()
+'''
+
+# Reads its input but never answers
+SILENT_SCRIPT = '''
+import sys
+while sys.stdin.read(4):
+    pass
+'''
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+    return condition()
+
+
+class HotwordProcessTest(unittest.TestCase):
+    def create(self, script, *args, **kwargs):
+        self.lines = []
+        runner = HotwordProcess([sys.executable, '-c', script] + list(args),
+                                self.lines.append, min_backoff=0.05,
+                                **kwargs)
+        runner.start()
+        self.addCleanup(runner.stop)
+        return runner
+
+    def counter(self, runner, name):
+        return runner.get_stats()['counters'].get(name, 0)
+
+    def test_output(self):
+        runner = self.create(ECHO_SCRIPT, '100')
+        runner.write(b'abcd')
+        runner.write(b'efgh')
+        self.assertTrue(wait_for(lambda: len(self.lines) == 2))
+        self.assertEqual(self.lines, [b'0.9\n', b'0.9\n'])
+        latency = runner.get_stats()['timers']['latency_s']
+        self.assertEqual(latency['count'], 2)
+
+    def test_restart_after_crash(self):
+        runner = self.create(ECHO_SCRIPT, '1')
+        runner.write(b'abcd')
+        self.assertTrue(wait_for(lambda: self.counter(runner, 'restarts')))
+        # The restarted process keeps answering
+        self.assertTrue(wait_for(lambda: runner.queue.empty()))
+        runner.write(b'efgh')
+        self.assertTrue(wait_for(lambda: len(self.lines) == 2))
+
+    def test_restart_when_stalled(self):
+        runner = self.create(SILENT_SCRIPT, stall_timeout=0.1)
+        runner.write(b'abcd')
+        self.assertTrue(wait_for(lambda: self.counter(runner, 'stalls')))
+        self.assertTrue(wait_for(lambda: self.counter(runner, 'restarts')))
+
+    def test_restart(self):
+        runner = self.create(ECHO_SCRIPT, '100')
+        self.assertTrue(wait_for(lambda: runner.proc))
+        first = runner.proc
+        runner.restart()
+        self.assertTrue(wait_for(lambda: runner.proc is not first))
+        runner.write(b'abcd')
+        self.assertTrue(wait_for(lambda: len(self.lines) == 1))
+        # Requested restarts are not failures
+        self.assertEqual(self.counter(runner, 'restarts'), 0)
+
+    def test_write_drops_oldest(self):
+        runner = HotwordProcess(['unused'], None, max_chunks=2)
+        for chunk in (b'1', b'2', b'3'):
+            runner.write(chunk)
+        self.assertEqual(self.counter(runner, 'dropped_chunks'), 1)
+        self.assertEqual(runner.queue.get_nowait(), b'2')
+
+    def test_blocking_write_timeout(self):
+        runner = HotwordProcess(['unused'], None, max_chunks=1)
+        self.assertTrue(runner.write(b'1', block=True, timeout=0.01))
+        self.assertFalse(runner.write(b'2', block=True, timeout=0.01))
+        self.assertEqual(self.counter(runner, 'dropped_chunks'), 0)
@@ -84,6 +84,15 @@ class LocalRecognizerTest(unittest.TestCase):
         with source as audio:
             assert self.recognizer.found_wake_word(audio.stream.read())
 
+    def testWakeWordEnd(self):
+        source = WavFile(os.path.join(DATA_DIR, "weather_mycroft.wav"))
+        with source as audio:
+            data = audio.stream.read()
+            duration = float(len(data)) / (audio.SAMPLE_RATE *
+                                           audio.SAMPLE_WIDTH)
+            assert self.recognizer.found_wake_word(data)
+        assert 0 < self.recognizer.wake_word_end <= duration
+
 
 class LocalRecognizerInitTest(unittest.TestCase):
     @mock.patch.object(Configuration, 'get')
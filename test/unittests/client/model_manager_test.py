@@ -0,0 +1,160 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from os.path import isfile, join
+from threading import Thread
+
+import mock
+import requests
+
+from mycroft.client.speech.model_manager import ChecksumError, ModelManager
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        data = self.server.files.get(self.path)
+        if data is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class ModelServer(HTTPServer):
+    """Local stand-in for the server hosting the models."""
+    def __init__(self):
+        HTTPServer.__init__(self, ('localhost', 0), FileHandler)
+        self.files = {}
+        self.requests = []
+
+    @property
+    def url(self):
+        return 'http://{}:{}/'.format(*self.server_address)
+
+    def publish(self, name, data, checksum=None):
+        self.files['/' + name] = data
+        checksum = checksum or hashlib.sha256(data).hexdigest()
+        self.files['/' + name + '.sha256'] = checksum + '  ' + name + '\n'
+
+
+class ModelManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = ModelServer()
+        thread = Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        self.folder = tempfile.mkdtemp()
+        self.on_update = mock.Mock()
+        self.manager = ModelManager(self.on_update, retry_sec=0.1)
+        self.model = join(self.folder, 'hey-mycroft.pb')
+        self.params = self.model + '.params'
+        self.manager.add(self.model, self.server.url + 'hey-mycroft.pb')
+        self.manager.add(self.params,
+                         self.server.url + 'hey-mycroft.pb.params')
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def write(self, path, data, age=0):
+        with open(path, 'wb') as f:
+            f.write(data)
+        stamp = time.time() - age
+        os.utime(path, (stamp, stamp))
+
+    def read(self, path):
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def test_download(self):
+        self.server.publish('hey-mycroft.pb', b'model')
+        self.server.publish('hey-mycroft.pb.params', b'params')
+        self.assertFalse(self.manager.is_cached())
+        self.assertTrue(self.manager.update())
+        self.assertTrue(self.manager.is_cached())
+        self.assertEqual(self.read(self.model), b'model')
+        self.assertEqual(self.read(self.params), b'params')
+        self.on_update.assert_called_once_with()
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['hey-mycroft.pb', 'hey-mycroft.pb.params'])
+
+    def test_fresh_files_are_not_checked(self):
+        self.write(self.model, b'old model')
+        self.write(self.params, b'old params')
+        self.assertFalse(self.manager.update())
+        self.assertEqual(self.server.requests, [])
+
+    def test_checksum_mismatch_keeps_cached_files(self):
+        day = 24 * 60 * 60
+        self.write(self.model, b'old model', age=2 * day)
+        self.write(self.params, b'old params', age=2 * day)
+        self.server.publish('hey-mycroft.pb', b'new model')
+        self.server.publish('hey-mycroft.pb.params', b'corrupt',
+                            checksum=hashlib.sha256(b'params').hexdigest())
+        with self.assertRaises(ChecksumError):
+            self.manager.update()
+        # Neither file is replaced and no partial download is left behind
+        self.assertEqual(self.read(self.model), b'old model')
+        self.assertEqual(self.read(self.params), b'old params')
+        self.assertEqual(sorted(os.listdir(self.folder)),
+                         ['hey-mycroft.pb', 'hey-mycroft.pb.params'])
+        self.assertFalse(self.on_update.called)
+
+    def test_unchanged_files_are_kept(self):
+        day = 24 * 60 * 60
+        self.write(self.model, b'model', age=2 * day)
+        self.write(self.params, b'params', age=2 * day)
+        self.server.publish('hey-mycroft.pb', b'model')
+        self.server.publish('hey-mycroft.pb.params', b'params')
+        self.assertFalse(self.manager.update())
+        self.assertFalse(self.on_update.called)
+        self.assertFalse(self.manager.is_stale(self.manager.files[0]))
+
+    def test_offline(self):
+        self.write(self.model, b'model', age=2 * 24 * 60 * 60)
+        self.write(self.params, b'params', age=2 * 24 * 60 * 60)
+        self.manager.files[0].url = 'http://localhost:1/hey-mycroft.pb'
+        with self.assertRaises(requests.ConnectionError):
+            self.manager.update()
+        # The background thread keeps retrying without giving up
+        self.manager.start()
+        time.sleep(0.3)
+        self.manager.stop()
+        self.assertTrue(self.manager.is_cached())
+        self.assertFalse(self.on_update.called)
+
+    def test_background_update(self):
+        self.server.publish('hey-mycroft.pb', b'model')
+        self.server.publish('hey-mycroft.pb.params', b'params')
+        self.manager.start()
+        self.addCleanup(self.manager.stop)
+        end = time.time() + 5
+        while not self.on_update.called and time.time() < end:
+            time.sleep(0.01)
+        self.assertTrue(self.on_update.called)
+        self.assertTrue(isfile(self.model))
@@ -0,0 +1,63 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+import pyaudio
+
+from mycroft.client.speech.mic import CaptureQueue, MutableStream
+
+
+class TestCaptureQueue(unittest.TestCase):
+    def test_drops_oldest_when_full(self):
+        capture = CaptureQueue(2)
+        for chunk in [b'a', b'b', b'c']:
+            capture.callback(chunk, 1, {}, 0)
+        self.assertEqual(capture.dropped_chunks, 1)
+        self.assertEqual(capture.get(0.1), b'b')
+        self.assertEqual(capture.get(0.1), b'c')
+
+    def test_counts_input_overflow(self):
+        capture = CaptureQueue(2)
+        result = capture.callback(b'a', 1, {}, pyaudio.paInputOverflow)
+        self.assertEqual(result, (None, pyaudio.paContinue))
+        self.assertEqual(capture.input_overflows, 1)
+
+
+class TestMutableStream(unittest.TestCase):
+    def setUp(self):
+        self.wrapped = mock.Mock()
+        self.wrapped.get_input_latency.return_value = 0.0
+        self.capture = CaptureQueue(10)
+        self.stream = MutableStream(self.wrapped, pyaudio.paInt16,
+                                    capture_queue=self.capture)
+
+    def test_read_joins_and_splits_chunks(self):
+        for chunk in [b'\x01\x00' * 3, b'\x02\x00' * 3]:
+            self.capture.callback(chunk, 3, {}, 0)
+        self.assertEqual(self.stream.read(4), b'\x01\x00' * 3 + b'\x02\x00')
+        self.capture.callback(b'\x03\x00' * 2, 2, {}, 0)
+        self.assertEqual(self.stream.read(4),
+                         b"\x02\x00" * 2 + b"\x03\x00" * 2)
+
+    def test_muted_read_is_full_size(self):
+        self.capture.callback(b'\x01\x00' * 4, 4, {}, 0)
+        self.stream.mute()
+        self.assertEqual(self.stream.read(4), b'\x00' * 8)
+
+    def test_read_without_audio_raises(self):
+        self.stream.READ_TIMEOUT = 0.01
+        with self.assertRaises(IOError):
+            self.stream.read(4)
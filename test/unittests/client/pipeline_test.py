@@ -0,0 +1,155 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from Queue import Queue
+from threading import Event
+
+import mock
+from pyee import EventEmitter
+from speech_recognition import AudioData
+
+from mycroft.client.speech.listener import (
+    AudioConsumer,
+    PipelineStats,
+    RecognizerLoopState,
+    UtteranceSequencer
+)
+
+
+class MockSTT(object):
+    """Transcribes audio to its frame data, blocking on request."""
+    blockers = {}
+
+    def __init__(self):
+        self.lang = 'en-us'
+
+    def execute(self, audio, language=None):
+        text = audio.frame_data
+        if text in self.blockers:
+            self.blockers[text].wait(5)
+        return text
+
+
+def wait_for(condition, timeout=5):
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        time.sleep(0.01)
+
+
+class TestUtteranceSequencer(unittest.TestCase):
+    def setUp(self):
+        self.emitter = mock.Mock()
+        self.stats = PipelineStats()
+        self.sequencer = UtteranceSequencer(self.emitter, self.stats, 1.0)
+
+    def emitted(self):
+        return [c[0][1] for c in self.emitter.emit.call_args_list]
+
+    def test_in_order(self):
+        first = self.sequencer.register()
+        second = self.sequencer.register()
+        self.sequencer.complete(second, 'b')
+        self.assertEqual(self.emitted(), [])
+        self.sequencer.complete(first, 'a')
+        self.assertEqual(self.emitted(), ['a', 'b'])
+        self.assertEqual(self.sequencer.pending(), 0)
+
+    def test_failed_utterance_releases_next(self):
+        first = self.sequencer.register()
+        second = self.sequencer.register()
+        self.sequencer.complete(second, 'b')
+        self.sequencer.complete(first, None)
+        self.assertEqual(self.emitted(), ['b'])
+
+    def test_expire(self):
+        self.sequencer.max_wait = 0.0
+        first = self.sequencer.register()
+        second = self.sequencer.register()
+        self.sequencer.complete(second, 'b')
+        self.sequencer.expire()
+        self.assertEqual(self.emitted(), ['b'])
+        self.sequencer.complete(first, 'a')
+        self.assertEqual(self.emitted(), ['b'])
+        counters = self.stats.get()['counters']
+        self.assertEqual(counters['skipped_utterances'], 1)
+        self.assertEqual(counters['late_utterances'], 1)
+
+
+class TestAudioConsumerPipeline(unittest.TestCase):
+    def setUp(self):
+        self.state = RecognizerLoopState()
+        self.state.running = True
+        self.emitter = EventEmitter()
+        self.utterances = []
+        self.emitter.on('recognizer_loop:utterance',
+                        lambda p: self.utterances.append(p['utterances'][0]))
+        patcher = mock.patch('mycroft.client.speech.listener.SessionManager')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.state.running = False
+        MockSTT.blockers.clear()
+
+    def create_consumer(self, **kwargs):
+        consumer = AudioConsumer(self.state, Queue(), self.emitter,
+                                 MockSTT(), None, mock.Mock(), **kwargs)
+        for worker in consumer.workers:
+            worker.start()
+        return consumer
+
+    def test_slow_stt_does_not_block_or_reorder(self):
+        blocker = MockSTT.blockers['slow'] = Event()
+        consumer = self.create_consumer(num_workers=2)
+        consumer.transcribe(AudioData('slow', 16000, 2))
+        consumer.transcribe(AudioData('fast', 16000, 2))
+
+        # The second utterance is transcribed while the first is stuck
+        wait_for(lambda: consumer.stats.get()['timers'].get('stt_s'))
+        self.assertEqual(consumer.stats.get()['timers']['stt_s']['count'], 1)
+        self.assertEqual(self.utterances, [])
+
+        blocker.set()
+        wait_for(lambda: len(self.utterances) == 2)
+        self.assertEqual(self.utterances, ['slow', 'fast'])
+
+    def test_wakeword_reports_phrase(self):
+        consumer = self.create_consumer()
+        engine = consumer.wakeword_recognizer
+        engine.key_phrase = 'hey mycroft'
+        engine.found_phrase = 'hey jarvis'
+        engine.confidence = 0.8
+        wake_words = []
+        self.emitter.on('recognizer_loop:wakeword', wake_words.append)
+        consumer.process(AudioData('', 16000, 2))
+        self.assertEqual(wake_words[0]['utterance'], 'hey jarvis')
+        self.assertEqual(wake_words[0]['confidence'], 0.8)
+
+        engine.found_phrase = None
+        engine.confidence = None
+        consumer.process(AudioData('', 16000, 2))
+        self.assertEqual(wake_words[1]['utterance'], 'hey mycroft')
+        self.assertIsNone(wake_words[1]['confidence'])
+
+    def test_drop_when_too_many_pending(self):
+        blocker = MockSTT.blockers['slow'] = Event()
+        consumer = self.create_consumer(num_workers=1, max_pending=1)
+        audio = AudioData('slow' * 8000, 16000, 2)
+        consumer.process(audio)
+        consumer.process(audio)
+        self.assertEqual(
+            consumer.stats.get()['counters']['dropped_utterances'], 1)
+        blocker.set()
@@ -0,0 +1,184 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+
+from mycroft.client.speech.hotword_factory import PocketsphinxHotWord
+
+WAKE_WORD = b'WAKE'
+STOP = b'STOP'
+MARKERS = {WAKE_WORD: 'hey mycroft', STOP: 'stop'}
+
+
+class MockDecoder(object):
+    """Spots a phrase when the utterance contains its marker."""
+    def __init__(self, config):
+        self.config = config
+        self.audio = b''
+        self.processed = 0
+        self.utterances = 0
+
+    @staticmethod
+    def default_config():
+        config = mock.Mock()
+        config.get_int.return_value = 100
+        return config
+
+    def start_utt(self):
+        self.audio = b''
+        self.utterances += 1
+
+    def end_utt(self):
+        pass
+
+    def process_raw(self, data, no_search, full_utt):
+        self.audio += data
+        self.processed += len(data)
+
+    def hyp(self):
+        segs = self.seg()
+        if segs:
+            return mock.Mock(hypstr=' '.join(seg.word for seg in segs))
+        return None
+
+    def seg(self):
+        segs = []
+        for marker, phrase in MARKERS.items():
+            if marker in self.audio:
+                end = self.audio.index(marker) + len(marker)
+                # 16 bit samples at 16000 Hz, 100 frames per second
+                segs.append(mock.Mock(word=phrase, prob=-10,
+                                      end_frame=end / 2 / 160 - 1))
+        return segs
+
+    def get_logmath(self):
+        return mock.Mock(exp=lambda prob: 10.0 ** prob,
+                         log_to_log10=lambda prob: prob)
+
+
+class PocketsphinxStreamingTest(unittest.TestCase):
+    def setUp(self):
+        module = mock.Mock(Decoder=MockDecoder)
+        patcher = mock.patch.dict('sys.modules', {'pocketsphinx': module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        config = {
+            'module': 'pocketsphinx',
+            'phonemes': 'HH EY . M AY K R AO F T',
+            'streaming': True,
+            'max_utterance_sec': 3
+        }
+        self.engine = PocketsphinxHotWord('hey mycroft', config)
+        self.decoder = self.engine.stream_decoder
+
+    def test_chunks_decoded_once(self):
+        chunk = b'\0' * 320
+        for _ in range(10):
+            self.engine.update(chunk)
+            self.assertFalse(self.engine.found_wake_word(b''))
+        self.assertEqual(self.decoder.processed, 3200)
+        self.assertEqual(self.decoder.utterances, 1)
+
+    def test_detection(self):
+        # The wake word ends after 3200 bytes, 3200 more bytes follow it
+        self.engine.update(b'\0' * 3196 + WAKE_WORD)
+        self.engine.update(b'\0' * 3200)
+        self.assertTrue(self.engine.found_wake_word(b'\0' * 8000))
+        # 4800 bytes in an 8000 byte buffer at 32000 bytes per second
+        self.assertAlmostEqual(self.engine.wake_word_end, 0.15)
+        self.assertFalse(self.engine.found_wake_word(b'\0' * 8000))
+        # Detection restarts the utterance without the wake word audio
+        self.assertEqual(self.decoder.utterances, 2)
+        self.assertEqual(self.decoder.audio, b'\0' * 3200)
+
+    def test_restart_keeps_overlap(self):
+        # Ten phonemes of 120 ms are kept when restarting after 3 seconds
+        overlap = 38400
+        chunk = b'\1' * 3200
+        for _ in range(31):
+            self.engine.update(chunk)
+        self.assertEqual(self.decoder.utterances, 2)
+        self.assertEqual(len(self.decoder.audio), overlap)
+        self.assertEqual(self.decoder.processed, 31 * 3200 + overlap)
+
+    def test_reset_forgets_detection(self):
+        self.engine.update(b'\0' * 316 + WAKE_WORD)
+        self.engine.reset()
+        self.assertFalse(self.engine.found_wake_word(b'\0' * 320))
+
+    def test_restart_forgets_detection(self):
+        self.engine.update(b'\0' * 316 + WAKE_WORD)
+        for _ in range(31):
+            self.engine.update(b'\1' * 3200)
+        self.assertFalse(self.engine.found_wake_word(b'\0' * 320))
+
+    def test_score_keeps_stream(self):
+        self.engine.update(b'\0' * 320)
+        self.assertEqual(self.engine.score(b'\0' * 316 + WAKE_WORD), -10)
+        self.assertEqual(self.decoder.utterances, 1)
+        self.assertEqual(self.decoder.audio, b'\0' * 320)
+
+
+class PocketsphinxKeyphrasesTest(unittest.TestCase):
+    def setUp(self):
+        module = mock.Mock(Decoder=MockDecoder)
+        patcher = mock.patch.dict('sys.modules', {'pocketsphinx': module})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.config = {
+            'module': 'pocketsphinx',
+            'phonemes': 'HH EY . M AY K R AO F T',
+            'threshold': 1e-90,
+            'keyphrases': {
+                'Stop': {
+                    'phonemes': 'S T AA P',
+                    'threshold': 1e-20,
+                    'message': 'mycroft.stop'
+                }
+            }
+        }
+
+    def test_keyword_list(self):
+        engine = PocketsphinxHotWord('hey mycroft', self.config)
+        calls = dict(c[0] for c in
+                     engine.decoder.config.set_string.call_args_list)
+        self.assertNotIn('-keyphrase', calls)
+        with open(calls['-kws']) as f:
+            self.assertEqual(sorted(f.read().splitlines()),
+                             ['hey mycroft /1e-90/', 'stop /1e-20/'])
+        with open(calls['-dict']) as f:
+            words = [line.split()[0] for line in f]
+        self.assertEqual(sorted(words), ['hey', 'mycroft', 'stop'])
+
+    def test_reports_phrase(self):
+        engine = PocketsphinxHotWord('hey mycroft', self.config)
+        self.assertTrue(engine.found_wake_word(b'\0' * 100 + STOP))
+        self.assertEqual(engine.found_phrase, 'stop')
+        self.assertEqual(engine.found_message, 'mycroft.stop')
+        self.assertEqual(engine.confidence, 1e-10)
+
+        self.assertTrue(engine.found_wake_word(b'\0' * 100 + WAKE_WORD))
+        self.assertEqual(engine.found_phrase, 'hey mycroft')
+        self.assertIsNone(engine.found_message)
+
+    def test_streaming(self):
+        self.config['streaming'] = True
+        engine = PocketsphinxHotWord('hey mycroft', self.config)
+        engine.update(b'\0' * 316 + STOP)
+        self.assertTrue(engine.found_wake_word(b'\0' * 320))
+        self.assertEqual(engine.found_message, 'mycroft.stop')
+        # Both phrases share a single decoder
+        self.assertEqual(engine.stream_decoder.processed, 320)
@@ -0,0 +1,94 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from copy import deepcopy
+
+import mock
+
+from mycroft.client.speech.listener import RecognizerLoop
+
+
+class RecognizerLoopReconfigureTest(unittest.TestCase):
+    def setUp(self):
+        # The audio device and hotword engines aren't needed for these tests
+        for name in ('MutableMicrophone', 'ResponsiveRecognizer',
+                     'HotWordFactory'):
+            patcher = mock.patch('mycroft.client.speech.listener.' + name)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.loop = RecognizerLoop()
+        self.loop.consumer = mock.Mock()
+        self.loop.responsive_recognizer = mock.Mock()
+        self.loop.reload = mock.Mock()
+        self.loop.create_wake_word_recognizer = mock.Mock()
+        self.loop.create_wakeup_recognizer = mock.Mock()
+
+    def changed_config(self, **listener):
+        config = deepcopy(self.loop._applied_config)
+        config['listener'].update(listener)
+        return config
+
+    def test_unrelated_change(self):
+        config = deepcopy(self.loop._applied_config)
+        config['location'] = {'city': {'name': 'Lawrence'}}
+        self.loop.reconfigure(config)
+        self.assertFalse(self.loop.reload.called)
+        self.assertFalse(self.loop.create_wake_word_recognizer.called)
+        self.assertFalse(self.loop.responsive_recognizer.update_config.called)
+
+    def test_multiplier_applied_in_place(self):
+        self.loop.reconfigure(self.changed_config(multiplier=2.5))
+        self.assertFalse(self.loop.reload.called)
+        self.assertFalse(self.loop.create_wake_word_recognizer.called)
+        args = self.loop.responsive_recognizer.update_config.call_args[0]
+        self.assertEqual(args[0]['multiplier'], 2.5)
+
+    def test_confirm_listening_applied_in_place(self):
+        config = deepcopy(self.loop._applied_config)
+        config['confirm_listening'] = not config.get('confirm_listening')
+        self.loop.reconfigure(config)
+        self.assertFalse(self.loop.reload.called)
+        self.assertFalse(self.loop.create_wake_word_recognizer.called)
+        args = self.loop.responsive_recognizer.update_config.call_args[0]
+        self.assertEqual(args[1]['confirm_listening'],
+                         config['confirm_listening'])
+
+    def test_wake_word_change_recreates_engine(self):
+        self.loop.reconfigure(self.changed_config(threshold=1e-30))
+        self.assertFalse(self.loop.reload.called)
+        self.assertTrue(self.loop.create_wake_word_recognizer.called)
+        self.assertFalse(self.loop.create_wakeup_recognizer.called)
+        engine = self.loop.create_wake_word_recognizer.return_value
+        self.loop.responsive_recognizer.set_wake_word_recognizer \
+            .assert_called_with(engine)
+        self.assertEqual(self.loop.consumer.wakeword_recognizer, engine)
+
+    def test_replaced_engines_stopped(self):
+        old_wake_word = self.loop.wakeword_recognizer = mock.Mock()
+        old_wakeup = self.loop.wakeup_recognizer = mock.Mock()
+        self.loop.reconfigure(self.changed_config(threshold=1e-30))
+        old_wake_word.stop.assert_called_once_with()
+        self.assertFalse(old_wakeup.stop.called)
+        self.assertFalse(self.loop.wakeword_recognizer.stop.called)
+
+    def test_device_change_reopens_microphone(self):
+        self.loop.reconfigure(self.changed_config(sample_rate=48000))
+        self.assertTrue(self.loop.reload.called)
+
+    def test_stt_change_reopens_microphone(self):
+        config = deepcopy(self.loop._applied_config)
+        config['stt']['module'] = 'kaldi'
+        self.loop.reconfigure(config)
+        self.assertTrue(self.loop.reload.called)
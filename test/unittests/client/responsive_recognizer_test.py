@@ -0,0 +1,80 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+from speech_recognition import AudioSource
+
+from mycroft.client.speech.mic import ResponsiveRecognizer
+
+
+class MockSource(AudioSource):
+    def __init__(self, chunks):
+        self.stream = mock.Mock()
+        self.stream.read.side_effect = chunks
+        self.CHUNK = 4
+        self.SAMPLE_RATE = 16000
+        self.SAMPLE_WIDTH = 2
+
+
+class PrerollTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('mycroft.client.speech.mic.DeviceApi')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.wake_word = mock.Mock(key_phrase='hey mycroft', num_phonemes=8)
+        self.recognizer = ResponsiveRecognizer(self.wake_word)
+        # End recordings after the first chunk
+        self.recognizer.RECORDING_TIMEOUT = 1.0 / 4000
+
+    def test_audio_after_wake_word(self):
+        source = MockSource([])
+        self.wake_word.wake_word_end = 2.0 / 16000
+        after = self.recognizer._audio_after_wake_word(b'abcdefgh\0\0', 2,
+                                                       source)
+        self.assertEqual(after, b'efgh')
+
+    def test_unknown_wake_word_end(self):
+        source = MockSource([])
+        self.wake_word.wake_word_end = None
+        after = self.recognizer._audio_after_wake_word(b'abcdefgh', 0,
+                                                       source)
+        self.assertEqual(after, b'')
+
+    def test_record_phrase_starts_with_preroll(self):
+        source = MockSource([b'ijklmnop'])
+        stream = mock.Mock()
+        sec_per_buffer = float(source.CHUNK) / source.SAMPLE_RATE
+        data = self.recognizer._record_phrase(source, sec_per_buffer,
+                                              stream, b'efgh')
+        self.assertEqual(data, b'\0\0efghijklmnop')
+        self.assertEqual(stream.stream_chunk.call_args_list,
+                         [mock.call(b'efgh'), mock.call(b'ijklmnop')])
+
+
+class UpdateConfigTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch('mycroft.client.speech.mic.DeviceApi')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recognizer = ResponsiveRecognizer(
+            mock.Mock(key_phrase='hey mycroft', num_phonemes=8))
+
+    def test_config_outside_listener_section(self):
+        config = dict(self.recognizer.config)
+        config['confirm_listening'] = not config.get('confirm_listening')
+        self.recognizer.update_config(config['listener'], config)
+        self.assertEqual(self.recognizer.config['confirm_listening'],
+                         config['confirm_listening'])
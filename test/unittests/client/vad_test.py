@@ -0,0 +1,99 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import math
+import random
+import struct
+import unittest
+
+from mycroft.client.speech.vad import EnergyVAD, NumpyVAD, VADFactory
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+def to_chunk(samples):
+    return struct.pack('<%dh' % len(samples), *[int(s) for s in samples])
+
+
+def tone(freq, amplitude=8000, num=1024, rate=16000):
+    return to_chunk([amplitude * math.sin(2 * math.pi * freq * i / rate)
+                     for i in range(num)])
+
+
+def noise(amplitude=8000, num=1024, seed=1234):
+    rand = random.Random(seed)
+    return to_chunk([rand.uniform(-amplitude, amplitude)
+                     for i in range(num)])
+
+
+class TestEnergyVAD(unittest.TestCase):
+    def test_threshold(self):
+        vad = EnergyVAD()
+        energy = vad.process(tone(200), 2)
+        self.assertTrue(vad.is_speech(energy - 1))
+        self.assertFalse(vad.is_speech(energy + 1))
+
+    def test_silence(self):
+        vad = EnergyVAD()
+        self.assertEqual(vad.process(b'\0' * 2048, 2), 0)
+        self.assertFalse(vad.is_speech(0))
+
+
+@unittest.skipIf(numpy is None, 'numpy not installed')
+class TestNumpyVAD(unittest.TestCase):
+    def test_energy_matches_audioop(self):
+        chunk = tone(440)
+        self.assertAlmostEqual(NumpyVAD().process(chunk, 2),
+                               EnergyVAD().process(chunk, 2), delta=1)
+
+    def test_voiced_tone_is_speech(self):
+        vad = NumpyVAD()
+        vad.process(tone(200), 2)
+        vad.process(tone(200), 2)
+        self.assertTrue(vad.is_speech(100))
+
+    def test_stationary_noise_is_not_speech(self):
+        vad = NumpyVAD()
+        vad.process(noise(seed=0), 2)
+        for seed in range(1, 10):
+            vad.process(noise(seed=seed), 2)
+            # Independent noise chunks have high flux, but it's no onset
+            self.assertTrue(vad.zcr > vad.max_zcr)
+            self.assertTrue(vad.flux > vad.min_flux)
+            self.assertFalse(vad.is_speech(100))
+
+    def test_onset_in_noise_is_speech(self):
+        vad = NumpyVAD()
+        for seed in range(10):
+            vad.process(noise(seed=seed), 2)
+        vad.process(tone(3000), 2)
+        self.assertTrue(vad.zcr > vad.max_zcr)
+        self.assertTrue(vad.is_speech(100))
+
+    def test_quiet_chunk_is_not_speech(self):
+        vad = NumpyVAD()
+        vad.process(tone(200, amplitude=10), 2)
+        self.assertFalse(vad.is_speech(100))
+
+
+class TestVADFactory(unittest.TestCase):
+    def test_default(self):
+        self.assertEqual(type(VADFactory.create()), EnergyVAD)
+
+    def test_unknown_module(self):
+        vad = VADFactory.create({'module': 'does not exist'})
+        self.assertEqual(type(vad), EnergyVAD)
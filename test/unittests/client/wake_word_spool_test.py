@@ -0,0 +1,163 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import wave
+from os.path import exists, join
+
+import mock
+
+from mycroft.client.speech.wake_word_spool import WakeWordSpool
+
+UPLOAD_CONFIG = {
+    'server': 'localhost',
+    'port': 1776,
+    'user': 'precise',
+    'folder': '/wakewords',
+    'batch_size': 2,
+    'batch_interval': 60,
+    'min_retry': 10,
+    'max_retry': 25
+}
+
+
+class WakeWordSpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.spool = WakeWordSpool(join(self.dir, 'spool'), max_queue=2)
+        self.spool.configure(UPLOAD_CONFIG, False, 0)
+        self.spool._scan()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def save(self, name, size=1000):
+        self.spool._save(name, b'\0' * size, 16000, 2)
+        return join(self.spool.directory, name)
+
+    def test_save_wav(self):
+        path = self.save('a.wav', 3200)
+        wav = wave.open(path, 'rb')
+        self.assertEqual(wav.getframerate(), 16000)
+        self.assertEqual(wav.getnframes(), 1600)
+        wav.close()
+
+    def test_size_limit_removes_oldest(self):
+        self.spool.max_bytes = 2500
+        first = self.save('a.wav')
+        second = self.save('b.wav')
+        third = self.save('c.wav')
+        self.assertFalse(exists(first))
+        self.assertTrue(exists(second))
+        self.assertTrue(exists(third))
+        self.assertEqual(list(self.spool.files), [second, third])
+
+    def test_scan_finds_earlier_recordings(self):
+        path = self.save('a.wav')
+        spool = WakeWordSpool(self.spool.directory)
+        spool._scan()
+        self.assertEqual(list(spool.files), [path])
+
+    def test_no_upload_when_disabled(self):
+        self.save('a.wav')
+        self.save('b.wav')
+        self.assertIsNone(self.spool._time_to_upload())
+        self.assertFalse(self.spool._upload_due())
+
+    @mock.patch.object(WakeWordSpool, '_upload')
+    def test_batch_upload(self, mock_upload):
+        mock_upload.return_value = True
+        self.spool.configure(UPLOAD_CONFIG, True, 0)
+        first = self.save('a.wav')
+        # Waits for a full batch or the batch interval
+        self.assertFalse(self.spool._upload_due())
+        second = self.save('b.wav')
+        self.assertTrue(self.spool._upload_due())
+        self.spool._upload_batch()
+        mock_upload.assert_called_once_with([first, second])
+        self.assertFalse(exists(first))
+        self.assertFalse(exists(second))
+        self.assertEqual(len(self.spool.files), 0)
+
+    @mock.patch.object(WakeWordSpool, '_upload')
+    def test_batch_interval(self, _):
+        self.spool.configure(UPLOAD_CONFIG, True, 0)
+        path = self.save('a.wav')
+        size, _ = self.spool.files[path]
+        self.spool.files[path] = (size, time.time() - 61)
+        self.assertTrue(self.spool._upload_due())
+
+    @mock.patch.object(WakeWordSpool, '_upload')
+    def test_retry_backoff(self, mock_upload):
+        mock_upload.return_value = False
+        self.spool.configure(UPLOAD_CONFIG, True, 0)
+        first = self.save('a.wav')
+        self.save('b.wav')
+        delays = []
+        for _ in range(3):
+            self.spool._upload_batch()
+            delays.append(self.spool.retry_delay)
+            self.assertFalse(self.spool._upload_due())
+        self.assertEqual(delays, [10, 20, 25])
+        self.assertTrue(exists(first))
+
+        mock_upload.return_value = True
+        self.spool.retry_at = 0
+        self.spool._upload_batch()
+        self.assertEqual(self.spool.retry_delay, 0)
+        self.assertFalse(exists(first))
+
+    @mock.patch.object(WakeWordSpool, '_upload')
+    def test_upload_error_backs_off(self, mock_upload):
+        mock_upload.side_effect = OSError('scp not found')
+        self.spool.configure(UPLOAD_CONFIG, True, 0)
+        first = self.save('a.wav')
+        self.save('b.wav')
+        self.spool._upload_batch()
+        self.assertEqual(self.spool.retry_delay, 10)
+        self.assertFalse(self.spool._upload_due())
+        self.assertTrue(exists(first))
+
+    @mock.patch('mycroft.client.speech.wake_word_spool.call')
+    def test_scp_command(self, mock_call):
+        mock_call.return_value = 0
+        self.spool.configure(UPLOAD_CONFIG, True, 0)
+        paths = [self.save('a.wav'), self.save('b.wav')]
+        with mock.patch('mycroft.client.speech.wake_word_spool.isfile',
+                        return_value=True):
+            self.assertTrue(self.spool._upload(paths))
+        cmd = mock_call.call_args[0][0]
+        self.assertEqual(cmd[0], 'scp')
+        self.assertEqual(cmd[-3:], paths + ['precise@localhost:/wakewords'])
+
+    def test_worker_saves_in_background(self):
+        spool = WakeWordSpool(join(self.dir, 'worker'))
+        spool.add('a.wav', b'\0' * 100, 16000, 2)
+        spool.add('b.wav', b'\0' * 100, 16000, 2)
+        thread = spool._thread
+        spool.stop()
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(sorted(os.listdir(spool.directory)),
+                         ['a.wav', 'b.wav'])
+
+    def test_add_never_blocks(self):
+        with mock.patch.object(WakeWordSpool, '_run'):
+            for i in range(5):
+                self.spool.add('{}.wav'.format(i), b'', 16000, 2)
+        self.assertEqual(self.spool.dropped, 3)
@@ -0,0 +1,182 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from threading import Timer
+
+import mock
+from websocket import ABNF
+
+from mycroft.messagebus.client.ws import WebsocketClient
+from mycroft.messagebus.encoding import MessageEncodingFactory
+from mycroft.messagebus.message import Message
+
+
+def sent_types(client):
+    messages = [Message.deserialize(c[0][0])
+                for c in client.client.send.call_args_list]
+    return [m.data['types'] for m in messages
+            if m.type == 'mycroft.bus.subscribe']
+
+
+@mock.patch.object(WebsocketClient, 'create_client')
+class TestWebsocketClient(unittest.TestCase):
+    def test_subscribe_on_open(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.client.sock = None  # Not connected
+        client.on('speak', mock.Mock())
+        client.once('skill.loaded', mock.Mock())
+        client.on('open', mock.Mock())
+        self.assertFalse(client.client.send.called)
+
+        client.client.sock = mock.Mock(connected=True)
+        client.on_open(client.client)
+        self.assertEqual(sent_types(client), [['skill.loaded', 'speak']])
+        client.on('mycroft.stop', mock.Mock())
+        client.on('speak', mock.Mock())
+        self.assertEqual(sent_types(client)[1:], [['mycroft.stop']])
+
+    def test_message_handler_receives_all(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.client.sock = mock.Mock(connected=True)
+        client.on('speak', mock.Mock())
+        client.on('message', mock.Mock())
+        client.on('mycroft.stop', mock.Mock())
+        self.assertEqual(sent_types(client), [['speak'], ['*']])
+        client.on_open(client.client)
+        self.assertEqual(sent_types(client)[-1], ['*'])
+
+    def test_encoding_handshake(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.encodings = ['msgpack', 'json']
+        client.client.sock = mock.Mock(connected=True)
+        client.on_open(client.client)
+        request = Message.deserialize(
+            client.client.send.call_args_list[0][0][0])
+        self.assertEqual(request.type, 'mycroft.bus.encoding')
+        self.assertEqual(request.data, {'encodings': ['msgpack', 'json']})
+        # JSON until the bus answers
+        client.emit(Message('speak'))
+        self.assertEqual(len(client.client.send.call_args[0]), 1)
+
+        client.on_message(client.client, Message(
+            'mycroft.bus.encoding.response',
+            {'encoding': 'msgpack'}).serialize())
+        client.emit(Message('speak'))
+        frame, opcode = client.client.send.call_args[0]
+        self.assertEqual(opcode, ABNF.OPCODE_BINARY)
+        msgpack = MessageEncodingFactory.get('msgpack')
+        self.assertEqual(msgpack.decode(frame).type, 'speak')
+
+        # Back to JSON on a new connection
+        client.on_open(client.client)
+        client.emit(Message('speak'))
+        self.assertEqual(len(client.client.send.call_args[0]), 1)
+
+    def test_json_only(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.encodings = ['json']
+        client.client.sock = mock.Mock(connected=True)
+        client.on_open(client.client)
+        self.assertNotIn('mycroft.bus.encoding', [
+            Message.deserialize(c[0][0]).type
+            for c in client.client.send.call_args_list])
+
+    def test_binary_message_handler_sees_json(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.pool = mock.Mock()
+        handler = mock.Mock()
+        client.emitter.on('message', handler)
+        msgpack = MessageEncodingFactory.get('msgpack')
+        message = Message('audio', {'data': bytearray(b'\x00\xff')})
+        client.on_message(client.client, msgpack.encode(message))
+        self.assertEqual(Message.deserialize(handler.call_args[0][0]).data,
+                         message.data)
+        parsed = client.pool.apply_async.call_args[0][1][1]
+        self.assertEqual(parsed.data, message.data)
+
+    def test_invalid_message_dropped(self, _):
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.pool = mock.Mock()
+        handler = mock.Mock()
+        client.emitter.on('message', handler)
+        # The bus forwards messages it routed on the type unvalidated
+        client.on_message(client.client, '{"type": "speak", "data": ')
+        self.assertFalse(handler.called)
+        self.assertFalse(client.pool.apply_async.called)
+
+
+@mock.patch.object(WebsocketClient, 'create_client')
+class TestRequest(unittest.TestCase):
+    def create_client(self, reply_type='test.response', delay=0.01,
+                      same_id=True):
+        """Client of a bus answering every request after delay."""
+        client = WebsocketClient('localhost', 8181, '/core')
+        client.client.sock = mock.Mock(connected=True)
+        client.pool = mock.Mock()
+
+        def send(frame):
+            request = Message.deserialize(frame)
+            if request.type == 'mycroft.bus.subscribe':
+                return
+            reply = request.reply(reply_type, {'answer': 42})
+            if not same_id:
+                reply.context['correlation_id'] = 'other'
+            Timer(delay, client.on_message,
+                  (client.client, reply.serialize())).start()
+
+        client.client.send.side_effect = send
+        return client
+
+    def test_reply(self, _):
+        client = self.create_client()
+        reply = client.request(Message('test', {}, {'source': 'skill'}))
+        self.assertEqual(reply.type, 'test.response')
+        self.assertEqual(reply.data, {'answer': 42})
+        self.assertEqual(reply.context['source'], 'skill')
+        self.assertEqual(client.waiters, {})
+        # The reply type is requested from the bus
+        self.assertIn('test.response', client.subscriptions)
+
+    def test_reply_type(self, _):
+        client = self.create_client(reply_type='other.answer')
+        reply = client.request(Message('test'), reply_type='other.answer')
+        self.assertEqual(reply.data, {'answer': 42})
+
+    def test_concurrent_requests(self, _):
+        client = self.create_client()
+        requests = [Message('test', {'n': n}) for n in range(5)]
+        replies = []
+        threads = [Timer(0, lambda m=m: replies.append(
+            (m, client.request(m)))) for m in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for request, reply in replies:
+            self.assertEqual(reply.context['correlation_id'],
+                             request.context['correlation_id'])
+        self.assertEqual(len(set(r.context['correlation_id']
+                                 for r in requests)), 5)
+
+    def test_timeout(self, _):
+        client = self.create_client(delay=1)
+        self.assertIsNone(client.request(Message('test'), timeout=0.05))
+        self.assertEqual(client.waiters, {})
+
+    def test_other_replies_ignored(self, _):
+        client = self.create_client(same_id=False)
+        self.assertIsNone(client.request(Message('test'), timeout=0.1))
+        client = self.create_client(reply_type='test.other')
+        self.assertIsNone(client.request(Message('test'), timeout=0.1))
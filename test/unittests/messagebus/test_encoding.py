@@ -0,0 +1,95 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import unittest
+
+from mycroft.messagebus.encoding import (
+    JsonEncoding,
+    MessageEncodingFactory,
+    MsgPackEncoding
+)
+from mycroft.messagebus.message import Message
+
+
+def audio_message():
+    return Message('audio', {'data': bytearray(b'\x00\xff\x10' * 10),
+                             'utterance': u'caf\xe9'}, {'source': 'mic'})
+
+
+class TestEncodings(unittest.TestCase):
+    def assertRoundTrip(self, encoding, message):
+        decoded = encoding.decode(encoding.encode(message))
+        self.assertEqual(decoded.type, message.type)
+        self.assertEqual(decoded.data, message.data)
+        self.assertEqual(decoded.context, message.context)
+
+    def test_json(self):
+        encoding = JsonEncoding()
+        self.assertRoundTrip(encoding, Message('speak', {'a': [1, 2.5]}))
+        self.assertRoundTrip(encoding, audio_message())
+        self.assertEqual(encoding.peek_type(
+            encoding.encode(Message('speak'))), 'speak')
+
+    def test_json_binary_in_base64(self):
+        serialized = Message('audio', {'data': bytearray(b'\x00\xff')}) \
+            .serialize()
+        self.assertEqual(json.loads(serialized)['data'],
+                         {'data': {'__binary__': 'AP8='}})
+
+    def test_msgpack(self):
+        encoding = MsgPackEncoding()
+        self.assertRoundTrip(encoding, Message('speak', {'a': [1, 2.5]}))
+        message = audio_message()
+        self.assertRoundTrip(encoding, message)
+        encoded = encoding.encode(message)
+        # Carried as is, not base64 encoded
+        self.assertIn(bytes(message.data['data']), encoded)
+        self.assertLess(len(encoded), len(message.serialize()))
+
+    def test_msgpack_peek_type(self):
+        encoding = MsgPackEncoding()
+        for msg_type in ['a', 'speak', 'x' * 31, 'x' * 32, 'x' * 300,
+                         u'caf\xe9']:
+            encoded = encoding.encode(Message(msg_type, {'data': 1}))
+            self.assertEqual(encoding.peek_type(encoded), msg_type)
+        self.assertIsNone(encoding.peek_type(
+            encoding.encode(Message(None))))
+        self.assertIsNone(encoding.peek_type(b'\x93\xa5spe'))
+
+    def test_msgpack_invalid(self):
+        encoding = MsgPackEncoding()
+        for value in [b'\x93\xa5speak', b'\x92\xa5speak\x80', b'\xc1']:
+            with self.assertRaises(ValueError):
+                encoding.decode(value)
+
+
+class TestMessageEncodingFactory(unittest.TestCase):
+    def test_get(self):
+        self.assertEqual(MessageEncodingFactory.get('json').name, 'json')
+        self.assertIs(MessageEncodingFactory.get('json'),
+                      MessageEncodingFactory.get('json'))
+        self.assertIsNone(MessageEncodingFactory.get('xml'))
+        self.assertEqual(
+            [e.name for e in MessageEncodingFactory.available(
+                ['xml', 'msgpack', 'json'])], ['msgpack', 'json'])
+
+    def test_detect(self):
+        message = Message('speak')
+        for name in ['json', 'msgpack']:
+            encoding = MessageEncodingFactory.get(name)
+            self.assertIs(MessageEncodingFactory.detect(
+                encoding.encode(message)), encoding)
+        self.assertIsNone(MessageEncodingFactory.detect(''))
+        self.assertIsNone(MessageEncodingFactory.detect('not a message'))
@@ -0,0 +1,47 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import json
+import unittest
+
+from mycroft.messagebus.message import Message, peek_type
+
+
+class TestMessage(unittest.TestCase):
+    def test_serialize_type_first(self):
+        message = Message('speak', {'utterance': 'hi'}, {'target': None})
+        serialized = message.serialize()
+        self.assertTrue(serialized.startswith('{"type": "speak", '))
+        self.assertEqual(json.loads(serialized), {
+            'type': 'speak',
+            'data': {'utterance': 'hi'},
+            'context': {'target': None}
+        })
+        self.assertEqual(Message.deserialize(serialized).data,
+                         {'utterance': 'hi'})
+
+    def test_peek_type(self):
+        self.assertEqual(peek_type(Message('speak').serialize()), 'speak')
+        self.assertEqual(peek_type(
+            Message('recognizer_loop:utterance').serialize()),
+            'recognizer_loop:utterance')
+
+    def test_peek_type_needs_parsing(self):
+        # Other key order, as sent by clients not using Message
+        self.assertIsNone(peek_type('{"data": {}, "type": "speak"}'))
+        # Escaped characters in the type
+        self.assertIsNone(peek_type(Message('say "hi"').serialize()))
+        self.assertIsNone(peek_type(Message(u'caf\xe9').serialize()))
+        self.assertIsNone(peek_type('{"type": "spe'))
+        self.assertIsNone(peek_type('not json'))
@@ -0,0 +1,333 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+
+import mock
+from pyee import EventEmitter
+
+import mycroft.messagebus.service.ws as ws
+from mycroft.messagebus.encoding import MessageEncodingFactory
+from mycroft.messagebus.message import Message
+from mycroft.messagebus.service.ws import (
+    SendQueue,
+    Subscriptions,
+    WebsocketEventHandler
+)
+
+
+class MockStream(object):
+    """Stream of a client, busy until sent() is called if slow."""
+
+    def __init__(self, slow=False):
+        self.slow = slow
+        self.busy = False
+        self.callback = None
+
+    def writing(self):
+        return self.busy
+
+    def write(self, data, callback):
+        self.callback = callback
+
+    def sent(self):
+        self.busy = False
+        callback, self.callback = self.callback, None
+        if callback:
+            callback()
+
+
+def create_connection(slow=False, send_queue=None):
+    """Handler without a tornado connection, recording what it is sent."""
+    handler = WebsocketEventHandler.__new__(WebsocketEventHandler)
+    handler.emitter = EventEmitter()
+    handler.stream = MockStream()
+    if send_queue:
+        handler.send_queue_config = send_queue
+
+    def write_message(message, binary=False):
+        handler.stream.busy = handler.stream.slow
+
+    handler.write_message = mock.Mock(side_effect=write_message)
+    handler.close = mock.Mock()
+    handler.open()
+    handler.stream.slow = slow
+    handler.write_message.reset_mock()
+    return handler
+
+
+def received_messages(connection):
+    return [MessageEncodingFactory.detect(c[0][0]).decode(c[0][0])
+            for c in connection.write_message.call_args_list]
+
+
+def received(connection):
+    return [m.type for m in received_messages(connection)]
+
+
+def subscribe(connection, *types):
+    connection.on_message(
+        Message('mycroft.bus.subscribe', {'types': list(types)}).serialize())
+
+
+class TestSubscriptions(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ws, 'client_connections', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ws, 'subscriptions', Subscriptions())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_receive_all_by_default(self):
+        first = create_connection()
+        second = create_connection()
+        first.on_message(Message('speak').serialize())
+        self.assertEqual(received(first), ['speak'])
+        self.assertEqual(received(second), ['speak'])
+
+    def test_subscribed_types(self):
+        sender = create_connection()
+        speech = create_connection()
+        subscribe(speech, 'speak', 'recognizer_loop:*')
+        for msg_type in ['speak', 'enclosure.mouth.viseme',
+                         'recognizer_loop:wakeword']:
+            sender.on_message(Message(msg_type).serialize())
+        self.assertEqual(received(speech),
+                         ['speak', 'recognizer_loop:wakeword'])
+        self.assertEqual(len(received(sender)), 3)
+        # The subscription itself isn't forwarded
+        self.assertNotIn('mycroft.bus.subscribe', received(sender))
+
+    def test_wildcard_and_unsubscribe(self):
+        sender = create_connection()
+        client = create_connection()
+        subscribe(client, 'speak', 'skill.*')
+        client.on_message(Message('mycroft.bus.unsubscribe',
+                                  {'types': ['speak']}).serialize())
+        sender.on_message(Message('speak').serialize())
+        sender.on_message(Message('skill.loaded').serialize())
+        self.assertEqual(received(client), ['skill.loaded'])
+        subscribe(client, '*')
+        sender.on_message(Message('speak').serialize())
+        self.assertEqual(received(client), ['skill.loaded', 'speak'])
+
+    def test_unsubscribe_without_subscriptions(self):
+        sender = create_connection()
+        client = create_connection()
+        client.on_message(Message('mycroft.bus.unsubscribe',
+                                  {'types': ['speak']}).serialize())
+        sender.on_message(Message('skill.loaded').serialize())
+        self.assertEqual(received(client), ['skill.loaded'])
+
+    def test_closed_connection(self):
+        sender = create_connection()
+        client = create_connection()
+        subscribe(client, 'speak')
+        client.on_close()
+        sender.on_message(Message('speak').serialize())
+        self.assertEqual(received(client), [])
+        self.assertEqual(ws.subscriptions.recipients('speak'), [sender])
+
+    def test_in_process_handlers(self):
+        sender = create_connection()
+        handler = mock.Mock()
+        sender.on('speak', handler)
+        subscribe(sender, 'other')
+        sender.on_message(Message('speak', {'utterance': 'hi'}).serialize())
+        self.assertEqual(handler.call_args[0][0].data, {'utterance': 'hi'})
+
+    def test_parsed_only_for_in_process_handlers(self):
+        sender = create_connection()
+        client = create_connection()
+        handler = mock.Mock()
+        sender.on('speak', handler)
+        with mock.patch.object(ws.Message, 'deserialize',
+                               wraps=Message.deserialize) as deserialize:
+            sender.on_message(Message('speak').serialize())
+            self.assertEqual(deserialize.call_count, 1)
+            sender.on_message(Message('skill.loaded').serialize())
+            self.assertEqual(deserialize.call_count, 1)
+        self.assertEqual(handler.call_count, 1)
+        self.assertEqual(received(client), ['speak', 'skill.loaded'])
+
+    def test_forwarded_unchanged(self):
+        sender = create_connection()
+        client = create_connection()
+        subscribe(client, 'speak')
+        # Any key order is routed, the type is then found by parsing
+        message = '{"data": {"utterance": "hi"}, "type": "speak"}'
+        sender.on_message(message)
+        sender.on_message('{"data": {}, "type": "other"}')
+        client.write_message.assert_called_once_with(message, False)
+
+    def test_invalid_message_dropped(self):
+        sender = create_connection()
+        client = create_connection()
+        sender.on_message('not json')
+        sender.on_message('["speak"]')
+        self.assertEqual(received(client), [])
+
+
+class TestEncodings(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ws, 'client_connections', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ws, 'subscriptions', Subscriptions())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.msgpack = MessageEncodingFactory.get('msgpack')
+
+    def negotiate(self, connection, *encodings):
+        connection.on_message(Message('mycroft.bus.encoding', {
+            'encodings': list(encodings)}).serialize())
+        response = connection.write_message.call_args
+        connection.write_message.reset_mock()
+        return response
+
+    def test_handshake(self):
+        client = create_connection()
+        response = self.negotiate(client, 'xml', 'msgpack', 'json')
+        # Answered in the old encoding, sent in the new one after
+        message = Message.deserialize(response[0][0])
+        self.assertEqual(message.type, 'mycroft.bus.encoding.response')
+        self.assertEqual(message.data, {'encoding': 'msgpack'})
+        self.assertFalse(response[0][1])
+        client.on_message(Message('mycroft.bus.stats').serialize())
+        frame, binary = client.write_message.call_args[0]
+        self.assertTrue(binary)
+        self.assertEqual(self.msgpack.decode(frame).type,
+                         'mycroft.bus.stats.response')
+
+    def test_unknown_encoding(self):
+        client = create_connection()
+        response = self.negotiate(client, 'xml')
+        self.assertEqual(Message.deserialize(response[0][0]).data,
+                         {'encoding': 'json'})
+        self.assertEqual(client.encoding.name, 'json')
+
+    def test_mixed_clients(self):
+        json_client = create_connection()
+        json_sender = create_connection()
+        binary_client = create_connection()
+        binary_sender = create_connection()
+        self.negotiate(binary_client, 'msgpack')
+        self.negotiate(binary_sender, 'msgpack')
+        handler = mock.Mock()
+        binary_sender.on('audio', handler)
+        audio = Message('audio', {'data': bytearray(b'\x00\xff' * 100)})
+        binary_sender.on_message(self.msgpack.encode(audio))
+        json_sender.on_message(Message('speak').serialize())
+
+        for client in [json_client, binary_client]:
+            messages = received_messages(client)
+            self.assertEqual([m.type for m in messages], ['audio', 'speak'])
+            self.assertEqual(messages[0].data, audio.data)
+        # Frames in the encoding of each client, the same for all of them
+        self.assertEqual(
+            [c[0][1] for c in binary_client.write_message.call_args_list],
+            [True, True])
+        json_frames = [c[0][0] for c in
+                       json_client.write_message.call_args_list]
+        self.assertIn('"__binary__"', json_frames[0])
+        self.assertIs(json_frames[0],
+                      json_sender.write_message.call_args_list[0][0][0])
+        self.assertEqual(handler.call_args[0][0].data, audio.data)
+
+
+class TestSendQueue(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(ws, 'client_connections', [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(ws, 'subscriptions', Subscriptions())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def send(self, sender, *types):
+        for msg_type in types:
+            sender.on_message(Message(msg_type).serialize())
+
+    def test_queued_while_client_busy(self):
+        sender = create_connection()
+        slow = create_connection(slow=True)
+        self.send(sender, 'a', 'b', 'c')
+        # The first message is with the socket, the rest wait
+        self.assertEqual(received(slow), ['a'])
+        self.assertEqual(slow.send_queue.depth, 2)
+        # Other clients aren't held up
+        self.assertEqual(received(sender), ['a', 'b', 'c'])
+        slow.stream.sent()
+        self.assertEqual(received(slow), ['a', 'b'])
+        slow.stream.slow = False
+        slow.stream.sent()
+        self.assertEqual(received(slow), ['a', 'b', 'c'])
+        self.assertEqual(slow.send_queue.depth, 0)
+
+    def test_drop_oldest(self):
+        sender = create_connection()
+        slow = create_connection(slow=True, send_queue={
+            'max_messages': 2, 'policy': 'drop_oldest'})
+        self.send(sender, 'a', 'b', 'c', 'd')
+        slow.stream.slow = False
+        slow.stream.sent()
+        self.assertEqual(received(slow), ['a', 'c', 'd'])
+        self.assertEqual(slow.send_queue.stats(), {
+            'depth': 0, 'max_depth': 2, 'sent': 4, 'dropped': 1})
+
+    def test_drop_by_priority(self):
+        sender = create_connection()
+        slow = create_connection(slow=True, send_queue={
+            'max_messages': 3, 'policy': 'priority',
+            'priorities': {'enclosure.*': -1, 'speak': 1}})
+        self.send(sender, 'connected', 'speak', 'enclosure.mouth.viseme',
+                  'skill.loaded', 'enclosure.mouth.reset', 'speak', 'other')
+        slow.stream.slow = False
+        slow.stream.sent()
+        # Both enclosure messages go first, then the oldest of priority 0
+        self.assertEqual(received(slow), ['connected', 'speak', 'speak',
+                                          'other'])
+        self.assertEqual(slow.send_queue.dropped, 3)
+
+    def test_disconnect(self):
+        sender = create_connection()
+        slow = create_connection(slow=True, send_queue={
+            'max_messages': 1, 'policy': 'disconnect'})
+        with mock.patch.object(ws, 'slow_disconnects', 0):
+            self.send(sender, 'a', 'b', 'c', 'd')
+            slow.close.assert_called_once_with()
+            self.assertEqual(ws.send_queue_stats()['disconnected'], 1)
+        self.assertEqual(received(slow), ['a'])
+        self.assertEqual(slow.send_queue.depth, 0)
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            SendQueue(mock.Mock(), {'policy': 'wait'})
+
+    def test_stats(self):
+        sender = create_connection()
+        slow = create_connection(slow=True, send_queue={'max_messages': 1})
+        subscribe(sender, 'mycroft.bus.stats.response')
+        self.send(sender, 'a', 'b', 'c')
+        slow.write_message.reset_mock()
+        self.send(sender, 'mycroft.bus.stats')
+        # Answered to the sender only
+        self.assertEqual(slow.write_message.call_count, 0)
+        response = Message.deserialize(
+            sender.write_message.call_args[0][0])
+        self.assertEqual(response.type, 'mycroft.bus.stats.response')
+        self.assertEqual(response.data['dropped'], 1)
+        self.assertEqual(response.data['connections'][1], {
+            'depth': 1, 'max_depth': 1, 'sent': 2, 'dropped': 1})
@@ -354,6 +354,27 @@ class MycroftSkillTest(unittest.TestCase):
         expected = [{'context': 'Donatello'}]
         check_remove_context(expected)
 
+    @mock.patch('mycroft.skills.core.time.time')
+    def test_get_scheduled_event_status(self, mock_time):
+        mock_time.return_value = 1000
+        s = TestSkill1()
+        s.bind(self.emitter)
+        s.emitter = mock.Mock()
+        s.emitter.request.return_value = Message(
+            'mycroft.event_status.callback.0:test', [[1030, None, {}]])
+        self.assertEqual(s.get_scheduled_event_status('test'), 30)
+        request = s.emitter.request.call_args
+        self.assertEqual(request[0][0].type, 'mycroft.scheduler.get_event')
+        self.assertEqual(request[1]['reply_type'],
+                         'mycroft.event_status.callback.' +
+                         request[0][0].data['name'])
+
+        s.emitter.request.return_value = Message('reply', {})
+        self.assertIsNone(s.get_scheduled_event_status('test'))
+        s.emitter.request.return_value = None
+        with self.assertRaises(Exception):
+            s.get_scheduled_event_status('test')
+
     @mock.patch.object(Configuration, 'get')
     def test_skill_location(self, mock_config_get):
         test_config = {
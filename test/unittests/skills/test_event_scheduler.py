@@ -6,6 +6,7 @@ import unittest
 import mock
 import time
 
+from mycroft.messagebus.message import Message
 from mycroft.skills.event_scheduler import EventScheduler
 
 
@@ -98,3 +99,31 @@ class TestEventScheduler(unittest.TestCase):
         self.assertEquals(emitter.emit.call_args[0][0].type, 'test')
         self.assertEquals(emitter.emit.call_args[0][0].data, {})
         es.shutdown()
+
+    @mock.patch('threading.Thread')
+    @mock.patch('json.load')
+    @mock.patch('json.dump')
+    @mock.patch('mycroft.skills.event_scheduler.open')
+    def test_get_event(self, mock_open, mock_dump, mock_load, mock_thread):
+        """
+            Test the event status is sent as reply to the request.
+        """
+        mock_load.return_value = ''
+        mock_open.return_value = mock.MagicMock(spec=file)
+        emitter = mock.MagicMock()
+        es = EventScheduler(emitter)
+        es.schedule_event('test', 900000000000, None)
+        es.check_state()
+
+        request = Message('mycroft.scheduler.get_event', {'name': 'test'},
+                          {'correlation_id': '1'})
+        es.get_event_handler(request)
+        reply = emitter.emit.call_args[0][0]
+        self.assertEquals(reply.type, 'mycroft.event_status.callback.test')
+        self.assertEquals(reply.data, [(900000000000, None, {})])
+        self.assertEquals(reply.context['correlation_id'], '1')
+
+        es.get_event_handler(Message('mycroft.scheduler.get_event',
+                                     {'name': 'missing'}))
+        self.assertEquals(emitter.emit.call_args[0][0].data, {})
+        es.shutdown()
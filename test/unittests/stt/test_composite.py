@@ -0,0 +1,177 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event, Timer
+
+import mock
+from requests.exceptions import ConnectionError
+
+from mycroft.configuration import Configuration
+from mycroft.stt import CircuitBreaker, CompositeSTT, STT, STTFactory
+
+
+class FakeSTT(STT):
+    """Answers with the configured text after the configured delay."""
+    def __init__(self):
+        super(FakeSTT, self).__init__()
+        self.calls = 0
+
+    def execute(self, audio, language=None):
+        self.calls += 1
+        time.sleep(self.config.get('delay', 0))
+        if self.config.get('error'):
+            raise ConnectionError('Failed')
+        return self.config.get('text')
+
+
+class FastSTT(FakeSTT):
+    pass
+
+
+class SlowSTT(FakeSTT):
+    pass
+
+
+class BrokenSTT(FakeSTT):
+    pass
+
+
+class EmptySTT(FakeSTT):
+    pass
+
+
+ENGINES = {
+    'fast': FastSTT,
+    'slow': SlowSTT,
+    'broken': BrokenSTT,
+    'empty': EmptySTT
+}
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def test_breaker(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+        breaker.failure()
+        self.assertFalse(breaker.is_open)
+        breaker.success()
+        breaker.failure()
+        self.assertFalse(breaker.is_open)
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
+        # Allow a new attempt after the timeout
+        breaker.opened_at -= 61
+        self.assertFalse(breaker.is_open)
+        breaker.failure()
+        self.assertTrue(breaker.is_open)
+        breaker.success()
+        self.assertFalse(breaker.is_open)
+
+
+@mock.patch.dict(STTFactory.CLASSES, ENGINES)
+class TestCompositeSTT(unittest.TestCase):
+    def setUp(self):
+        self.composite_config = {}
+        config = {
+            'stt': {
+                'module': 'composite',
+                'composite': self.composite_config,
+                'fast': {'text': 'fast', 'delay': 0.05},
+                'slow': {'text': 'slow', 'delay': 0.5},
+                'broken': {'error': True},
+                'empty': {'text': ''}
+            },
+            'lang': 'en-US'
+        }
+        patcher = mock.patch.object(Configuration, 'get',
+                                    return_value=config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create(self, engines, **config):
+        self.composite_config.update(config, engines=engines)
+        stt = STTFactory.create()
+        self.assertEqual(type(stt), CompositeSTT)
+        return stt
+
+    def calls(self, stt):
+        return [e.engine.calls for e in stt.engines]
+
+    def test_sub_engine_config(self):
+        stt = self.create(['fast', 'slow'])
+        self.assertEqual(stt.engines[0].engine.config['text'], 'fast')
+        self.assertEqual(stt.engines[1].engine.config['text'], 'slow')
+
+    def test_first_success(self):
+        stt = self.create(['broken', 'empty', 'slow', 'fast'])
+        self.assertEqual(stt.execute(None), 'slow')
+        self.assertEqual(self.calls(stt), [1, 1, 1, 0])
+
+    def test_all_failed(self):
+        stt = self.create(['broken'])
+        with self.assertRaises(ConnectionError):
+            stt.execute(None)
+        stt = self.create(['empty'])
+        self.assertIsNone(stt.execute(None))
+
+    def test_race(self):
+        stt = self.create(['slow', 'fast'], mode='race', race_count=2)
+        started = time.time()
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertLess(time.time() - started, 0.4)
+        self.assertEqual(self.calls(stt), [1, 1])
+
+    def test_fallback_after(self):
+        stt = self.create(['slow', 'fast'], mode='fallback',
+                          fallback_after=0.1)
+        started = time.time()
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertLess(time.time() - started, 0.4)
+
+        # A fast first engine is the only one asked
+        stt = self.create(['fast', 'slow'], mode='fallback',
+                          fallback_after=0.2)
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertEqual(self.calls(stt), [1, 0])
+
+    def test_engine_timeout(self):
+        stt = self.create([{'module': 'slow', 'timeout': 0.1}, 'fast'])
+        started = time.time()
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertLess(time.time() - started, 0.4)
+        self.assertEqual(stt.engines[0].breaker.failures, 1)
+        # The slow engine is still busy, the idle one is asked first
+        self.assertTrue(stt.engines[0].busy)
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertEqual(self.calls(stt), [1, 2])
+
+    def test_busy_engines_waited_for(self):
+        stt = self.create(['fast', 'empty'], mode='race', race_count=2)
+        # Both engines are still working on an earlier utterance
+        blocker = Event()
+        earlier = ThreadPoolExecutor(1).submit(blocker.wait, 5)
+        for engine in stt.engines:
+            engine.future = earlier
+        Timer(0.1, blocker.set).start()
+        started = time.time()
+        self.assertEqual(stt.execute(None), 'fast')
+        self.assertGreaterEqual(time.time() - started, 0.1)
+
+    def test_circuit_breaker_skips_failing_engine(self):
+        stt = self.create(['broken', 'fast'], failure_threshold=2)
+        for _ in range(4):
+            self.assertEqual(stt.execute(None), 'fast')
+        self.assertEqual(self.calls(stt), [2, 4])
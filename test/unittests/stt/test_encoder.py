@@ -0,0 +1,103 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import audioop
+import sys
+import unittest
+import wave
+from io import BytesIO
+
+import mock
+from speech_recognition import AudioData
+
+from mycroft.stt.encoder import (
+    AudioEncoder,
+    AudioEncoderFactory,
+    FlacProcessEncoder,
+    SoundFileFlacEncoder,
+    WavEncoder
+)
+
+
+def tone(rate, width, sec=1.0):
+    samples = int(rate * sec)
+    data = audioop.lin2lin(b'\x00\x40' * samples, 2, width)
+    return AudioData(data, rate, width)
+
+
+class TestAudioEncoder(unittest.TestCase):
+    def test_abstract(self):
+        with self.assertRaises(TypeError):
+            AudioEncoder()
+
+
+class TestWavEncoder(unittest.TestCase):
+    def read(self, wav_data):
+        wav = wave.open(BytesIO(wav_data), 'rb')
+        try:
+            return (wav.getframerate(), wav.getsampwidth(),
+                    wav.readframes(wav.getnframes()))
+        finally:
+            wav.close()
+
+    def test_encode(self):
+        rate, width, frames = self.read(
+            WavEncoder(16000).encode(tone(16000, 2)))
+        self.assertEqual((rate, width), (16000, 2))
+        self.assertEqual(frames, tone(16000, 2).frame_data)
+
+    def test_converts_rate_and_width(self):
+        rate, width, frames = self.read(
+            WavEncoder(16000).encode(tone(44100, 4)))
+        self.assertEqual((rate, width), (16000, 2))
+        self.assertAlmostEqual(len(frames), 2 * 16000, delta=4)
+
+
+class TestFlacProcessEncoder(unittest.TestCase):
+    @mock.patch('speech_recognition.get_flac_converter')
+    @mock.patch('mycroft.stt.encoder.Popen')
+    def test_flac_failure(self, mock_popen, mock_converter):
+        mock_converter.return_value = '/usr/bin/flac'
+        mock_popen.return_value.communicate.return_value = (b'', None)
+        mock_popen.return_value.returncode = 1
+        with self.assertRaises(IOError):
+            FlacProcessEncoder().encode(tone(16000, 2))
+
+
+class TestAudioEncoderFactory(unittest.TestCase):
+    def test_wav(self):
+        encoder = AudioEncoderFactory.create(['wav'], 8000)
+        self.assertIsInstance(encoder, WavEncoder)
+        self.assertEqual(encoder.sample_rate, 8000)
+
+    @mock.patch.dict(sys.modules, {'soundfile': mock.MagicMock()})
+    def test_flac_in_process_preferred(self):
+        encoder = AudioEncoderFactory.create(['flac', 'wav'])
+        self.assertIsInstance(encoder, SoundFileFlacEncoder)
+
+    @mock.patch.dict(sys.modules, {'soundfile': None})
+    @mock.patch('speech_recognition.get_flac_converter')
+    def test_flac_process_fallback(self, mock_converter):
+        mock_converter.return_value = '/usr/bin/flac'
+        encoder = AudioEncoderFactory.create(['flac', 'wav'])
+        self.assertIsInstance(encoder, FlacProcessEncoder)
+
+    @mock.patch.dict(sys.modules, {'soundfile': None})
+    @mock.patch('speech_recognition.get_flac_converter')
+    def test_next_format(self, mock_converter):
+        mock_converter.side_effect = OSError('flac not found')
+        encoder = AudioEncoderFactory.create(['flac', 'wav'])
+        self.assertIsInstance(encoder, WavEncoder)
+        with self.assertRaises(ValueError):
+            AudioEncoderFactory.create(['flac'])
@@ -12,14 +12,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 #
+import sys
 import unittest
 
 import mock
+from speech_recognition import AudioData
 
 import mycroft.stt
+from mycroft.stt.standin import StandInSTTServer
 from mycroft.configuration import Configuration
 
 
+class MockHyp(object):
+    def __init__(self, hypstr):
+        self.hypstr = hypstr
+
+
+class MockDecoder(object):
+    """Transcribes the number of bytes in an utterance."""
+    instances = 0
+
+    def __init__(self, config):
+        MockDecoder.instances += 1
+        self.received = None
+
+    @staticmethod
+    def default_config():
+        return mock.MagicMock()
+
+    def start_utt(self):
+        self.received = b''
+
+    def process_raw(self, data, no_search, full_utt):
+        self.received += data
+
+    def end_utt(self):
+        pass
+
+    def hyp(self):
+        return MockHyp('{} bytes'.format(len(self.received)))
+
+
 class TestSTT(unittest.TestCase):
     @mock.patch.object(Configuration, 'get')
     def test_factory(self, mock_get):
@@ -106,8 +139,25 @@ class TestSTT(unittest.TestCase):
 
         stt = mycroft.stt.MycroftSTT()
         audio = mock.MagicMock()
+        stt.encoder = mock.MagicMock()
+        stt.encoder.encode.return_value = b'flac data'
         stt.execute(audio, 'en-us')
         self.assertTrue(mycroft.stt.STTApi.called)
+        # The audio is encoded once
+        stt.encoder.encode.assert_called_once_with(audio)
+        stt.api.stt.assert_called_once_with(b'flac data', 'en-us', 1)
+        self.assertIsNotNone(stt.encode_time)
+
+    @mock.patch.object(Configuration, 'get')
+    def test_encoder_by_capability(self, mock_get):
+        mock_get.return_value = {'stt': {'module': 'kaldi'}, 'lang': 'en-US'}
+        stt = mycroft.stt.KaldiSTT()
+        audio = AudioData(b'\0\0' * 8000, 8000, 2)
+        wav = stt.encode(audio)
+        self.assertEqual(stt.encoder.format, 'wav')
+        self.assertEqual(wav[:4], b'RIFF')
+        # Resampled to 16 kHz
+        self.assertAlmostEqual(len(wav), 44 + 2 * 16000, delta=4)
 
     @mock.patch.object(Configuration, 'get')
     def test_google_stt(self, mock_get):
@@ -177,9 +227,9 @@ class TestSTT(unittest.TestCase):
         stt.execute(audio)
         self.assertTrue(stt.recognizer.recognize_wit.called)
 
-    @mock.patch('mycroft.stt.post')
+    @mock.patch('mycroft.stt.HTTPClient')
     @mock.patch.object(Configuration, 'get')
-    def test_kaldi_stt(self, mock_get, mock_post):
+    def test_kaldi_stt(self, mock_get, mock_http):
         mycroft.stt.Recognizer = mock.MagicMock
         config = {'stt': {
                  'module': 'kaldi',
@@ -194,7 +244,77 @@ class TestSTT(unittest.TestCase):
                 'hypotheses': [{'utterance': '     [noise]     text'},
                                {'utterance': '     asdf'}]
         }
-        mock_post.return_value = kaldiResponse
-        audio = mock.MagicMock()
+        mock_http.return_value.post.return_value = kaldiResponse
+        audio = AudioData(b'\0\0' * 160, 16000, 2)
         stt = mycroft.stt.KaldiSTT()
         self.assertEquals(stt.execute(audio), 'text')
+
+    @mock.patch.object(Configuration, 'get')
+    def test_kaldi_stt_streaming(self, mock_get):
+        server = StandInSTTServer(port=0, utterance='[noise] hello there')
+        server.start()
+        config = {'stt': {
+                 'module': 'kaldi',
+                 'kaldi': {'uri': server.uri},
+            },
+            "lang": "en-US"
+        }
+        mock_get.return_value = config
+
+        stt = mycroft.stt.KaldiSTT()
+        self.assertTrue(isinstance(stt, mycroft.stt.StreamingSTT))
+        stt.stream_start(16000, 2)
+        for _ in range(10):
+            stt.stream_data(b'\0' * 2048)
+        self.assertEquals(stt.stream_stop(), 'hello there')
+        self.assertEquals(server.bytes_received, 10 * 2048)
+        server.stop()
+
+    @mock.patch.dict(sys.modules, {'pocketsphinx': mock.MagicMock(
+        Decoder=MockDecoder, get_model_path=lambda: '/model')})
+    @mock.patch.object(Configuration, 'get')
+    def test_pocketsphinx_stt(self, mock_get):
+        mycroft.stt.PocketSphinxSTT._decoders = {}
+        MockDecoder.instances = 0
+        mock_get.return_value = {
+            'stt': {'module': 'pocketsphinx'},
+            'lang': 'en-US'
+        }
+        stt = mycroft.stt.STTFactory.create()
+        self.assertEquals(type(stt), mycroft.stt.PocketSphinxSTT)
+        # The model is loaded once, when the engine is created
+        self.assertEquals(MockDecoder.instances, 1)
+        other = mycroft.stt.PocketSphinxSTT()
+        self.assertEquals(MockDecoder.instances, 1)
+
+        stt.stream_start(16000, 2)
+        for _ in range(10):
+            stt.stream_data(b'\0' * 2048)
+        self.assertEquals(stt.stream_stop(), '20480 bytes')
+
+        # Audio is converted to the rate of the model
+        audio = AudioData(b'\0\0' * 8000, 8000, 2)
+        text = other.execute(audio)
+        self.assertAlmostEqual(int(text.split()[0]), 32000, delta=4)
+
+    @mock.patch.dict(sys.modules, {'pocketsphinx': mock.MagicMock(
+        Decoder=MockDecoder, get_model_path=lambda: '/model')})
+    @mock.patch.object(mycroft.stt.LocalDecoder, 'CHUNK_TIMEOUT', 0.1)
+    @mock.patch.object(Configuration, 'get')
+    def test_pocketsphinx_unfinished_stream(self, mock_get):
+        mycroft.stt.PocketSphinxSTT._decoders = {}
+        mock_get.return_value = {
+            'stt': {'module': 'pocketsphinx'},
+            'lang': 'en-US'
+        }
+        stt = mycroft.stt.PocketSphinxSTT()
+        other = mycroft.stt.PocketSphinxSTT()
+        stt.stream_start(16000, 2)
+        stt.stream_data(b'\0' * 2048)
+
+        # The stream that is never stopped doesn't hold up the next one
+        other.stream_start(16000, 2)
+        other.stream_data(b'\0' * 2048)
+        self.assertEquals(other.stream_stop(), '2048 bytes')
+        with self.assertRaises(IOError):
+            stt.stream_stop()
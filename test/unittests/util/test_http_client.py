@@ -0,0 +1,142 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import time
+import unittest
+
+import mock
+from requests.exceptions import ConnectionError, ConnectTimeout, ReadTimeout
+
+from mycroft.stt.standin import StandInSTTServer
+from mycroft.util.http_client import HTTPClient, RetryBudget
+
+
+def mock_response(status_code):
+    response = mock.Mock()
+    response.status_code = status_code
+    return response
+
+
+def mock_future(result=None, error=None):
+    future = mock.Mock()
+    if error:
+        future.result.side_effect = error
+    else:
+        future.result.return_value = result
+    return future
+
+
+class TestRetryBudget(unittest.TestCase):
+    def test_budget(self):
+        budget = RetryBudget(ratio=0.5, max_tokens=1)
+        self.assertTrue(budget.withdraw())
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertFalse(budget.withdraw())
+        budget.deposit()
+        self.assertTrue(budget.withdraw())
+
+
+class TestHTTPClient(unittest.TestCase):
+    def setUp(self):
+        self.server = None
+
+    def tearDown(self):
+        if self.server:
+            self.server.stop()
+
+    def start_server(self, **kwargs):
+        self.server = StandInSTTServer(port=0, **kwargs)
+        self.server.start()
+        return self.server.uri
+
+    def test_connection_reused(self):
+        uri = self.start_server()
+        client = HTTPClient()
+        for _ in range(5):
+            response = client.post(uri, data=b'\0' * 1000)
+            self.assertEqual(response.json()['received_bytes'], 1000)
+        self.assertEqual(self.server.requests, 5)
+        self.assertEqual(self.server.connections, 1)
+        client.close()
+
+    def test_hedged_request(self):
+        uri = self.start_server(slow_every=2, slow_delay=1.0)
+        client = HTTPClient({'hedge_after': 0.05})
+        started = time.time()
+        response = client.post(uri, data=b'audio')
+        self.assertLess(time.time() - started, 0.5)
+        # The first request was slow, the hedged second one answered
+        self.assertEqual(response.json()['id'], '2')
+        client.close()
+
+    def test_streamed_body_sent_once(self):
+        uri = self.start_server()
+        client = HTTPClient({'hedge_after': 0})
+        response = client.post(uri, data=(c for c in [b'ab', b'cd']))
+        self.assertEqual(response.json()['received_bytes'], 4)
+        self.assertEqual(self.server.requests, 1)
+        client.close()
+
+    def test_retry_on_error(self):
+        client = HTTPClient({'retries': 2, 'retry_delay': 0})
+        client.session = mock.Mock()
+        client.session.request.side_effect = [
+            mock_future(error=ConnectionError()),
+            mock_future(mock_response(503)),
+            mock_future(mock_response(200))
+        ]
+        self.assertEqual(client.post('http://test').status_code, 200)
+        self.assertEqual(client.session.request.call_count, 3)
+
+    def test_connect_timeout_retried(self):
+        client = HTTPClient({'retries': 2, 'retry_delay': 0})
+        client.session = mock.Mock()
+        client.session.request.side_effect = [
+            mock_future(error=ConnectTimeout()),
+            mock_future(mock_response(200))
+        ]
+        self.assertEqual(client.post('http://test').status_code, 200)
+        self.assertEqual(client.session.request.call_count, 2)
+
+    def test_read_timeout_not_retried(self):
+        client = HTTPClient({'retries': 2, 'retry_delay': 0})
+        client.session = mock.Mock()
+        client.session.request.return_value = mock_future(
+            error=ReadTimeout())
+        with self.assertRaises(ReadTimeout):
+            client.post('http://test', data=b'audio')
+        self.assertEqual(client.session.request.call_count, 1)
+
+    def test_retries_limited(self):
+        client = HTTPClient({'retries': 1, 'retry_delay': 0})
+        client.session = mock.Mock()
+        client.session.request.return_value = mock_future(mock_response(503))
+        self.assertEqual(client.post('http://test').status_code, 503)
+        self.assertEqual(client.session.request.call_count, 2)
+
+        client.session.request.return_value = mock_future(
+            error=ConnectionError())
+        with self.assertRaises(ConnectionError):
+            client.post('http://test')
+
+    def test_retry_budget_exhausted(self):
+        client = HTTPClient({'retries': 5, 'retry_delay': 0})
+        client.budget = RetryBudget(ratio=0, max_tokens=2)
+        client.session = mock.Mock()
+        client.session.request.return_value = mock_future(mock_response(503))
+        client.post('http://test')
+        self.assertEqual(client.session.request.call_count, 3)
+        client.post('http://test')
+        self.assertEqual(client.session.request.call_count, 4)
@@ -0,0 +1,79 @@
+# Copyright 2017 Mycroft AI Inc.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+import unittest
+from shutil import rmtree
+from tempfile import mkdtemp
+
+import mock
+from os.path import join
+
+from mycroft.util.level_meter import (
+    LevelMeterReader,
+    LevelMeterWriter,
+    PAYLOAD,
+    SEQUENCE,
+    SEQUENCE_OFFSET
+)
+
+
+class TestLevelMeter(unittest.TestCase):
+    def setUp(self):
+        self.dir = mkdtemp()
+        self.filename = join(self.dir, 'mic_level')
+
+    def tearDown(self):
+        rmtree(self.dir)
+
+    def test_read_before_write(self):
+        reader = LevelMeterReader(self.filename)
+        self.assertIsNone(reader.read())
+
+    def test_write_and_read(self):
+        reader = LevelMeterReader(self.filename)
+        writer = LevelMeterWriter(self.filename)
+        writer.update(12, 3.5)
+        level = reader.read()
+        self.assertEqual(level.energy, 12.0)
+        self.assertEqual(level.threshold, 3.5)
+
+        writer.update(20, 4.0)
+        new_level = reader.read()
+        self.assertEqual(new_level.energy, 20.0)
+        self.assertNotEqual(new_level.sequence, level.sequence)
+        self.assertTrue(new_level.timestamp >= level.timestamp)
+        writer.close()
+        reader.close()
+
+    def test_write_in_progress(self):
+        writer = LevelMeterWriter(self.filename)
+        writer.update(12, 3.5)
+        SEQUENCE.pack_into(writer._map, SEQUENCE_OFFSET, writer.sequence + 1)
+        self.assertIsNone(LevelMeterReader(self.filename).read())
+
+    def test_sequence_published_last(self):
+        writer = LevelMeterWriter(self.filename)
+        stores = mock.Mock()
+        stores.sequence.side_effect = SEQUENCE.pack_into
+        stores.payload.side_effect = PAYLOAD.pack_into
+        with mock.patch('mycroft.util.level_meter.SEQUENCE') as sequence, \
+                mock.patch('mycroft.util.level_meter.PAYLOAD') as payload:
+            sequence.pack_into = stores.sequence
+            payload.pack_into = stores.payload
+            writer.update(12, 3.5)
+        self.assertEqual([name for name, _, _ in stores.mock_calls],
+                         ['sequence', 'payload', 'sequence'])
+        self.assertEqual(stores.sequence.call_args[0][2], 2)
+        self.assertEqual(LevelMeterReader(self.filename).read().energy, 12.0)
+        writer.close()